@@ -0,0 +1,18 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .user_cache import invalidate_user
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_changed_user(sender, instance, **kwargs):
+    invalidate_user(instance.id)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def invalidate_user_of_blacklisted_token(sender, instance, **kwargs):
+    if instance.token.user_id is not None:
+        invalidate_user(instance.token.user_id)
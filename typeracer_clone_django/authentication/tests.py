@@ -1,4 +1,10 @@
-from rest_framework.test import APITestCase
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from config.channels_middleware import JwtAuthMiddleware
+from .user_cache import local_user_cache
 
 
 class UserAuthenticationTestCase(APITestCase):
@@ -28,4 +34,64 @@ class UserAuthenticationTestCase(APITestCase):
         logout_response = self.client.post('/api/logout/', {'refresh' : refresh_token}, headers=headers)
         self.assertEqual(logout_response.status_code, 205)
         refresh_token_action_response = self.client.post('/api/login/refresh/', {'refresh' : refresh_token})
-        self.assertEqual(refresh_token_action_response.status_code, 401)
\ No newline at end of file
+        self.assertEqual(refresh_token_action_response.status_code, 401)
+
+class CapturingApplication:
+    """
+    ASGI application which remembers the user of the last scope it received.
+    """
+    def __init__(self):
+        self.user = None
+
+    async def __call__(self, scope, receive, send):
+        self.user = scope['user']
+
+
+class JwtAuthMiddlewareTestCase(APITransactionTestCase):
+    def setUp(self):
+        local_user_cache.clear()
+        self.user = User.objects.create(username='TestUser1', password='TestPass.123')
+        self.refresh_token = RefreshToken.for_user(self.user)
+        self.application = CapturingApplication()
+        self.middleware = JwtAuthMiddleware(self.application)
+
+    def connect(self, query_string):
+        scope = {'type': 'websocket', 'query_string': query_string.encode()}
+        async_to_sync(self.middleware)(scope, None, None)
+        return self.application.user
+
+    def connect_with_token(self):
+        return self.connect(f'token={self.refresh_token.access_token}')
+
+    def test_user_is_cached_after_first_connect(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.connect_with_token(), self.user)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.connect_with_token(), self.user)
+
+        local_user_cache.clear()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.connect_with_token(), self.user)
+
+    def test_cached_user_is_invalidated_on_user_change(self):
+        self.connect_with_token()
+
+        self.user.username = 'RenamedTestUser1'
+        self.user.save()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.connect_with_token().username, 'RenamedTestUser1')
+
+    def test_cached_user_is_invalidated_on_token_blacklist(self):
+        self.connect_with_token()
+
+        self.refresh_token.blacklist()
+
+        with self.assertNumQueries(1):
+            self.connect_with_token()
+
+    def test_missing_or_invalid_token(self):
+        self.assertFalse(self.connect('').is_authenticated)
+        self.assertFalse(self.connect('token=WrongToken').is_authenticated)
@@ -0,0 +1,78 @@
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+USER_CACHE_KEY = 'authentication:user:{}'
+
+
+class LocalUserCache:
+    """
+    Small LRU cache of users kept inside of the process. Entries live only
+    a few seconds because invalidation done by other processes reaches
+    this cache only through its expiry.
+    """
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.users = OrderedDict()
+
+    def get(self, user_id):
+        cached_user = self.users.get(user_id)
+
+        if cached_user is None:
+            return None
+
+        user, expires_at = cached_user
+
+        if expires_at < time.monotonic():
+            del self.users[user_id]
+            return None
+
+        self.users.move_to_end(user_id)
+        return user
+
+    def set(self, user_id, user):
+        self.users[user_id] = (user, time.monotonic() + self.timeout)
+        self.users.move_to_end(user_id)
+
+        while len(self.users) > self.max_size:
+            self.users.popitem(last=False)
+
+    def delete(self, user_id):
+        self.users.pop(user_id, None)
+
+    def clear(self):
+        self.users.clear()
+
+
+local_user_cache = LocalUserCache(settings.USER_CACHE_LOCAL_MAX_SIZE, settings.USER_CACHE_LOCAL_TIMEOUT)
+
+
+def get_cached_user(user_id):
+    """
+    Returns the user from the local cache or from the configured cache
+    backend, ``None`` if the user isn't cached.
+    """
+    user = local_user_cache.get(user_id)
+
+    if user is None:
+        user = cache.get(USER_CACHE_KEY.format(user_id))
+
+        if user is not None:
+            local_user_cache.set(user_id, user)
+
+    return user
+
+
+def cache_user(user):
+    cache.set(USER_CACHE_KEY.format(user.id), user, timeout=settings.REDIS_CACHE_TIMEOUT)
+    local_user_cache.set(user.id, user)
+
+
+def invalidate_user(user_id):
+    cache.delete(USER_CACHE_KEY.format(user_id))
+    local_user_cache.delete(user_id)
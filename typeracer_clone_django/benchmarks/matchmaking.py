@@ -0,0 +1,132 @@
+"""
+Simulates players arriving at the matchmaking queue at a steady rate and
+reports how many enqueues per second the queue takes, how many races are
+made and how long players wait for them. Players don't connect through
+websockets and the races made by the benchmark are removed afterwards.
+
+    python -m benchmarks.matchmaking --rate 2000 --duration 10
+"""
+import os
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django
+django.setup()
+
+import argparse
+import asyncio
+import random
+import time
+
+from asgiref.sync import sync_to_async
+
+from race_handler import matchmaking
+from race_handler.models import Race
+from race_handler.scheduler import race_start_scheduler
+from config.redis_client import get_async_redis
+
+
+FIRST_PLAYER_ID = 10 ** 9
+
+
+class BenchmarkMatchmaker(matchmaking.Matchmaker):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.race_ids = []
+        self.match_sizes = []
+        self.matched_at = {}
+
+    async def claim_matches(self):
+        matches = await super().claim_matches()
+        matched_at = time.perf_counter()
+
+        for match in matches:
+            self.match_sizes.append(len(match))
+            self.matched_at.update((player_id, matched_at) for player_id, _ in match)
+
+        return matches
+
+    async def create_races(self, amount_of_races, start_date):
+        race_ids = await super().create_races(amount_of_races, start_date)
+        self.race_ids += race_ids
+        return race_ids
+
+
+def get_channel_name(player_id):
+    # Every player gets a channel of its own, nobody reads the messages
+    # and channels of the same process share their capacity.
+    return f'specific.matchmaking_benchmark_{player_id}!'
+
+
+def get_random_wpm():
+    return max(random.gauss(55, 25), 5)
+
+
+async def arrive(matchmaker, rate, duration, enqueued_at):
+    """
+    Enqueues ``rate`` players per second, a batch every 10 milliseconds.
+    """
+    batch_size = max(int(rate / 100), 1)
+    player_id = FIRST_PLAYER_ID
+    started_at = time.perf_counter()
+
+    while time.perf_counter() - started_at < duration:
+        batch_started_at = time.perf_counter()
+        batch = range(player_id, player_id + batch_size)
+        player_id += batch_size
+
+        for batch_player_id in batch:
+            enqueued_at[batch_player_id] = time.perf_counter()
+
+        await asyncio.gather(*(
+            matchmaker.enqueue(batch_player_id, get_channel_name(batch_player_id), matchmaking.get_wpm_band(get_random_wpm()))
+            for batch_player_id in batch
+        ))
+
+        await asyncio.sleep(max(0.01 - (time.perf_counter() - batch_started_at), 0))
+
+    return time.perf_counter() - started_at
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def main(rate, duration, race_size, wait_timeout):
+    matchmaker = BenchmarkMatchmaker(race_size=race_size, wait_timeout=wait_timeout, start_delay=3600)
+    await matchmaking.clear_queues()
+
+    enqueued_at = {}
+    matchmaker.ensure_running()
+    arrival_duration = await arrive(matchmaker, rate, duration, enqueued_at)
+
+    await asyncio.sleep(wait_timeout + 1)
+    matchmaker.task.cancel()
+
+    if matchmaker.race_ids:
+        await get_async_redis().zrem(race_start_scheduler.key, *matchmaker.race_ids)
+    await sync_to_async(Race.objects.filter(id__in=matchmaker.race_ids).delete)()
+    await matchmaking.clear_queues()
+
+    waits = [matchmaker.matched_at[player_id] - enqueued_at[player_id] for player_id in matchmaker.matched_at]
+
+    print(
+        f'{len(enqueued_at)} players in {arrival_duration:.1f}s ({len(enqueued_at) / arrival_duration:.0f} enqueues/s) | '
+        f'{len(matchmaker.race_ids)} races, {sum(matchmaker.match_sizes) / max(len(matchmaker.match_sizes), 1):.2f} players per race | '
+        f'{len(enqueued_at) - len(waits)} unmatched | '
+        f'wait p50 {percentile(waits, 0.5) * 1000:.0f} ms p99 {percentile(waits, 0.99) * 1000:.0f} ms'
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rate', type=int, default=2000, help='players per second')
+    parser.add_argument('--duration', type=float, default=10, help='seconds')
+    parser.add_argument('--race-size', type=int, default=5)
+    parser.add_argument('--wait-timeout', type=float, default=10, help='seconds')
+    arguments = parser.parse_args()
+
+    asyncio.run(main(arguments.rate, arguments.duration, arguments.race_size, arguments.wait_timeout))
@@ -0,0 +1,59 @@
+"""
+Compares validating a whole race word by word with ``quote.split()`` on every
+word against validating it with a quote tokenized once, using the longest
+quotes of quotes.json.
+
+    python -m benchmarks.quote_words --quotes 20 --repeat 5
+"""
+import argparse
+import json
+import timeit
+
+from quotes_interface.words import QuoteWords
+
+
+def get_longest_quotes(amount_of_quotes):
+    with open('quotes.json') as f:
+        quotes = {obj['Quote'] for obj in json.load(f)}
+
+    return sorted(quotes, key=len, reverse=True)[:amount_of_quotes]
+
+
+def race_with_split_per_word(quote):
+    for word_index, word in enumerate(quote.split()):
+        if word != quote.split()[word_index]:
+            raise ValueError(word)
+        if len(quote.split()) == word_index:
+            raise ValueError(word)
+
+
+def race_with_tokenized_quote(quote):
+    quote_words = QuoteWords(quote)
+
+    for word_index, word in enumerate(quote.split()):
+        if not quote_words.is_word_at(word, word_index):
+            raise ValueError(word)
+        if len(quote_words) == word_index:
+            raise ValueError(word)
+
+
+def main(amount_of_quotes, repeat):
+    for quote in get_longest_quotes(amount_of_quotes):
+        split_time = min(timeit.repeat(lambda: race_with_split_per_word(quote), number=10, repeat=repeat)) / 10
+        tokenized_time = min(timeit.repeat(lambda: race_with_tokenized_quote(quote), number=10, repeat=repeat)) / 10
+
+        print(
+            f'{len(quote):>6} chars {len(quote.split()):>5} words | '
+            f'split per word {split_time * 1000:9.3f} ms | '
+            f'tokenized once {tokenized_time * 1000:9.3f} ms | '
+            f'x{split_time / tokenized_time:7.1f}'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quotes', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    arguments = parser.parse_args()
+
+    main(arguments.quotes, arguments.repeat)
@@ -0,0 +1,169 @@
+"""
+Runs races inside of this process with different progress tick rates and
+reports how many messages go through the channel layer while players type.
+
+Players are connected straight to the consumers, so only the channel layer
+(Redis) and the database from the settings are needed. Run it from the
+project folder:
+
+    python -m benchmarks.race_progress --races 20 --players 5 --ticks 0 50 100
+
+Tick 0 is the per word race_progress broadcast. Benchmark users and races
+are removed once it is done.
+"""
+import os
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django
+django.setup()
+
+import argparse
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from race_handler.models import Race
+from race_handler.routing import websocket_urlpatterns
+from race_handler.scheduler import race_start_scheduler
+from config.channels_middleware import JwtAuthMiddlewareStack
+from config.redis_client import get_async_redis
+
+
+BENCHMARK_USER_PREFIX = 'race_progress_benchmark_'
+
+
+class CountingChannelLayer:
+    """
+    Counts group messages sent to the races and the channel messages they
+    are fanned out to.
+    """
+
+    def __init__(self, channel_layer, players_per_race):
+        self.channel_layer = channel_layer
+        self.group_send = channel_layer.group_send
+        self.players_per_race = players_per_race
+        self.is_counting = False
+        self.group_messages = 0
+        self.channel_messages = 0
+
+    async def counting_group_send(self, group, message):
+        if self.is_counting:
+            self.group_messages += 1
+            self.channel_messages += self.players_per_race
+
+        await self.group_send(group, message)
+
+    def __enter__(self):
+        self.channel_layer.group_send = self.counting_group_send
+        return self
+
+    def __exit__(self, *args):
+        del self.channel_layer.group_send
+
+
+def create_players_and_races(amount_of_races, players_per_race):
+    players = []
+    for idx in range(amount_of_races * players_per_race):
+        user, _ = User.objects.get_or_create(username=f'{BENCHMARK_USER_PREFIX}{idx}')
+        players.append(str(RefreshToken.for_user(user).access_token))
+
+    races = [Race.objects.create().id for _ in range(amount_of_races)]
+    return players, races
+
+
+def delete_benchmark_data(races):
+    Race.objects.filter(id__in=races).delete()
+    User.objects.filter(username__startswith=BENCHMARK_USER_PREFIX).delete()
+
+
+async def receive_until(communicator, message_type):
+    while True:
+        message = await communicator.receive_json_from(timeout=30)
+        if message['type'] == message_type:
+            return message
+
+
+async def type_quote(communicator, words, words_per_second):
+    for word in words:
+        await communicator.send_json_to({'type': 'race_progress', 'word': word})
+        await asyncio.sleep(1 / words_per_second)
+
+
+async def drain(communicator, frames):
+    try:
+        while True:
+            message = await communicator.receive_json_from(timeout=1)
+            frames[message['type']] = frames.get(message['type'], 0) + 1
+    except asyncio.TimeoutError:
+        return
+
+
+async def run_races(amount_of_races, players_per_race, words_per_second):
+    players, races = await sync_to_async(create_players_and_races)(amount_of_races, players_per_race)
+    url_patterns = JwtAuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+
+    communicators = []
+    for idx, token in enumerate(players):
+        communicator = WebsocketCommunicator(url_patterns, f'/ws/race/{races[idx // players_per_race]}/?token={token}')
+        await communicator.connect(timeout=60)
+        await receive_until(communicator, 'player_list')
+        communicators.append(communicator)
+
+    for race_id in races:
+        await get_async_redis().zrem(race_start_scheduler.key, race_id)
+        await race_start_scheduler.start_claimed_race(race_id, timezone.now())
+
+    race_starts = await asyncio.gather(*(receive_until(communicator, 'race_start') for communicator in communicators))
+
+    frames = {}
+    with CountingChannelLayer(get_channel_layer(), players_per_race) as counting_channel_layer:
+        counting_channel_layer.is_counting = True
+        started_at = time.perf_counter()
+
+        await asyncio.gather(*(
+            type_quote(communicator, race_start['quote'].split(), words_per_second)
+            for communicator, race_start in zip(communicators, race_starts)
+        ))
+        await asyncio.gather(*(drain(communicator, frames) for communicator in communicators))
+
+        duration = time.perf_counter() - started_at - 1
+        counting_channel_layer.is_counting = False
+
+    for communicator in communicators:
+        await communicator.disconnect()
+
+    await sync_to_async(delete_benchmark_data)(races)
+
+    return counting_channel_layer.group_messages, counting_channel_layer.channel_messages, frames, duration
+
+
+async def main(ticks, amount_of_races, players_per_race, words_per_second):
+    for tick in ticks:
+        with override_settings(RACE_PROGRESS_TICK_MS=tick):
+            group_messages, channel_messages, frames, duration = await run_races(amount_of_races, players_per_race, words_per_second)
+
+        print(
+            f'tick {tick:>4} ms | '
+            f'group messages {group_messages:>7} ({group_messages / duration:8.1f}/s) | '
+            f'channel messages {channel_messages:>7} ({channel_messages / duration:8.1f}/s) | '
+            f'progress frames {frames.get("race_progress", 0) + frames.get("race_progress_batch", 0):>7}'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--races', type=int, default=20)
+    parser.add_argument('--players', type=int, default=5, help='players per race')
+    parser.add_argument('--words-per-second', type=float, default=5)
+    parser.add_argument('--ticks', type=int, nargs='+', default=[0, 50, 100], help='RACE_PROGRESS_TICK_MS values')
+    arguments = parser.parse_args()
+
+    asyncio.run(main(arguments.ticks, arguments.races, arguments.players, arguments.words_per_second))
@@ -0,0 +1,74 @@
+"""
+Compares the JSON and the msgpack protocol of the race socket: size of the
+frames and time it takes to encode them and to decode client progress.
+
+    python -m benchmarks.race_protocol --players 10 --number 100000
+"""
+import argparse
+import json
+import timeit
+
+import msgpack
+
+from race_handler import protocol
+
+
+QUOTE = "Self-respect permeates every aspect of your life, so treat yourself the way you'd like to be treated."
+
+
+def get_messages(amount_of_players):
+    return {
+        'race_progress': {'type': 'race_progress', 'player_id': 1042, 'word_index': 12},
+        'race_progress_batch': {
+            'type': 'race_progress_batch',
+            'progress': [{'player_id': 1042 + idx, 'word_index': 12} for idx in range(amount_of_players)],
+        },
+        'player_list': {
+            'type': 'player_list',
+            'players': [{'id': 1042 + idx, 'username': f'player{idx}'} for idx in range(amount_of_players)],
+            'time': '2023-08-01T12:00:00.250000+00:00',
+        },
+        'race_start': {
+            'type': 'race_start',
+            'quote_id': 315,
+            'quote': QUOTE,
+            'author': "Joe Clark",
+            'categories': ["life"],
+            'word_offsets': [idx for idx, character in enumerate(QUOTE) if idx == 0 or QUOTE[idx - 1] == ' '],
+            'time': '2023-08-01T12:00:00.250000+00:00',
+        },
+    }
+
+
+def measure(function, number):
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1_000_000
+
+
+def main(amount_of_players, number):
+    for message_type, message in get_messages(amount_of_players).items():
+        json_frame = json.dumps(message)
+        msgpack_frame = protocol.encode_message(message)
+
+        print(
+            f'{message_type:>20} | '
+            f'json {len(json_frame):>5} B {measure(lambda: json.dumps(message), number):6.2f} us | '
+            f'msgpack {len(msgpack_frame):>5} B {measure(lambda: protocol.encode_message(message), number):6.2f} us'
+        )
+
+    json_progress = json.dumps({'type': 'race_progress', 'word': 'permeates'})
+    msgpack_progress = msgpack.packb([protocol.RACE_PROGRESS, 'permeates'])
+
+    print(
+        f'{"client progress":>20} | '
+        f'json {len(json_progress):>5} B {measure(lambda: json.loads(json_progress), number):6.2f} us | '
+        f'msgpack {len(msgpack_progress):>5} B {measure(lambda: protocol.decode_message(msgpack_progress), number):6.2f} us'
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=10, help='players in the player list and progress batch')
+    parser.add_argument('--number', type=int, default=100000, help='encodings per measurement')
+    arguments = parser.parse_args()
+
+    main(arguments.players, arguments.number)
@@ -0,0 +1,148 @@
+"""
+Opens an increasing amount of race sockets against a running server and
+reports connect time and keystroke round trip latency for every step.
+
+Start a single worker and point the benchmark at it from the project folder:
+
+    uvicorn config.asgi:application --workers 1 --port 8001
+    python -m benchmarks.race_sockets --url ws://127.0.0.1:8001 --steps 50 100 250 500
+
+Running the same command against an older checkout gives the numbers to
+compare with. Benchmark users and races are removed once it is done.
+"""
+import os
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django
+django.setup()
+
+import argparse
+import asyncio
+import json
+import time
+
+import websockets
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from race_handler.models import Race
+
+
+BENCHMARK_USER_PREFIX = 'race_sockets_benchmark_'
+PLAYERS_PER_RACE = 2
+
+
+def create_players_and_races(amount_of_players):
+    players = []
+    for idx in range(amount_of_players):
+        user, _ = User.objects.get_or_create(username=f'{BENCHMARK_USER_PREFIX}{idx}')
+        players.append(str(RefreshToken.for_user(user).access_token))
+
+    races = []
+    for idx in range(0, amount_of_players, PLAYERS_PER_RACE):
+        races.append(Race.objects.create().id)
+
+    return players, races
+
+
+def delete_benchmark_data(races):
+    Race.objects.filter(id__in=races).delete()
+    User.objects.filter(username__startswith=BENCHMARK_USER_PREFIX).delete()
+
+
+async def receive_until(socket, message_type):
+    while True:
+        message = json.loads(await socket.recv())
+        if message['type'] == message_type:
+            return message
+
+
+async def race_player(url, race_id, token, is_starter, connect_times, keystroke_times):
+    connect_started_at = time.perf_counter()
+    async with websockets.connect(f'{url}/ws/race/{race_id}/?token={token}', open_timeout=60) as socket:
+        await receive_until(socket, 'player_list')
+        connect_times.append(time.perf_counter() - connect_started_at)
+
+        if is_starter:
+            await socket.send(json.dumps({'type': 'race_action', 'action': 'start_race'}))
+
+        race_start = await receive_until(socket, 'race_start')
+        player_id = None
+
+        for word in race_start['quote'].split():
+            sent_at = time.perf_counter()
+            await socket.send(json.dumps({'type': 'race_progress', 'word': word}))
+
+            while True:
+                message = json.loads(await socket.recv())
+                if message['type'] == 'error':
+                    return
+                if message['type'] != 'race_progress':
+                    continue
+                if player_id is None or message['player_id'] == player_id:
+                    player_id = message['player_id']
+                    break
+
+            keystroke_times.append(time.perf_counter() - sent_at)
+
+
+async def run_step(url, amount_of_sockets):
+    players, races = await sync_to_async(create_players_and_races)(amount_of_sockets)
+
+    connect_times = []
+    keystroke_times = []
+    tasks = []
+    for idx, token in enumerate(players):
+        race_id = races[idx // PLAYERS_PER_RACE]
+        is_starter = idx % PLAYERS_PER_RACE == 0
+        tasks.append(race_player(url, race_id, token, is_starter, connect_times, keystroke_times))
+
+    step_started_at = time.perf_counter()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    step_duration = time.perf_counter() - step_started_at
+
+    await sync_to_async(delete_benchmark_data)(races)
+
+    failures = sum(1 for result in results if isinstance(result, Exception))
+    return connect_times, keystroke_times, failures, step_duration
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def print_step(amount_of_sockets, connect_times, keystroke_times, failures, step_duration):
+    print(
+        f'{amount_of_sockets:>6} sockets | '
+        f'failed {failures:>5} | '
+        f'connect p50 {percentile(connect_times, 0.5) * 1000:8.1f} ms '
+        f'p99 {percentile(connect_times, 0.99) * 1000:8.1f} ms | '
+        f'keystroke p50 {percentile(keystroke_times, 0.5) * 1000:8.1f} ms '
+        f'p99 {percentile(keystroke_times, 0.99) * 1000:8.1f} ms | '
+        f'{len(keystroke_times) / step_duration:8.1f} keystrokes/s'
+    )
+
+
+async def main(url, steps, max_keystroke_p99):
+    for amount_of_sockets in steps:
+        connect_times, keystroke_times, failures, step_duration = await run_step(url, amount_of_sockets)
+        print_step(amount_of_sockets, connect_times, keystroke_times, failures, step_duration)
+
+        if failures or percentile(keystroke_times, 0.99) > max_keystroke_p99:
+            print(f'Worker saturated at {amount_of_sockets} concurrent sockets')
+            return
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='ws://127.0.0.1:8001')
+    parser.add_argument('--steps', type=int, nargs='+', default=[50, 100, 250, 500, 1000])
+    parser.add_argument('--max-keystroke-p99', type=float, default=0.25, help='seconds')
+    arguments = parser.parse_args()
+
+    asyncio.run(main(arguments.url, arguments.steps, arguments.max_keystroke_p99))
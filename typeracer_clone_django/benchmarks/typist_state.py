@@ -0,0 +1,81 @@
+"""
+Measures memory of the keystroke state of many concurrent typists and how
+many keystrokes a single process handles per second, with and without
+recording the replay.
+
+    python -m benchmarks.typist_state --typists 10000 --keystrokes 1000000
+"""
+import argparse
+import time
+import tracemalloc
+
+from race_handler.typist import TypistState
+from race_handler.replay import ReplayRecorder
+
+
+QUOTE = "Self-respect permeates every aspect of your life, so treat yourself the way you'd like to be treated."
+
+
+def measure_memory(amount_of_typists):
+    tracemalloc.start()
+    typist_states = [TypistState() for _ in range(amount_of_typists)]
+
+    for typist_state in typist_states:
+        typist_state.type_keys(QUOTE[:40], QUOTE, 10000, 10000)
+
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return memory, typist_states
+
+
+def measure_keystrokes(typist_states, amount_of_keystrokes, chunk_size, replay_recorders=None):
+    chunks = [QUOTE[idx:idx + chunk_size] for idx in range(0, len(QUOTE), chunk_size)]
+    amount_of_chunks = amount_of_keystrokes // chunk_size
+
+    started_at = time.perf_counter()
+    for idx in range(amount_of_chunks):
+        typist_state = typist_states[idx % len(typist_states)]
+
+        if typist_state.position == len(QUOTE):
+            typist_state.position = typist_state.committed_position = 0
+
+        keys = chunks[typist_state.position // chunk_size]
+        typist_state.type_keys(keys, QUOTE, idx, idx)
+
+        if replay_recorders is not None:
+            replay_recorders[idx % len(typist_states)].record_keys(idx, keys)
+
+    return amount_of_chunks * chunk_size / (time.perf_counter() - started_at)
+
+
+def main(amount_of_typists, amount_of_keystrokes, chunk_size):
+    memory, typist_states = measure_memory(amount_of_typists)
+    print(f'{amount_of_typists} typists | {memory / 1024:.0f} KiB | {memory / amount_of_typists:.0f} B per typist')
+
+    for typist_state in typist_states:
+        typist_state.position = typist_state.committed_position = 0
+
+    keystrokes_per_second = measure_keystrokes(typist_states, amount_of_keystrokes, chunk_size)
+    print(f'{keystrokes_per_second:,.0f} keystrokes/s in chunks of {chunk_size}')
+
+    for typist_state in typist_states:
+        typist_state.position = typist_state.committed_position = 0
+
+    replay_recorders = [ReplayRecorder() for _ in typist_states]
+    keystrokes_per_second = measure_keystrokes(typist_states, amount_of_keystrokes, chunk_size, replay_recorders)
+    replay_size = sum(len(replay_recorder.events) for replay_recorder in replay_recorders)
+    print(
+        f'{keystrokes_per_second:,.0f} keystrokes/s in chunks of {chunk_size} with replays, '
+        f'{replay_size / amount_of_keystrokes:.2f} B of replay per keystroke'
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--typists', type=int, default=10000)
+    parser.add_argument('--keystrokes', type=int, default=1000000)
+    parser.add_argument('--chunk-size', type=int, default=5)
+    arguments = parser.parse_args()
+
+    main(arguments.typists, arguments.keystrokes, arguments.chunk_size)
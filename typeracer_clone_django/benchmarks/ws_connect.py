@@ -0,0 +1,103 @@
+"""
+Measures how many websocket connects per second JwtAuthMiddleware can
+authenticate. The old middleware (token validated and then decoded again,
+user read from the database on every connect) is measured next to the
+current one with cold and warm user caches.
+
+    python -m benchmarks.ws_connect --users 200 --connects 5000 --concurrency 100
+"""
+import os
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django
+django.setup()
+
+import argparse
+import asyncio
+import time
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from jwt import decode as jwt_decode
+from rest_framework_simplejwt.tokens import RefreshToken, UntypedToken
+
+from authentication.user_cache import local_user_cache, invalidate_user
+from config.channels_middleware import JwtAuthMiddleware, get_token_or_none
+
+
+BENCHMARK_USER_PREFIX = 'ws_connect_benchmark_'
+
+
+async def inner_application(scope, receive, send):
+    pass
+
+
+@database_sync_to_async
+def get_user_from_db(user_id):
+    return User.objects.get(id=user_id)
+
+
+async def old_middleware(scope, receive, send):
+    token = get_token_or_none(scope)
+    UntypedToken(token)
+    decoded_data = jwt_decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+    scope["user"] = await get_user_from_db(decoded_data["user_id"])
+
+
+def create_users(amount_of_users):
+    tokens = []
+    for idx in range(amount_of_users):
+        user, _ = User.objects.get_or_create(username=f'{BENCHMARK_USER_PREFIX}{idx}')
+        invalidate_user(user.id)
+        tokens.append(str(RefreshToken.for_user(user).access_token))
+
+    return tokens
+
+
+def delete_users():
+    User.objects.filter(username__startswith=BENCHMARK_USER_PREFIX).delete()
+
+
+async def measure(application, tokens, amount_of_connects, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def connect(idx):
+        async with semaphore:
+            scope = {'type': 'websocket', 'query_string': f'token={tokens[idx % len(tokens)]}'.encode()}
+            await application(scope, None, None)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(connect(idx) for idx in range(amount_of_connects)))
+    return amount_of_connects / (time.perf_counter() - started_at)
+
+
+async def main(amount_of_users, amount_of_connects, concurrency):
+    tokens = await database_sync_to_async(create_users)(amount_of_users)
+    middleware = JwtAuthMiddleware(inner_application)
+
+    old_rate = await measure(old_middleware, tokens, amount_of_connects, concurrency)
+    print(f'old middleware              {old_rate:10.1f} connects/s')
+
+    local_user_cache.clear()
+    first_rate = await measure(middleware, tokens, len(tokens), concurrency)
+    print(f'new middleware, cold cache  {first_rate:10.1f} connects/s')
+
+    local_user_cache.clear()
+    redis_rate = await measure(middleware, tokens, amount_of_connects, concurrency)
+    print(f'new middleware, Redis cache {redis_rate:10.1f} connects/s')
+
+    warm_rate = await measure(middleware, tokens, amount_of_connects, concurrency)
+    print(f'new middleware, warm cache  {warm_rate:10.1f} connects/s')
+
+    await database_sync_to_async(delete_users)()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--connects', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    arguments = parser.parse_args()
+
+    asyncio.run(main(arguments.users, arguments.connects, arguments.concurrency))
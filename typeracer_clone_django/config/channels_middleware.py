@@ -61,25 +61,46 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.tokens import UntypedToken
-from rest_framework_simplejwt.authentication import JWTTokenUserAuthentication
+from rest_framework_simplejwt.settings import api_settings
 from channels.middleware import BaseMiddleware
 from channels.auth import AuthMiddlewareStack
 from django.db import close_old_connections
 from urllib.parse import parse_qs
-from jwt import decode as jwt_decode
-from django.conf import settings
-from asgiref.sync import sync_to_async
+
+from authentication.user_cache import local_user_cache, get_cached_user, cache_user
 
 
 @database_sync_to_async
-def get_user(validated_token):
-    try:
-        user = get_user_model().objects.get(id=validated_token["user_id"])
+def get_user(user_id):
+    user = get_cached_user(user_id)
+
+    if user is not None:
         return user
-   
-    except User.DoesNotExist:
+
+    try:
+        user = get_user_model().objects.get(id=user_id)
+    except get_user_model().DoesNotExist:
         return AnonymousUser()
 
+    cache_user(user)
+    return user
+
+
+async def get_user_by_id(user_id):
+    # Users cached inside of the process are returned without leaving the event loop
+    user = local_user_cache.get(user_id)
+
+    if user is None:
+        user = await get_user(user_id)
+
+    return user
+
+
+def get_token_or_none(scope):
+    try:
+        return parse_qs(scope["query_string"].decode("utf8"))["token"][0]
+    except KeyError:
+        return None
 
 
 class JwtAuthMiddleware(BaseMiddleware):
@@ -91,30 +112,23 @@ class JwtAuthMiddleware(BaseMiddleware):
         close_old_connections()
 
         # Get the token
-        token = parse_qs(scope["query_string"].decode("utf8"))["token"][0]
+        token = get_token_or_none(scope)
 
         # Try to authenticate the user
         try:
-            # This will automatically validate the token and raise an error if token is invalid
-            UntypedToken(token)
-        except (InvalidToken, TokenError) as e:
-            scope["user"] = await sync_to_async(AnonymousUser)()
+            if token is None:
+                raise InvalidToken("Token is missing")
+
+            # Validates the token and decodes its payload in one go, raises an error if token is invalid
+            validated_token = UntypedToken(token)
+        except (InvalidToken, TokenError):
+            scope["user"] = AnonymousUser()
         else:
-            #  Then token is valid, decode it
-            decoded_data = jwt_decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-
-            # Will return a dictionary like -
-            # {
-            #     "token_type": "access",
-            #     "exp": 1568770772,
-            #     "jti": "5c15e80d65b04c20ad34d77b6703251b",
-            #     "user_id": 6
-            # }
-
-            # Get the user using ID
-            scope["user"] = await get_user(validated_token=decoded_data)
+            # Get the user using ID, the user is usually cached after the first connect
+            scope["user"] = await get_user_by_id(validated_token[api_settings.USER_ID_CLAIM])
+
         return await super().__call__(scope, receive, send)
 
 
 def JwtAuthMiddlewareStack(inner):
-    return JwtAuthMiddleware(AuthMiddlewareStack(inner))
\ No newline at end of file
+    return JwtAuthMiddleware(AuthMiddlewareStack(inner))
@@ -0,0 +1,40 @@
+import asyncio
+import weakref
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+
+sync_redis_client = None
+
+# Asyncio connections can't be shared between event loops, so every loop
+# gets its own client.
+async_redis_clients = weakref.WeakKeyDictionary()
+
+
+def get_redis():
+    """
+    Returns Redis client for ``settings.RACE_REDIS_URL`` shared by the process.
+    """
+    global sync_redis_client
+
+    if sync_redis_client is None:
+        sync_redis_client = redis.Redis.from_url(settings.RACE_REDIS_URL, decode_responses=True)
+
+    return sync_redis_client
+
+
+def get_async_redis():
+    """
+    Returns asyncio Redis client for ``settings.RACE_REDIS_URL`` shared by
+    the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    async_redis_client = async_redis_clients.get(loop)
+
+    if async_redis_client is None:
+        async_redis_client = redis.asyncio.Redis.from_url(settings.RACE_REDIS_URL, decode_responses=True)
+        async_redis_clients[loop] = async_redis_client
+
+    return async_redis_client
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     'daphne',
     'django.contrib.staticfiles',
     'django.contrib.sites',
+    'django.contrib.postgres',
 
     # Third party
     'channels',
@@ -107,10 +108,13 @@ DATABASES = {
     }
 }
 
+REDIS_HOST = os.environ.get('REDIS_HOST', default='redis')
+REDIS_PORT = int(os.environ.get('REDIS_PORT', default=6379))
+
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.redis.RedisCache",
-        "LOCATION": "redis://redis:6379/1",
+        "LOCATION": f"redis://{REDIS_HOST}:{REDIS_PORT}/1",
     }
 }
 
@@ -118,11 +122,20 @@ CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
         "CONFIG": {
-            "hosts": [("redis", 6379)],
+            "hosts": [(REDIS_HOST, REDIS_PORT)],
         }
     }
 }
 
+# Redis database with the race start schedule, lobby and leaderboards
+RACE_REDIS_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/2"
+# Used instead of the Redis databases above while the tests run, they're emptied by them
+CACHE_TEST_REDIS_URL = os.environ.get('CACHE_TEST_REDIS_URL', default=f"redis://{REDIS_HOST}:{REDIS_PORT}/13")
+CHANNEL_LAYER_TEST_REDIS_URL = os.environ.get('CHANNEL_LAYER_TEST_REDIS_URL', default=f"redis://{REDIS_HOST}:{REDIS_PORT}/14")
+RACE_TEST_REDIS_URL = os.environ.get('RACE_TEST_REDIS_URL', default=f"redis://{REDIS_HOST}:{REDIS_PORT}/15")
+
+TEST_RUNNER = 'config.test_runner.RaceRedisTestRunner'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -184,4 +197,24 @@ REST_FRAMEWORK = {
 
 REDIS_CACHE_TIMEOUT = 60
 
+# Users authenticated by the websocket middleware are cached in the process
+# for a few seconds and in the cache backend for REDIS_CACHE_TIMEOUT seconds
+USER_CACHE_LOCAL_TIMEOUT = 5
+USER_CACHE_LOCAL_MAX_SIZE = 4096
+
+# Progress of the players is sent to the race as one race_progress_batch
+# message every RACE_PROGRESS_TICK_MS milliseconds, 50-100 is a good choice
+# for busy deployments. With 0 every typed word is sent as race_progress.
+RACE_PROGRESS_TICK_MS = int(os.environ.get('RACE_PROGRESS_TICK_MS', default=0))
+
+# Races left behind by crashed workers are reaped by the reap_stale_races
+# command, or by the workers themselves every RACE_REAPER_INTERVAL seconds
+# when it isn't 0. Waiting races are stale RACE_WAITING_TIMEOUT seconds after
+# they are created, races on timer RACE_START_TIMEOUT seconds after their
+# start date and started races RACE_TIMEOUT seconds after their start date.
+RACE_REAPER_INTERVAL = int(os.environ.get('RACE_REAPER_INTERVAL', default=0))
+RACE_WAITING_TIMEOUT = 60 * 60
+RACE_START_TIMEOUT = 5 * 60
+RACE_TIMEOUT = 60 * 60
+
 CORS_ALLOW_ALL_ORIGINS = True
\ No newline at end of file
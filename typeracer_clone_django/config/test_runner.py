@@ -0,0 +1,55 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from config import redis_client
+
+
+class RaceRedisTestRunner(DiscoverRunner):
+    """
+    Runs the tests against Redis databases of their own instead of the ones
+    of the running site: ``settings.RACE_TEST_REDIS_URL`` for the lobby,
+    leaderboards and queues, ``settings.CACHE_TEST_REDIS_URL`` for the cache
+    and ``settings.CHANNEL_LAYER_TEST_REDIS_URL`` for the channel layer. So
+    tests never touch live Redis data, cache test quotes and users for the
+    site or broadcast to its groups. The test databases are emptied before
+    and after the run.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+
+        self.test_redis_settings = override_settings(
+            RACE_REDIS_URL=settings.RACE_TEST_REDIS_URL,
+            CACHES={
+                'default': {**settings.CACHES['default'], 'LOCATION': settings.CACHE_TEST_REDIS_URL},
+            },
+            CHANNEL_LAYERS={
+                'default': {
+                    **settings.CHANNEL_LAYERS['default'],
+                    'CONFIG': {**settings.CHANNEL_LAYERS['default']['CONFIG'], 'hosts': [settings.CHANNEL_LAYER_TEST_REDIS_URL]},
+                },
+            },
+        )
+        self.test_redis_settings.enable()
+        self.reset_redis_clients()
+        self.flush_redis()
+
+    def teardown_test_environment(self, **kwargs):
+        self.flush_redis()
+        self.test_redis_settings.disable()
+        self.reset_redis_clients()
+
+        super().teardown_test_environment(**kwargs)
+
+    def flush_redis(self):
+        redis_client.get_redis().flushdb()
+        cache.clear()
+        async_to_sync(get_channel_layer().flush)()
+
+    def reset_redis_clients(self):
+        redis_client.sync_redis_client = None
+        redis_client.async_redis_clients.clear()
@@ -4,19 +4,9 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 import django
 django.setup()
 
-import json
+from django.core.management import call_command
 
-from quotes_interface.models import Quotes
 
-f = open('quotes.json')
-data = json.load(f)
-
-for obj in data:
-    
-    quote = obj["Quote"]
-    author = obj["Author"]
-    category = obj["Category"]
-
-    quote_in_db, is_created = Quotes.objects.get_or_create(quote=quote, author=author)
-
-    quote_in_db.categories.get_or_create(category=category)
+# Kept for the old deployment scripts, quotes are imported by the
+# import_quotes management command now.
+call_command('import_quotes', 'quotes.json')
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class QuotesInterfaceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'quotes_interface'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,86 @@
+import string
+
+
+DIFFICULTY_CHOICE = (
+    ("easy", "easy"),
+    ("medium", "medium"),
+    ("hard", "hard"),
+)
+
+# Characters which are typed without leaving the home row area of the
+# keyboard or reaching for modifiers, everything else is a rare character.
+COMMON_CHARACTERS = frozenset(string.ascii_lowercase + " .,'")
+PUNCTUATION = frozenset(string.punctuation + "‘’“”—–…")
+
+# Every feature of the quote is scaled to [0, 1] by the value at which it
+# stops making the quote any harder.
+MAX_LENGTH = 400
+MAX_RARE_CHARACTER_RATIO = 0.12
+MAX_PUNCTUATION_DENSITY = 0.08
+MIN_AVERAGE_WORD_LENGTH = 3
+MAX_AVERAGE_WORD_LENGTH = 7
+
+# A couple of capital letters or commas don't make a short quote hard, so
+# ratios of quotes shorter than this are computed as if they were this long.
+MIN_RATIO_LENGTH = 50
+
+WEIGHTS = {
+    'length': 0.4,
+    'rare_character_ratio': 0.25,
+    'punctuation_density': 0.15,
+    'average_word_length': 0.2,
+}
+
+# Upper bounds of the difficulty scores of every bucket but the hardest one,
+# picked so the quotes of the dataset are split into roughly even buckets.
+DIFFICULTY_THRESHOLDS = (
+    (0.24, "easy"),
+    (0.32, "medium"),
+)
+
+
+def scale(value, min_value, max_value):
+    return min(max((value - min_value) / (max_value - min_value), 0), 1)
+
+
+def get_difficulty_features(quote):
+    words = quote.split()
+    length = len(quote)
+
+    if not length or not words:
+        return {feature: 0 for feature in WEIGHTS}
+
+    ratio_length = max(length, MIN_RATIO_LENGTH)
+
+    return {
+        'length': length,
+        'rare_character_ratio': sum(character not in COMMON_CHARACTERS and not character.isspace() for character in quote) / ratio_length,
+        'punctuation_density': sum(character in PUNCTUATION for character in quote) / ratio_length,
+        'average_word_length': sum(len(word.strip(string.punctuation)) for word in words) / len(words),
+    }
+
+
+def get_difficulty_score(quote):
+    """
+    Returns a number from 0 to 1, the harder the quote is to type the
+    greater the number is.
+    """
+    features = get_difficulty_features(quote)
+    scaled_features = {
+        'length': scale(features['length'], 0, MAX_LENGTH),
+        'rare_character_ratio': scale(features['rare_character_ratio'], 0, MAX_RARE_CHARACTER_RATIO),
+        'punctuation_density': scale(features['punctuation_density'], 0, MAX_PUNCTUATION_DENSITY),
+        'average_word_length': scale(features['average_word_length'], MIN_AVERAGE_WORD_LENGTH, MAX_AVERAGE_WORD_LENGTH),
+    }
+
+    return sum(WEIGHTS[feature] * value for feature, value in scaled_features.items())
+
+
+def get_difficulty(quote):
+    score = get_difficulty_score(quote)
+
+    for max_score, difficulty in DIFFICULTY_THRESHOLDS:
+        if score < max_score:
+            return difficulty
+
+    return DIFFICULTY_CHOICE[-1][0]
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from quotes_interface import services
+from quotes_interface.models import Quotes, Categories, QuoteImport, get_quote_content_hash
+from quotes_interface.difficulty import DIFFICULTY_CHOICE
+
+
+QuoteCategories = Categories.quote.through
+
+# Changes whenever the importer starts to import more of the dataset, so
+# datasets imported by the older importer are imported once again.
+IMPORT_FORMAT_VERSION = 2
+
+
+def get_file_hash(path, chunk_size=1 << 20):
+    file_hash = hashlib.sha256(f'import_quotes:{IMPORT_FORMAT_VERSION}:'.encode())
+
+    with open(path, 'rb') as file:
+        while chunk := file.read(chunk_size):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+
+def iter_json_array(file, chunk_size=1 << 16):
+    """
+    Yields items of the JSON array in the file one by one, without reading
+    the whole file into memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    is_array_started = False
+
+    while True:
+        chunk = file.read(chunk_size)
+        buffer = buffer[position:] + chunk
+        position = 0
+
+        while True:
+            while position < len(buffer) and (buffer[position].isspace() or (is_array_started and buffer[position] == ',')):
+                position += 1
+
+            if position == len(buffer):
+                break
+
+            if not is_array_started:
+                if buffer[position] != '[':
+                    raise CommandError("Quotes file should contain a JSON array")
+
+                is_array_started = True
+                position += 1
+                continue
+
+            if buffer[position] == ']':
+                return
+
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The item continues in the next chunk.
+                break
+
+            yield item
+
+        if not chunk:
+            raise CommandError("Quotes file isn't a complete JSON array")
+
+
+def normalize_tags(tags):
+    return [tag.strip().lower() for tag in tags if tag.strip()]
+
+
+def iter_batches(items, batch_size):
+    batch = []
+
+    for item in items:
+        batch.append(item)
+
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = "Imports quotes from the JSON dataset in bulk, the same dataset is imported only once"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='quotes.json')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--force', action='store_true', help="Import the dataset even if it has been imported already")
+
+    def handle(self, *args, **options):
+        started_at = time.perf_counter()
+        dataset_hash = get_file_hash(options['path'])
+
+        if not options['force'] and QuoteImport.objects.filter(dataset_hash=dataset_hash).exists():
+            self.stdout.write("Quotes dataset has been imported already")
+            return
+
+        self.quote_ids = {}
+        self.category_ids = {}
+        self.quote_categories = set()
+        amount_of_rows = 0
+
+        with transaction.atomic(), open(options['path'], encoding='utf-8') as file:
+            for batch in iter_batches(iter_json_array(file), options['batch_size']):
+                self.import_batch(batch)
+                amount_of_rows += len(batch)
+
+            QuoteImport.objects.update_or_create(dataset_hash=dataset_hash, defaults={'amount_of_quotes': len(self.quote_ids)})
+
+        services.invalidate_quote_ids()
+        services.invalidate_quote_payloads(self.quote_ids.values())
+
+        # Difficulty buckets are filled right away, so the first races don't
+        # have to wait for them.
+        for difficulty, _ in DIFFICULTY_CHOICE:
+            services.get_difficulty_quote_ids(difficulty)
+
+        elapsed_time = time.perf_counter() - started_at
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {amount_of_rows} rows ({len(self.quote_ids)} quotes, {len(self.category_ids)} categories) "
+            f"in {elapsed_time:.2f}s, {amount_of_rows / elapsed_time:.0f} rows/s"
+        ))
+
+    def build_quote(self, entry):
+        quote = Quotes(
+            quote=entry['Quote'],
+            author=entry.get('Author'),
+            tags=normalize_tags(entry.get('Tags', [])),
+            popularity=entry.get('Popularity', 0),
+        )
+        quote.update_computed_fields()
+        return quote
+
+    def merge_duplicate_quote(self, quote, entry):
+        """
+        The same quote is listed once for each of its categories, possibly with
+        different tags and popularity.
+        """
+        quote.tags += [tag for tag in normalize_tags(entry.get('Tags', [])) if tag not in quote.tags]
+        quote.popularity = max(quote.popularity, entry.get('Popularity', 0))
+
+    def merge_saved_duplicates(self, saved_duplicates):
+        """
+        Merges the entries into the quotes saved with the earlier batches.
+        """
+        quotes = list(Quotes.objects.filter(content_hash__in=saved_duplicates.keys()).only('content_hash', 'tags', 'popularity'))
+
+        for quote in quotes:
+            for entry in saved_duplicates[quote.content_hash]:
+                self.merge_duplicate_quote(quote, entry)
+
+        Quotes.objects.bulk_update(quotes, ['tags', 'popularity'])
+
+    def import_batch(self, batch):
+        new_quotes = {}
+        saved_duplicates = defaultdict(list)
+        new_categories = set()
+        batch_quote_categories = []
+
+        for entry in batch:
+            content_hash = get_quote_content_hash(entry['Quote'], entry.get('Author'))
+            category = entry.get('Category')
+
+            if content_hash in new_quotes:
+                self.merge_duplicate_quote(new_quotes[content_hash], entry)
+            elif content_hash in self.quote_ids:
+                saved_duplicates[content_hash].append(entry)
+            else:
+                new_quotes[content_hash] = self.build_quote(entry)
+
+            if category is not None:
+                if category not in self.category_ids:
+                    new_categories.add(category)
+
+                batch_quote_categories.append((content_hash, category))
+
+        if new_quotes:
+            Quotes.objects.bulk_create(
+                new_quotes.values(),
+                update_conflicts=True,
+                unique_fields=['content_hash'],
+                update_fields=['tags', 'popularity'],
+            )
+            self.quote_ids.update(Quotes.objects.filter(content_hash__in=new_quotes.keys()).values_list('content_hash', 'id'))
+
+        if saved_duplicates:
+            self.merge_saved_duplicates(saved_duplicates)
+
+        if new_categories:
+            Categories.objects.bulk_create([Categories(category=category) for category in new_categories], ignore_conflicts=True)
+            self.category_ids.update(Categories.objects.filter(category__in=new_categories).values_list('category', 'id'))
+
+        new_quote_categories = []
+        for content_hash, category in batch_quote_categories:
+            quote_category = (self.quote_ids[content_hash], self.category_ids[category])
+
+            if quote_category not in self.quote_categories:
+                self.quote_categories.add(quote_category)
+                new_quote_categories.append(QuoteCategories(quotes_id=quote_category[0], categories_id=quote_category[1]))
+
+        QuoteCategories.objects.bulk_create(new_quote_categories, ignore_conflicts=True)
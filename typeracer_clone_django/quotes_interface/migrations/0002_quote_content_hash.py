@@ -0,0 +1,61 @@
+import hashlib
+
+from django.db import migrations, models
+
+
+def merge_duplicates(apps, schema_editor):
+    """
+    Fills content hashes and merges quotes and categories which would break
+    the new unique constraints into the oldest of them.
+    """
+    Quotes = apps.get_model('quotes_interface', 'Quotes')
+    Categories = apps.get_model('quotes_interface', 'Categories')
+    Race = apps.get_model('race_handler', 'Race')
+    QuoteCategories = Categories.quote.through
+
+    kept_quotes = {}
+    for quote in Quotes.objects.order_by('id').iterator():
+        content_hash = hashlib.sha256(f'{quote.quote}\0{quote.author or ""}'.encode()).hexdigest()
+
+        if content_hash not in kept_quotes:
+            kept_quotes[content_hash] = quote.id
+            Quotes.objects.filter(id=quote.id).update(content_hash=content_hash)
+            continue
+
+        kept_quote_id = kept_quotes[content_hash]
+        Race.objects.filter(quote_id=quote.id).update(quote_id=kept_quote_id)
+        QuoteCategories.objects.bulk_create([
+            QuoteCategories(categories_id=categories_id, quotes_id=kept_quote_id)
+            for categories_id in QuoteCategories.objects.filter(quotes_id=quote.id).values_list('categories_id', flat=True)
+        ], ignore_conflicts=True)
+        quote.delete()
+
+    kept_categories = {}
+    for category in Categories.objects.order_by('id').iterator():
+        if category.category not in kept_categories:
+            kept_categories[category.category] = category.id
+            continue
+
+        kept_category_id = kept_categories[category.category]
+        QuoteCategories.objects.bulk_create([
+            QuoteCategories(categories_id=kept_category_id, quotes_id=quotes_id)
+            for quotes_id in QuoteCategories.objects.filter(categories_id=category.id).values_list('quotes_id', flat=True)
+        ], ignore_conflicts=True)
+        category.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes_interface', '0001_initial'),
+        ('race_handler', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quotes',
+            name='content_hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes_interface', '0002_quote_content_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='quotes',
+            name='content_hash',
+            field=models.CharField(editable=False, max_length=64, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='categories',
+            name='category',
+            field=models.TextField(blank=True, unique=True),
+        ),
+        migrations.CreateModel(
+            name='QuoteImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dataset_hash', models.CharField(max_length=64, unique=True)),
+                ('amount_of_quotes', models.PositiveIntegerField()),
+                ('imported_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.3 on 2026-10-18 14:36
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+def fill_quote_lengths(apps, schema_editor):
+    Quotes = apps.get_model('quotes_interface', 'Quotes')
+
+    quotes = []
+    for quote in Quotes.objects.only('id', 'quote').iterator(chunk_size=2000):
+        quote.length = len(quote.quote)
+        quote.word_count = len(quote.quote.split())
+        quotes.append(quote)
+
+    Quotes.objects.bulk_update(quotes, ['length', 'word_count'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes_interface', '0003_quote_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quotes',
+            name='length',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='quotes',
+            name='popularity',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quotes',
+            name='tags',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), blank=True, default=list, size=None),
+        ),
+        migrations.AddField(
+            model_name='quotes',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='quotes',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tags'], name='quote_tags_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quotes',
+            index=models.Index(fields=['length'], name='quote_length_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quotes',
+            index=models.Index(fields=['popularity'], name='quote_popularity_idx'),
+        ),
+        migrations.RunPython(fill_quote_lengths, migrations.RunPython.noop),
+    ]
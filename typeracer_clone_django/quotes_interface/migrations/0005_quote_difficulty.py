@@ -0,0 +1,36 @@
+# Generated by Django 4.2.3 on 2026-10-18 16:02
+
+from django.db import migrations, models
+
+from quotes_interface.difficulty import get_difficulty
+
+
+def fill_quote_difficulties(apps, schema_editor):
+    Quotes = apps.get_model('quotes_interface', 'Quotes')
+
+    quotes = []
+    for quote in Quotes.objects.only('id', 'quote').iterator(chunk_size=2000):
+        quote.difficulty = get_difficulty(quote.quote)
+        quotes.append(quote)
+
+    Quotes.objects.bulk_update(quotes, ['difficulty'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes_interface', '0004_quote_attributes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quotes',
+            name='difficulty',
+            field=models.CharField(choices=[('easy', 'easy'), ('medium', 'medium'), ('hard', 'hard')], default='easy', editable=False, max_length=6),
+        ),
+        migrations.AddIndex(
+            model_name='quotes',
+            index=models.Index(fields=['difficulty'], name='quote_difficulty_idx'),
+        ),
+        migrations.RunPython(fill_quote_difficulties, migrations.RunPython.noop),
+    ]
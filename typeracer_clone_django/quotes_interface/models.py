@@ -1,10 +1,65 @@
+import hashlib
+
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 
+from .difficulty import DIFFICULTY_CHOICE, get_difficulty
+
+
+def get_quote_content_hash(quote, author):
+    """
+    Identifies the quote by its text and author, the same quote is never
+    imported twice.
+    """
+    return hashlib.sha256(f'{quote}\0{author or ""}'.encode()).hexdigest()
+
 
 class Quotes(models.Model):
     quote = models.TextField()
     author = models.TextField(blank=True, null=True)
+    content_hash = models.CharField(max_length=64, unique=True, editable=False)
+
+    tags = ArrayField(models.TextField(), default=list, blank=True)
+    popularity = models.FloatField(default=0)
+
+    # Computed from the quote, so quotes can be filtered by their length.
+    length = models.PositiveIntegerField(default=0, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    difficulty = models.CharField(choices=DIFFICULTY_CHOICE, max_length=6, default="easy", editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['tags'], name='quote_tags_idx'),
+            models.Index(fields=['length'], name='quote_length_idx'),
+            models.Index(fields=['popularity'], name='quote_popularity_idx'),
+            models.Index(fields=['difficulty'], name='quote_difficulty_idx'),
+        ]
+
+    def update_computed_fields(self):
+        self.content_hash = get_quote_content_hash(self.quote, self.author)
+        self.length = len(self.quote)
+        self.word_count = len(self.quote.split())
+        self.difficulty = get_difficulty(self.quote)
+
+    def save(self, *args, **kwargs):
+        self.update_computed_fields()
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'quote', 'author'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'content_hash', 'length', 'word_count', 'difficulty'}
+
+        super().save(*args, **kwargs)
 
 class Categories(models.Model):
-    category = models.TextField(blank=True)
+    category = models.TextField(blank=True, unique=True)
     quote = models.ManyToManyField(Quotes, related_name='categories')
+
+
+class QuoteImport(models.Model):
+    """
+    Dataset which has been imported, so the same dataset isn't imported again.
+    """
+    dataset_hash = models.CharField(max_length=64, unique=True)
+    amount_of_quotes = models.PositiveIntegerField()
+    imported_at = models.DateTimeField(auto_now_add=True)
@@ -1,9 +1,32 @@
 from rest_framework import serializers
 
+from .difficulty import DIFFICULTY_CHOICE
+
 
 class QuoteSerializer(serializers.Serializer):
     quote = serializers.CharField()
     author = serializers.CharField()
     category = serializers.ListField(
         child=serializers.CharField()
-    )
\ No newline at end of file
+    )
+
+
+class QuoteFiltersSerializer(serializers.Serializer):
+    tags = serializers.ListField(child=serializers.CharField(), required=False)
+    min_length = serializers.IntegerField(min_value=1, required=False)
+    max_length = serializers.IntegerField(min_value=1, required=False)
+    min_popularity = serializers.FloatField(min_value=0, max_value=1, required=False)
+    max_popularity = serializers.FloatField(min_value=0, max_value=1, required=False)
+    difficulty = serializers.ChoiceField(choices=DIFFICULTY_CHOICE, required=False)
+
+    def validate_tags(self, tags):
+        return sorted({tag.strip().lower() for tag in tags if tag.strip()})
+
+    def validate(self, data):
+        if data.get('min_length', 0) > data.get('max_length', float('inf')):
+            raise serializers.ValidationError("min_length can't be greater than max_length")
+
+        if data.get('min_popularity', 0) > data.get('max_popularity', 1):
+            raise serializers.ValidationError("min_popularity can't be greater than max_popularity")
+
+        return data
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import random
+import uuid
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Quotes
+from .difficulty import DIFFICULTY_CHOICE
+
+
+QUOTE_IDS_CACHE_KEY = 'quotes_interface:quote_ids'
+QUOTE_IDS_VERSION_CACHE_KEY = 'quotes_interface:quote_ids_version'
+QUOTE_PAYLOAD_CACHE_KEY = 'quotes_interface:quote_payload:{}'
+FILTERED_QUOTE_IDS_CACHE_KEY = 'quotes_interface:quote_ids:{}:{}'
+DIFFICULTY_QUOTE_IDS_CACHE_KEY = 'quotes_interface:quote_ids:difficulty:{}'
+
+# Process wide copy of the cached ID pool, it's reused for as long as the
+# version stored in the cache doesn't change.
+local_quote_ids = {'version': None, 'ids': array('q')}
+local_difficulty_quote_ids = {'version': None, 'buckets': {}}
+
+
+def load_quote_ids():
+    return array('q', Quotes.objects.order_by('id').values_list('id', flat=True))
+
+
+def get_quote_ids():
+    """
+    Returns IDs of all the quotes without loading the quotes themselves.
+    """
+    version = cache.get(QUOTE_IDS_VERSION_CACHE_KEY)
+
+    if version is not None and version == local_quote_ids['version']:
+        return local_quote_ids['ids']
+
+    quote_ids = cache.get(QUOTE_IDS_CACHE_KEY) if version is not None else None
+
+    if quote_ids is None:
+        version = uuid.uuid4().hex
+        quote_ids = load_quote_ids()
+        cache.set_many({QUOTE_IDS_CACHE_KEY: quote_ids, QUOTE_IDS_VERSION_CACHE_KEY: version}, timeout=None)
+
+    local_quote_ids['version'] = version
+    local_quote_ids['ids'] = quote_ids
+    return quote_ids
+
+
+def invalidate_quote_ids():
+    cache.delete_many([QUOTE_IDS_CACHE_KEY, QUOTE_IDS_VERSION_CACHE_KEY])
+
+
+def load_difficulty_quote_ids():
+    buckets = {difficulty: array('q') for difficulty, _ in DIFFICULTY_CHOICE}
+
+    for difficulty, quote_id in Quotes.objects.order_by('id').values_list('difficulty', 'id').iterator(chunk_size=10000):
+        buckets[difficulty].append(quote_id)
+
+    return buckets
+
+
+def get_difficulty_quote_ids(difficulty):
+    """
+    Returns IDs of the quotes of the difficulty. All the buckets are loaded
+    with a single query and cached together with the version of the ID pool.
+    """
+    get_quote_ids()
+    version = local_quote_ids['version']
+
+    if local_difficulty_quote_ids['version'] != version:
+        cache_key = DIFFICULTY_QUOTE_IDS_CACHE_KEY.format(version)
+        buckets = cache.get(cache_key)
+
+        if buckets is None:
+            buckets = load_difficulty_quote_ids()
+            cache.set(cache_key, buckets, timeout=settings.REDIS_CACHE_TIMEOUT)
+
+        local_difficulty_quote_ids['version'] = version
+        local_difficulty_quote_ids['buckets'] = buckets
+
+    return local_difficulty_quote_ids['buckets'][difficulty]
+
+
+def filter_quotes(queryset, tags=None, min_length=None, max_length=None, min_popularity=None, max_popularity=None, difficulty=None):
+    if difficulty is not None:
+        queryset = queryset.filter(difficulty=difficulty)
+    if tags:
+        queryset = queryset.filter(tags__contains=tags)
+    if min_length is not None:
+        queryset = queryset.filter(length__gte=min_length)
+    if max_length is not None:
+        queryset = queryset.filter(length__lte=max_length)
+    if min_popularity is not None:
+        queryset = queryset.filter(popularity__gte=min_popularity)
+    if max_popularity is not None:
+        queryset = queryset.filter(popularity__lte=max_popularity)
+
+    return queryset
+
+
+def get_filtered_quote_ids(quote_filters):
+    """
+    Returns IDs of the quotes matching the filters of ``filter_quotes``.
+    They are cached together with the version of the ID pool, so they are
+    loaded again as soon as any quote changes.
+    """
+    get_quote_ids()
+
+    filters_hash = hashlib.sha256(json.dumps(quote_filters, sort_keys=True).encode()).hexdigest()
+    cache_key = FILTERED_QUOTE_IDS_CACHE_KEY.format(local_quote_ids['version'], filters_hash)
+    quote_ids = cache.get(cache_key)
+
+    if quote_ids is None:
+        quote_ids = array('q', filter_quotes(Quotes.objects.order_by('id'), **quote_filters).values_list('id', flat=True))
+        cache.set(cache_key, quote_ids, timeout=settings.REDIS_CACHE_TIMEOUT)
+
+    return quote_ids
+
+
+def get_matching_quote_ids(quote_filters=None):
+    """
+    Returns IDs of the quotes matching the filters from the narrowest pool
+    which is cached for them.
+    """
+    if not quote_filters:
+        return get_quote_ids()
+
+    if quote_filters.keys() == {'difficulty'}:
+        return get_difficulty_quote_ids(quote_filters['difficulty'])
+
+    return get_filtered_quote_ids(quote_filters)
+
+
+def serialize_quote(quote):
+    return {
+        'id': quote.id,
+        'quote': quote.quote,
+        'author': quote.author,
+        'categories': [category.category for category in quote.categories.all()],
+    }
+
+
+def get_quote_payloads(quote_ids):
+    """
+    Returns serialized quotes (quote, author and categories) by their IDs.
+    Payloads are memoized in the cache, the missing ones are loaded with
+    their categories prefetched and cached for the next time.
+    """
+    cache_keys = {QUOTE_PAYLOAD_CACHE_KEY.format(quote_id): quote_id for quote_id in quote_ids}
+    cached_payloads = cache.get_many(cache_keys.keys())
+
+    payloads = {cache_keys[cache_key]: payload for cache_key, payload in cached_payloads.items()}
+    missing_ids = [quote_id for quote_id in quote_ids if quote_id not in payloads]
+
+    if missing_ids:
+        loaded_payloads = {}
+        for quote in Quotes.objects.filter(id__in=missing_ids).prefetch_related('categories'):
+            loaded_payloads[QUOTE_PAYLOAD_CACHE_KEY.format(quote.id)] = serialize_quote(quote)
+
+        cache.set_many(loaded_payloads, timeout=None)
+        payloads.update({payload['id']: payload for payload in loaded_payloads.values()})
+
+    return payloads
+
+
+def get_quote_payload(quote_id):
+    """
+    Returns serialized quote or ``None`` if there is no such quote.
+    """
+    return get_quote_payloads([quote_id]).get(quote_id)
+
+
+def invalidate_quote_payloads(quote_ids):
+    cache.delete_many([QUOTE_PAYLOAD_CACHE_KEY.format(quote_id) for quote_id in quote_ids])
+
+
+def get_random_quote_payload(quote_filters=None):
+    """
+    Picks a random quote matching the filters from the cached ID pool and
+    returns its payload. Raises ``Quotes.DoesNotExist`` if no quote matches.
+    """
+    for attempt in range(2):
+        quote_ids = get_matching_quote_ids(quote_filters)
+
+        if not quote_ids:
+            break
+
+        quote_payload = get_quote_payload(random.choice(quote_ids))
+
+        if quote_payload is not None:
+            return quote_payload
+
+        # The pool points to a deleted quote, reload it and try once more.
+        invalidate_quote_ids()
+
+    raise Quotes.DoesNotExist("There are no quotes to choose from")
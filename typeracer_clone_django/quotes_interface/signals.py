@@ -0,0 +1,37 @@
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Quotes, Categories
+from . import services
+
+
+@receiver(post_save, sender=Quotes)
+def invalidate_quote_on_save(sender, instance, created, **kwargs):
+    # Changed quote may stop or start matching filtered ID pools.
+    services.invalidate_quote_ids()
+    services.invalidate_quote_payloads([instance.id])
+
+
+@receiver(post_delete, sender=Quotes)
+def invalidate_quote_on_deletion(sender, instance, **kwargs):
+    services.invalidate_quote_ids()
+    services.invalidate_quote_payloads([instance.id])
+
+
+@receiver(post_save, sender=Categories)
+@receiver(pre_delete, sender=Categories)
+def invalidate_category_quotes(sender, instance, **kwargs):
+    services.invalidate_quote_payloads(instance.quote.values_list('id', flat=True))
+
+
+@receiver(m2m_changed, sender=Categories.quote.through)
+def invalidate_quotes_on_category_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if isinstance(instance, Quotes):
+        services.invalidate_quote_payloads([instance.id])
+    elif action == 'pre_clear':
+        services.invalidate_quote_payloads(instance.quote.values_list('id', flat=True))
+    else:
+        services.invalidate_quote_payloads(pk_set)
@@ -1,3 +1,292 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
 
-# Create your tests here.
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.contrib.auth.models import User
+
+from .models import Quotes, Categories, QuoteImport
+from .management.commands.import_quotes import iter_json_array
+from .words import QuoteWords, tokenize_quote
+from .difficulty import get_difficulty, get_difficulty_score
+from . import services
+
+
+class QuoteWordsTestCase(SimpleTestCase):
+    def test_words_match_str_split(self):
+        quote = "  Don't cry\tbecause it's over,\n smile because it happened. "
+        quote_words = QuoteWords(quote)
+
+        self.assertEqual(list(quote_words.words), quote.split())
+        self.assertEqual(len(quote_words), len(quote.split()))
+
+    def test_word_offsets(self):
+        quote = "Self-respect permeates  every aspect"
+        quote_words = QuoteWords(quote)
+
+        self.assertEqual(quote_words.get_offset_list(), [0, 13, 24, 30])
+        for word, offset in zip(quote_words.words, quote_words.offsets):
+            self.assertEqual(quote[offset:offset + len(word)], word)
+
+    def test_is_word_at(self):
+        quote_words = QuoteWords("Testing quote!")
+
+        self.assertTrue(quote_words.is_word_at("quote!", 1))
+        self.assertFalse(quote_words.is_word_at("Testing", 1))
+        self.assertFalse(quote_words.is_word_at("quote!", 2))
+
+    def test_quote_is_tokenized_once(self):
+        self.assertIs(tokenize_quote("Testing quote!"), tokenize_quote("Testing quote!"))
+
+
+class QuoteDifficultyTestCase(SimpleTestCase):
+    def test_harder_quotes_score_higher(self):
+        quotes = [
+            "Be yourself.",
+            "Don't cry because it's over, smile because it happened.",
+            "Self-respect permeates every aspect of our lives, it's a matter of \"courage\" (and nothing else); "
+            "Joan Didion wrote about it in 1961.",
+            "Incomprehensibility—“nevertheless”—characterizes (42%) of #metaphysical; deliberations!",
+        ]
+        scores = [get_difficulty_score(quote) for quote in quotes]
+
+        self.assertEqual(scores, sorted(scores))
+        self.assertTrue(all(0 <= score <= 1 for score in scores))
+        self.assertEqual(get_difficulty(quotes[0]), "easy")
+        self.assertEqual(get_difficulty(quotes[-1]), "hard")
+
+    def test_empty_quote(self):
+        self.assertEqual(get_difficulty_score(""), 0)
+
+
+class RandomQuoteTestCase(TestCase):
+    def setUp(self):
+        self.quote = Quotes.objects.create(quote="Testing quote!", author="Tester")
+        for category_name in ["Fun", "Application-making"]:
+            self.quote.categories.add(Categories.objects.create(category=category_name))
+
+    def test_random_quote_payload_is_cached(self):
+        services.get_quote_ids()
+
+        with self.assertNumQueries(2):
+            quote = services.get_random_quote_payload()
+
+        self.assertEqual(quote, {
+            'id': self.quote.id,
+            'quote': "Testing quote!",
+            'author': "Tester",
+            'categories': ["Fun", "Application-making"],
+        })
+
+        with self.assertNumQueries(0):
+            self.assertEqual(services.get_random_quote_payload(), quote)
+
+    def test_quote_ids_are_refreshed_when_quotes_change(self):
+        self.assertEqual(list(services.get_quote_ids()), [self.quote.id])
+
+        new_quote = Quotes.objects.create(quote="Another quote", author="Tester")
+        self.assertEqual(list(services.get_quote_ids()), [self.quote.id, new_quote.id])
+
+        self.quote.delete()
+        self.assertEqual(list(services.get_quote_ids()), [new_quote.id])
+        self.assertEqual(services.get_random_quote_payload()['categories'], [])
+
+    def test_quote_payload_is_invalidated(self):
+        services.get_quote_payload(self.quote.id)
+
+        self.quote.author = "Another tester"
+        self.quote.save()
+        self.assertEqual(services.get_quote_payload(self.quote.id)['author'], "Another tester")
+
+        category = Categories.objects.create(category="Life")
+        category.quote.add(self.quote)
+        self.assertIn("Life", services.get_quote_payload(self.quote.id)['categories'])
+
+        category.category = "Love"
+        category.save()
+        self.assertIn("Love", services.get_quote_payload(self.quote.id)['categories'])
+
+        category.delete()
+        self.assertNotIn("Love", services.get_quote_payload(self.quote.id)['categories'])
+
+        self.quote.categories.clear()
+        self.assertEqual(services.get_quote_payload(self.quote.id)['categories'], [])
+
+    def test_difficulty_buckets(self):
+        hard_quote = Quotes.objects.create(
+            quote="Incomprehensibility—“nevertheless”—characterizes (42%) of #metaphysical; deliberations!", author="Tester",
+        )
+        self.assertEqual(hard_quote.difficulty, "hard")
+
+        self.assertEqual(list(services.get_difficulty_quote_ids("hard")), [hard_quote.id])
+        services.get_quote_payload(hard_quote.id)
+
+        # Quotes are drawn from the cached bucket, the table isn't scanned.
+        with self.assertNumQueries(0):
+            self.assertEqual(services.get_random_quote_payload({'difficulty': "hard"})['id'], hard_quote.id)
+
+        hard_quote.quote = "now it is easy"
+        hard_quote.save()
+        self.assertEqual(list(services.get_difficulty_quote_ids("hard")), [])
+        self.assertIn(hard_quote.id, services.get_difficulty_quote_ids("easy"))
+
+    def test_no_quotes(self):
+        Quotes.objects.all().delete()
+
+        with self.assertRaises(Quotes.DoesNotExist):
+            services.get_random_quote_payload()
+
+
+class ImportQuotesTestCase(TestCase):
+    dataset = [
+        {"Quote": "Testing quote!", "Author": "Tester", "Tags": ["test"], "Popularity": 0.5, "Category": "life"},
+        {"Quote": "Testing quote!", "Author": "Tester", "Tags": ["test", "Fun "], "Popularity": 0.6, "Category": "fun"},
+        {"Quote": "Testing quote!", "Author": "Tester", "Tags": ["test"], "Popularity": 0.5, "Category": "fun"},
+        {"Quote": "Another quote", "Author": "Tester", "Tags": [], "Popularity": 0.1, "Category": "life"},
+        {"Quote": "Another quote", "Author": "Someone else", "Tags": [], "Popularity": 0.1, "Category": "life"},
+    ]
+
+    def setUp(self):
+        dataset_file, self.dataset_path = tempfile.mkstemp(suffix='.json')
+
+        with os.fdopen(dataset_file, 'w') as file:
+            json.dump(self.dataset, file, indent=2)
+
+    def tearDown(self):
+        os.remove(self.dataset_path)
+
+    def import_quotes(self, *args):
+        output = io.StringIO()
+        call_command('import_quotes', self.dataset_path, *args, stdout=output)
+        return output.getvalue()
+
+    def test_quotes_are_deduplicated(self):
+        output = self.import_quotes('--batch-size', '2')
+
+        self.assertIn('rows/s', output)
+        self.assertEqual(Quotes.objects.count(), 3)
+        self.assertEqual(Categories.objects.count(), 2)
+
+        quote = Quotes.objects.get(quote="Testing quote!")
+        self.assertEqual(sorted(category.category for category in quote.categories.all()), ["fun", "life"])
+        self.assertEqual(quote.tags, ["test", "fun"])
+        self.assertEqual(quote.popularity, 0.6)
+        self.assertEqual((quote.length, quote.word_count), (14, 2))
+        self.assertEqual(Categories.objects.get(category="life").quote.count(), 3)
+
+    def test_duplicates_are_merged_across_batches(self):
+        self.import_quotes('--batch-size', '1')
+
+        quote = Quotes.objects.get(quote="Testing quote!")
+        self.assertEqual(quote.tags, ["test", "fun"])
+        self.assertEqual(quote.popularity, 0.6)
+        self.assertEqual(Quotes.objects.filter(tags__contains=["fun"]).count(), 1)
+
+    def test_existing_quotes_are_kept(self):
+        quote = Quotes.objects.create(quote="Testing quote!", author="Tester")
+        quote.categories.add(Categories.objects.create(category="life"))
+
+        self.import_quotes()
+
+        self.assertEqual(Quotes.objects.count(), 3)
+        self.assertEqual(Categories.objects.count(), 2)
+        self.assertEqual(quote.categories.count(), 2)
+
+        quote.refresh_from_db()
+        self.assertEqual(quote.tags, ["test", "fun"])
+
+    def test_same_dataset_is_imported_once(self):
+        self.import_quotes()
+
+        with self.assertNumQueries(1):
+            output = self.import_quotes()
+
+        self.assertIn('imported already', output)
+        self.assertEqual(QuoteImport.objects.get().amount_of_quotes, 3)
+
+        Quotes.objects.all().delete()
+        self.import_quotes('--force')
+        self.assertEqual(Quotes.objects.count(), 3)
+
+    def test_quote_ids_are_refreshed_after_import(self):
+        self.import_quotes()
+
+        self.assertIn(services.get_random_quote_payload()['author'], ["Tester", "Someone else"])
+
+        with self.assertNumQueries(0):
+            amount_of_quotes = sum(len(services.get_difficulty_quote_ids(difficulty)) for difficulty in ["easy", "medium", "hard"])
+
+        self.assertEqual(amount_of_quotes, 3)
+
+
+class JsonArrayStreamTestCase(SimpleTestCase):
+    def test_items_split_between_chunks(self):
+        items = ImportQuotesTestCase.dataset
+        parsed_items = list(iter_json_array(io.StringIO(json.dumps(items, indent=2)), chunk_size=7))
+
+        self.assertEqual(parsed_items, items)
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array(io.StringIO(' [ ] '))), [])
+
+    def test_incomplete_array(self):
+        with self.assertRaises(CommandError):
+            list(iter_json_array(io.StringIO('[{"Quote": "Testing"}, {"Quote": '), chunk_size=4))
+
+        with self.assertRaises(CommandError):
+            list(iter_json_array(io.StringIO('{"Quote": "Testing"}')))
+
+
+class QuoteFiltersTestCase(APITestCase):
+    def setUp(self):
+        user = User.objects.create(username='TestUser1', password='TestPass.123')
+        self.headers = {'Authorization': f"Bearer {str(RefreshToken.for_user(user).access_token)}"}
+
+        self.short_quote = Quotes.objects.create(quote="Short one.", author="Tester", tags=["life", "fun"], popularity=0.9)
+        self.long_quote = Quotes.objects.create(
+            quote="A considerably longer quote about life and everything.", author="Tester", tags=["life"], popularity=0.1,
+        )
+
+    def generate_quotes(self, query, amount_of_quotes=10):
+        responses = [self.client.get(f'/api/generate_quote/?{query}', headers=self.headers) for _ in range(amount_of_quotes)]
+        return {response.json()['quote'] for response in responses}
+
+    def test_filter_by_tags(self):
+        self.assertEqual(self.generate_quotes('tags=fun'), {self.short_quote.quote})
+        self.assertEqual(self.generate_quotes('tags=life&tags=Fun'), {self.short_quote.quote})
+        self.assertEqual(self.generate_quotes('tags=life', 30), {self.short_quote.quote, self.long_quote.quote})
+
+    def test_filter_by_length_and_popularity(self):
+        self.assertEqual(self.generate_quotes('min_length=20'), {self.long_quote.quote})
+        self.assertEqual(self.generate_quotes('max_length=20'), {self.short_quote.quote})
+        self.assertEqual(self.generate_quotes('min_popularity=0.5'), {self.short_quote.quote})
+
+    def test_filtered_quotes_follow_changes(self):
+        self.assertEqual(self.generate_quotes('tags=fun'), {self.short_quote.quote})
+
+        self.short_quote.tags = ["life"]
+        self.short_quote.save()
+
+        response = self.client.get('/api/generate_quote/?tags=fun', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+    def test_wrong_filters(self):
+        self.assertEqual(self.client.get('/api/generate_quote/?min_length=a', headers=self.headers).status_code, 400)
+        self.assertEqual(self.client.get('/api/generate_quote/?min_length=30&max_length=10', headers=self.headers).status_code, 400)
+        self.assertEqual(self.client.get('/api/generate_quote/?max_popularity=2', headers=self.headers).status_code, 400)
+
+    def test_tags_query_plan(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+        query_plan = services.filter_quotes(Quotes.objects.all(), tags=["life"]).explain()
+        self.assertIn('quote_tags_idx', query_plan)
+
+        query_plan = services.filter_quotes(Quotes.objects.all(), min_length=10, max_length=20).explain()
+        self.assertIn('quote_length_idx', query_plan)
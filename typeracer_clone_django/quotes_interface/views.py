@@ -1,33 +1,32 @@
-import random
-
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
-from .models import Quotes, Categories
-from .serializers import QuoteSerializer
+from .models import Quotes
+from .serializers import QuoteSerializer, QuoteFiltersSerializer
+from . import services
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def quote_generator(request, format=None):
     """
-    Randomly generates a quote to type and returns it.
+    Randomly generates a quote to type and returns it. Quotes can be
+    filtered by tags, length and popularity.
     """
 
     if request.method == "GET":
-        quotes = Quotes.objects.all()
-        random_quote = random.choice(list(quotes))
+        filters_serializer = QuoteFiltersSerializer(data=request.query_params)
 
+        if not filters_serializer.is_valid():
+            return Response(filters_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        categories = quotes.get(id = random_quote.id).categories.all()
-        category_list = []
-        for category in list(categories):
-            category_list.append(category.category)
+        try:
+            random_quote = services.get_random_quote_payload(filters_serializer.validated_data)
+        except Quotes.DoesNotExist:
+            return Response({"error" : "There are no quotes yet"}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = QuoteSerializer(data = {'quote' : random_quote.quote, 'author' : random_quote.author, 'categories': category_list,})
-        # serializer.is_valid()
+        serializer = QuoteSerializer(data = {'quote' : random_quote['quote'], 'author' : random_quote['author'], 'categories': random_quote['categories'],})
 
-        print(serializer.initial_data)
         return Response(serializer.initial_data)
@@ -0,0 +1,42 @@
+import re
+from array import array
+from functools import lru_cache
+
+
+WORD_PATTERN = re.compile(r'\S+')
+
+
+class QuoteWords:
+    """
+    Words of the quote split the same way as ``str.split()`` does, together
+    with the offset of every word inside of the quote.
+    """
+    __slots__ = ('words', 'offsets')
+
+    def __init__(self, quote):
+        words = []
+        offsets = array('I')
+
+        for match in WORD_PATTERN.finditer(quote):
+            words.append(match.group())
+            offsets.append(match.start())
+
+        self.words = tuple(words)
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.words)
+
+    def is_word_at(self, word, word_index):
+        return word_index < len(self.words) and self.words[word_index] == word
+
+    def get_offset_list(self):
+        return self.offsets.tolist()
+
+
+@lru_cache(maxsize=1024)
+def tokenize_quote(quote):
+    """
+    Returns words of the quote, every quote is tokenized only once per process.
+    """
+    return QuoteWords(quote)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RaceHandlerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'race_handler'
+
+    def ready(self):
+        from . import signals
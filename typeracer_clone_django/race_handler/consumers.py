@@ -1,161 +1,258 @@
-import threading
-import random
-import time
 import datetime
 
 
 from django.db.models import Q
-from django.core.cache import cache
 from django.conf import settings
-from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.db import transaction
-from django.db import connection
 
-from asgiref.sync import async_to_sync
-from channels.generic.websocket import JsonWebsocketConsumer
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
 
 from . import models
-from quotes_interface.models import Quotes
+from .race_state import acquire_race_state, release_race_state, parse_race_date
+from .scheduler import race_start_scheduler
+from .reaper import race_reaper
+from . import lobby
+from .places import claim_finishing_place
+from .progress import RaceProgressBatcher
+from . import protocol
+from .typist import TypistState
+from .replay import ReplayRecorder
+from .matchmaking import matchmaker, get_player_band
+from statistics_page import services as statistics_services
+from statistics_page import leaderboards
 
-class RaceHandlerConsumer(JsonWebsocketConsumer):
+MAX_KEYSTROKES_PER_MESSAGE = 256
+
+
+class RaceHandlerConsumer(AsyncJsonWebsocketConsumer):
 
     def __init__(self, *args, **kwargs):
-        super().__init__(args, kwargs)
+        super().__init__(*args, **kwargs)
         self.race_model = None
+        self.race_state = None
         self.word_index = 0
+        self.typist_state = TypistState()
+        self.replay_recorder = ReplayRecorder()
         self.requires_cleanup = True
+        self.protocol = protocol.JSON_PROTOCOL
+
 
+    async def connect(self):
 
-    def connect(self):
-        
         self.race_id = self.scope['url_route']['kwargs']['race_id']
 
         if not self.check_if_authenticated():
             self.requires_cleanup = False
-            self.close()
+            await self.close()
             return
-        
-        self.race_model = self.get_corresponding_race_model()
 
-        if not self.race_model:
+        is_joined, is_timer_started = await self.join_race()
+
+        if not is_joined:
             self.requires_cleanup = False
-            self.close()
+            await self.close()
             return
 
-        
+        race_start_date = self.get_race_start_date_or_none()
+        self.race_state = acquire_race_state(self.race_model)
+        self.protocol = protocol.get_protocol(self.scope)
 
-        if self.check_if_already_participates():
-            self.requires_cleanup = False
-            self.close()
-            return
+        await self.channel_layer.group_add(self.race_id, self.channel_name)
+        await self.accept(self.get_subprotocol_or_none())
 
-        self.add_current_user_to_participants_list()
+        race_start_scheduler.ensure_running()
+        race_reaper.ensure_running()
 
-        race_start_date = self.get_race_start_date_or_none()
+        if is_timer_started:
+            self.race_state.put_on_timer(race_start_date)
+            await self.start_race_at(race_start_date)
 
-        if len(self.get_participants().all()) >= 3 and not self.is_race_started():
-            race_start_date = self.calculate_date_after(10.0)
-            self.set_race_start_date(race_start_date)
-            self.start_race_at(race_start_date)
-        
-        self.share_race_organisational_info(race_start_date or None)
+        await self.share_race_organisational_info(race_start_date)
 
 
-    def disconnect(self, close_code):
+    async def disconnect(self, close_code):
         if not self.requires_cleanup:
             return
 
-        self.remove_current_user_from_participants_list()
+        await self.flush_current_user_race_progress()
+        await self.channel_layer.group_discard(self.race_id, self.channel_name)
+        release_race_state(self.race_id)
 
-        if len(self.get_participants().all()) == 0 and not self.is_race_finished():
-            self.delete_race_from_db()
+        is_race_deleted, race_start_date = await self.leave_race()
+
+        if is_race_deleted:
             return
 
-        race_start_date = self.get_race_start_date_or_none()
+        await self.share_race_organisational_info(race_start_date)
 
-        self.share_race_organisational_info(race_start_date)
-    
-    @transaction.atomic
-    def receive_json(self, content, **kwargs):
-        # print("Some client activity was received")
-        self.race_model.refresh_from_db()
-        # print(self.race_model.participants.all())
+    def get_subprotocol_or_none(self):
+        if protocol.MSGPACK_SUBPROTOCOL in self.scope.get('subprotocols', ()):
+            return protocol.MSGPACK_SUBPROTOCOL
+
+        return None
+
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        if self.protocol == protocol.MSGPACK_PROTOCOL and bytes_data is not None:
+            try:
+                content = protocol.decode_message(bytes_data)
+            except protocol.InvalidMessage:
+                await self.send_error_wrong_message_format()
+                return
+
+            await self.receive_json(content, **kwargs)
+            return
+
+        await super().receive(text_data, bytes_data, **kwargs)
+
+    async def send_json(self, content, close=False):
+        if self.protocol == protocol.MSGPACK_PROTOCOL:
+            await self.send(bytes_data=protocol.encode_message(content), close=close)
+            return
+
+        await super().send_json(content, close)
+
+    async def receive_json(self, content, **kwargs):
         content_type = self.get_content_type_or_none(content)
-        
+
         if content_type is None:
-            self.send_error_wrong_message_format()
+            await self.send_error_wrong_message_format()
             return
 
         if content_type == 'race_action':
-            if content['action'] == 'start_race':
-                
+            if content.get('action') == 'start_race':
+
                 if not self.is_race_started():
                     race_start_date = self.calculate_date_after(5.0)
-                    self.set_race_start_date(race_start_date)
-                    self.start_race_at(race_start_date)
-                
-                    self.share_race_organisational_info(race_start_date)
-                    
+
+                    if not await self.set_race_start_timer(race_start_date):
+                        return
+
+                    self.race_state.put_on_timer(race_start_date)
+                    await self.start_race_at(race_start_date)
+
+                    await self.share_race_organisational_info(race_start_date)
+
                     return
 
             else:
-                self.send_error_wrong_message_format()
+                await self.send_error_wrong_message_format()
                 return
 
         if self.is_race_available_to_join():
-            print("race is not available to join")
             return
-        
+
         if content_type == 'race_progress':
-            print("calculating race progress")
-            quote = self.get_quote_of_the_game()
-            
-            if not self.is_typed_word_valid(content, quote):
-                self.send_error_wrong_message_format()
-                return 
+            if not self.is_typed_word_valid(content):
+                await self.send_error_wrong_message_format()
+                return
 
-            self.share_current_user_race_progress()
+            self.replay_recorder.record_word(self.get_racing_time_in_seconds() * 1000)
+            await self.share_current_user_race_progress()
 
             self.word_index += 1
 
-            if self.did_player_finish_the_race(quote):
-                self.record_finished_player_stats_to_db(quote)
-                self.mark_race_as_finished_in_db()
-                self.share_finished_player_stats()
-    
+            await self.finish_race_if_player_finished()
+
+        elif content_type == 'race_keystrokes':
+            keystrokes = self.get_keystrokes_or_none(content)
+
+            if keystrokes is None:
+                await self.send_error_wrong_message_format()
+                return
+
+            if self.did_player_finish_the_race():
+                return
+
+            keys, client_elapsed_ms = keystrokes
+            self.typist_state.type_keys(
+                keys, self.race_state.quote, client_elapsed_ms, self.get_racing_time_in_seconds() * 1000
+            )
+            self.replay_recorder.record_keys(self.typist_state.elapsed_ms, keys)
+
+            await self.share_completed_words()
+            await self.finish_race_if_player_finished()
+
         else:
-            self.send_error_wrong_message_format()
-        
-    def get_current_users_statistics(self):
-        return self.race_model.statistics.get(player=self.get_ws_user_info())
-        
-
-    def serialize_finished_player_stats(self):
-        stats = self.get_current_users_statistics()
-        print(f"time_racing: {stats.time_racing.seconds}")
+            await self.send_error_wrong_message_format()
+
+    async def finish_race_if_player_finished(self):
+        if not self.did_player_finish_the_race():
+            return
+
+        finished_player_stats = await self.finish_race()
+        await self.flush_current_user_race_progress()
+        await self.send_everyone(finished_player_stats)
+
+    def get_keystrokes_or_none(self, content):
+        """
+        Returns typed keys and the time they were typed at, in milliseconds
+        since the race start, or ``None`` if the message is malformed.
+        """
+        keys = content.get('keys')
+        client_elapsed_ms = content.get('time')
+
+        if not isinstance(keys, str) or not 0 < len(keys) <= MAX_KEYSTROKES_PER_MESSAGE:
+            return None
+
+        if isinstance(client_elapsed_ms, bool) or not isinstance(client_elapsed_ms, (int, float)) or client_elapsed_ms < 0:
+            return None
+
+        return keys, client_elapsed_ms
+
+    async def share_completed_words(self):
+        """
+        Shares progress for every word the keystrokes have completed, the
+        same way it's shared for the words sent one by one.
+        """
+        quote_words = self.race_state.quote_words
+
+        while self.word_index < len(quote_words):
+            word_end = quote_words.offsets[self.word_index] + len(quote_words.words[self.word_index])
+
+            if self.typist_state.position < word_end:
+                break
+
+            self.replay_recorder.record_word(self.typist_state.elapsed_ms)
+            await self.share_current_user_race_progress()
+            self.word_index += 1
+            self.typist_state.commit(word_end)
+
+    def serialize_finished_player_stats(self, stats):
         return {
             'type': 'race_player_finished',
             'player_id': self.get_ws_user_info().id,
             'time_racing': str(stats.time_racing),
             'place': stats.place,
             'average_speed': stats.average_speed,
+            'wpm': stats.wpm,
+            'accuracy': stats.accuracy,
+            'errors': stats.errors,
         }
 
-    def share_finished_player_stats(self):
-        self.send_everyone(self.serialize_finished_player_stats())
-    
+    @database_sync_to_async
+    @transaction.atomic
+    def finish_race(self):
+        stats = self.record_finished_player_stats_to_db(self.race_state.quote)
+        statistics_services.record_race_in_player_summary(stats)
+        transaction.on_commit(lambda: leaderboards.record_race(
+            stats.player_id, self.race_state.quote_id, stats.average_speed, self.race_state.start_date
+        ))
+        self.mark_race_as_finished_in_db()
+        return self.serialize_finished_player_stats(stats)
+
     def delete_race_from_db(self):
         self.race_model.delete()
 
     def get_content_type_or_none(self, content):
         try:
             return content['type']
-        except KeyEror:
+        except (KeyError, TypeError):
             return None
 
-    def send_error_wrong_message_format(self):
-        self.send_json({
+    async def send_error_wrong_message_format(self):
+        await self.send_json({
                 'type' : 'error',
                 'text' : 'Wrong message format',
             })
@@ -166,49 +263,37 @@ class RaceHandlerConsumer(JsonWebsocketConsumer):
         except KeyError:
             return None
 
-    def get_quote_of_the_game(self):
-        return self.race_model.quote.quote
+    def is_word_typed_in_correct_order(self, word):
+        return self.race_state.is_word_at(word, self.word_index)
 
-    def is_word_typed_in_correct_order(self, word, quote):
-        word_list = quote.split()
-
-        if word == word_list[self.word_index]:
-            return True
-        else:
-            return False
-
-    def is_typed_word_valid(self, content, quote):
+    def is_typed_word_valid(self, content):
         word = self.get_typed_word_or_none(content)
-        
+
         if word is None:
             return False
-        
-        
-        if not self.is_word_typed_in_correct_order(word, quote):
+
+
+        if not self.is_word_typed_in_correct_order(word):
             return False
 
         return True
 
-    def did_player_finish_the_race(self, quote):
-        if len(quote.split()) == self.word_index:
+    def did_player_finish_the_race(self):
+        if self.race_state.get_amount_of_words() == self.word_index:
             return True
         else:
             return False
-        
+
     def mark_race_as_finished_in_db(self):
         self.change_race_status('f')
 
     def get_racing_time_in_seconds(self):
         finish_date = timezone.now()
-        starting_date = self.race_model.start_date
-        print(f"get_racing_time_in_seconds: {(finish_date - starting_date).total_seconds()}")
+        starting_date = self.race_state.start_date
         return (finish_date - starting_date).total_seconds()
 
-    def get_race_statistics_list(self):
-        return self.race_model.statistics.all()
-
     def get_current_users_place(self):
-        return len(self.get_race_statistics_list()) + 1
+        return claim_finishing_place(self.race_id)
 
     def calculate_average_speed(self, racing_time, quote):
         quote_length = len(quote)
@@ -216,146 +301,184 @@ class RaceHandlerConsumer(JsonWebsocketConsumer):
 
     def record_finished_player_stats_to_db(self, quote):
         racing_time_in_seconds = self.get_racing_time_in_seconds()
-        
-        models.RaceStatistics.objects.create(
+        recorded_figures = {}
+
+        if self.typist_state.has_typed():
+            recorded_figures = {
+                'wpm': self.typist_state.wpm,
+                'accuracy': self.typist_state.accuracy,
+                'errors': self.typist_state.errors,
+            }
+
+        if self.replay_recorder.has_events():
+            recorded_figures['replay'] = self.replay_recorder.to_file(f'{self.race_id}_{self.get_ws_user_info().id}.replay')
+
+        return models.RaceStatistics.objects.create(
+            **recorded_figures,
             time_racing = datetime.timedelta(milliseconds=(racing_time_in_seconds*1000)),
             finished = True,
             player=self.get_ws_user_info(),
-            race=self.race_model,
+            race_id=self.race_id,
             place=self.get_current_users_place(),
             average_speed=self.calculate_average_speed(racing_time_in_seconds, quote),
-        )        
+        )
+
+    def get_race_progress_batcher(self):
+        if self.race_state.progress_batcher is None:
+            self.race_state.progress_batcher = RaceProgressBatcher(
+                self.race_id, self.channel_layer, settings.RACE_PROGRESS_TICK_MS / 1000
+            )
+
+        return self.race_state.progress_batcher
 
-    def share_current_user_race_progress(self):
-        print(f"user got progress: {self.get_ws_user_info().id}")
-        self.send_everyone({
+    async def share_current_user_race_progress(self):
+        if settings.RACE_PROGRESS_TICK_MS:
+            self.get_race_progress_batcher().add(self.get_ws_user_info().id, self.word_index)
+            return
+
+        await self.send_everyone({
                 'type': 'race_progress',
                 'player_id': self.get_ws_user_info().id,
                 'word_index': self.word_index,
             })
 
-    def calculate_time_before_start_in_seconds(self, start_date):
-        return (start_date - timezone.now()).total_seconds()
+    async def flush_current_user_race_progress(self):
+        """
+        Sends progress of the current user which is still waiting for the
+        tick, so it isn't received after the user has finished or left.
+        """
+        if self.race_state is not None and self.race_state.progress_batcher is not None:
+            await self.race_state.progress_batcher.flush(self.get_ws_user_info().id)
 
     def change_race_status(self, status):
-        self.race_model.status = status
-        self.race_model.save()
-
-    def change_race_status_to_on_timer(self):
-        self.race
-
-    def start_race_at(self, start_date):
-        if self.is_race_started():
-            return
-
-        self.change_race_status("t")
-
-        time_before_start_in_seconds = self.calculate_time_before_start_in_seconds(start_date)
-
-        starting = threading.Thread(target=self.start_race, kwargs={'time_before_start' : time_before_start_in_seconds})
-        starting.start()
-        
-
-    def wait(self, waiting_time):
-        time.sleep(waiting_time)
+        models.Race.objects.filter(id=self.race_id).update(status=status)
 
-    def get_quotes_categories(self, quote):
-        categories = Quotes.objects.get(id = quote.id).categories.all()
-        
-        category_list = []
-        for category in list(categories):
-            category_list.append(category.category)
+    @database_sync_to_async
+    def set_race_start_timer(self, start_date):
+        if not self.put_race_on_timer_in_db(start_date):
+            return False
 
-        return category_list
+        lobby.set_lobby_race_status(self.race_id, "t")
+        return True
 
+    async def start_race_at(self, start_date):
+        await race_start_scheduler.schedule(self.race_id, start_date)
 
-    def get_random_quote(self):
-        quotes_to_choose = Quotes.objects.all()
 
-        return random.choice(list(quotes_to_choose))
+    async def player_list(self, event):
+        self.race_state.set_participants(event['players'])
 
+        if 'time' in event:
+            self.race_state.put_on_timer(parse_race_date(event['time']))
 
+        await self.send_json(event)
 
-    def record_race_start_info_to_db(self, quote, status):
-        self.race_model.status = status
-        self.race_model.quote = quote
-        self.race_model.save()
+    async def race_starting_timer(self, event):
+        await self.send_json(event)
 
-    def share_race_start_info(self, quote, categories):
-        self.send_everyone({
-            'type' : 'race_start',
-            'quote' : quote.quote,
-            'author' : quote.author,
-            'categories' : categories,
-        })
+    async def race_start(self, event):
+        self.race_state.start(event['quote'], parse_race_date(event['time']), event.get('quote_id'))
+        await self.send_json(event)
 
+    async def race_progress(self, event):
+        await self.send_json(event)
 
-    def start_race(self, time_before_start):
-        self.wait(time_before_start)
-        
-        quote = self.get_random_quote()
-        categories = self.get_quotes_categories(quote)
-        
-        self.record_race_start_info_to_db(quote, "s")
+    async def race_progress_batch(self, event):
+        await self.send_json(event)
 
-        self.share_race_start_info(quote, categories)
-        
-        
-    def player_list(self, event):
-        self.send_json(event)
-    
-    def race_starting_timer(self, event):
-        self.send_json(event)
+    async def race_player_finished(self, event):
+        self.race_state.finish()
+        await self.send_json(event)
 
-    def race_start(self, event):
-        self.send_json(event)
+    async def ghost_progress(self, event):
+        await self.send_json(event)
 
-    def race_progress(self, event):
-        self.send_json(event)
+    async def ghost_finished(self, event):
+        await self.send_json(event)
 
-    def race_player_finished(self, event):
-        self.send_json(event)
+    async def server_close(self, event):
+        await self.close()
 
-    def server_close(self, event):
-        self.close()
+    async def send_everyone(self, dict_to_send):
+        await self.channel_layer.group_send(self.race_id, dict_to_send)
 
-    def send_everyone(self, dict_to_send):
-        async_to_sync(self.channel_layer.group_send)(self.race_id, dict_to_send)
-        
     def check_if_authenticated(self):
         if not self.get_ws_user_info().is_authenticated:
             return False
         else:
             return True
 
-    def get_corresponding_race_model(self):
-        race_id = self.scope['url_route']['kwargs']['race_id']
-
-        try: 
-            return models.Race.objects.get(Q(id = race_id), (Q(status="w") | Q(status="t")))
-        except:
+    def get_corresponding_race_model_for_update(self):
+        try:
+            return models.Race.objects.select_for_update(of=('self',)).select_related('quote', 'creator').get(
+                Q(id = self.race_id), (Q(status="w") | Q(status="t"))
+            )
+        except models.Race.DoesNotExist:
             return None
 
     def get_ws_user_info(self):
         return self.scope['user']
 
     def add_current_user_to_participants_list(self):
-        print(f"adding user to participant list: {self.get_ws_user_info().id}")
-        self.get_participants().add(get_user_model().objects.get(id=self.get_ws_user_info().id))
-        self.race_model.save()
-        async_to_sync(self.channel_layer.group_add)(self.race_id, self.channel_name)
-        self.accept()
-        print(f"participants list for now: {self.get_participants().all()}")
+        self.get_participants().add(self.get_ws_user_info().id)
 
     def remove_current_user_from_participants_list(self):
-        self.get_participants().remove(get_user_model().objects.get(id=self.get_ws_user_info().id))
-        self.race_model.save()
-        
-        async_to_sync(self.channel_layer.group_discard)(self.race_id, self.channel_name)
+        self.get_participants().remove(self.get_ws_user_info().id)
+
+    @database_sync_to_async
+    @transaction.atomic
+    def join_race(self):
+        """
+        Adds current user to the race and puts the race on timer once there
+        are enough players. The race row stays locked until the transaction
+        ends, so simultaneous joins are counted one after another and only
+        one of them starts the timer. Returns whether the user has joined and
+        whether the timer was started by this join.
+        """
+        self.race_model = self.get_corresponding_race_model_for_update()
+
+        if self.race_model is None or self.check_if_already_participates():
+            return False, False
+
+        self.add_current_user_to_participants_list()
+
+        amount_of_players = self.get_participants().count()
+        is_timer_started = amount_of_players >= 3 and self.race_model.status == "w"
+
+        if is_timer_started:
+            self.put_locked_race_on_timer(self.calculate_date_after(10.0))
+
+        lobby.save_lobby_race(self.race_model, amount_of_players)
+
+        return True, is_timer_started
+
+    @database_sync_to_async
+    @transaction.atomic
+    def leave_race(self):
+        """
+        Removes current user from the race and deletes the race if nobody
+        is left in it. Returns whether the race was deleted and its start date.
+        """
+        try:
+            self.race_model = models.Race.objects.select_for_update(of=('self',)).select_related('creator').get(id=self.race_id)
+        except models.Race.DoesNotExist:
+            return True, None
+
+        self.remove_current_user_from_participants_list()
+
+        amount_of_players = self.get_participants().count()
+
+        if amount_of_players == 0 and not self.is_race_finished():
+            self.delete_race_from_db()
+            return True, None
+
+        lobby.save_lobby_race(self.race_model, amount_of_players)
+
+        return False, self.get_race_start_date_or_none()
 
     def get_participants(self):
         return self.race_model.participants
-        
+
     def check_if_already_participates(self):
         if self.get_participants().filter(id=self.get_ws_user_info().id).exists():
             return True
@@ -366,31 +489,28 @@ class RaceHandlerConsumer(JsonWebsocketConsumer):
         return timezone.now() + datetime.timedelta(seconds=seconds)
 
     def is_race_started(self):
-        if self.race_model.status == "w":
-            return False
-        else:
-            return True
+        return self.race_state.is_started()
 
     def is_race_available_to_join(self):
-        print(self.race_model.status)
-        if self.race_model.status == "w" or self.race_model.status == "t":
-            return True
-        else:
-            return False
+        return self.race_state.is_available_to_join()
 
     def is_race_finished(self):
-        if self.race_model.status == "f":
-            return True
-        else:
-            return False
+        return self.race_model.status == "f"
 
-    def set_race_start_date(self, start_date):
+    def put_locked_race_on_timer(self, start_date):
         self.race_model.start_date = start_date
-        self.race_model.save()
+        self.race_model.status = "t"
+        self.race_model.save(update_fields=['start_date', 'status'])
+
+    def put_race_on_timer_in_db(self, start_date):
+        """
+        Puts the race on timer unless some other player has already done it.
+        """
+        return models.Race.objects.filter(id=self.race_id, status="w").update(start_date=start_date, status="t") == 1
 
     def get_race_start_date_or_none(self):
         return self.race_model.start_date
-        
+
     def serialize_participants(self):
         participants_qs = self.get_participants().all()
 
@@ -401,14 +521,104 @@ class RaceHandlerConsumer(JsonWebsocketConsumer):
 
         return participant_list
 
-    def share_race_organisational_info(self, start_date):
+    async def share_race_organisational_info(self, start_date):
 
         game_info = {
             'type': 'player_list',
-            'players': self.serialize_participants(),
+            'players': await database_sync_to_async(self.serialize_participants)(),
         }
 
         if start_date is not None:
             game_info['time'] = start_date.isoformat()
 
-        self.send_everyone(game_info)
+        await self.send_everyone(game_info)
+
+
+class LobbyConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Sends the list of available races once the client connects and then
+    every change of it, so clients don't have to poll the race list.
+    """
+
+    async def connect(self):
+        await self.channel_layer.group_add(lobby.LOBBY_GROUP, self.channel_name)
+        await self.accept()
+        await self.send_lobby_snapshot()
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(lobby.LOBBY_GROUP, self.channel_name)
+
+    async def send_lobby_snapshot(self):
+        version, races = await database_sync_to_async(lobby.get_lobby_snapshot)()
+
+        await self.send_json({
+            'type': 'lobby',
+            'races': races,
+            'version': version,
+        })
+
+    async def race_added(self, event):
+        await self.send_json(event)
+
+    async def race_changed(self, event):
+        await self.send_json(event)
+
+    async def race_started(self, event):
+        await self.send_json(event)
+
+    async def race_removed(self, event):
+        await self.send_json(event)
+
+    async def lobby_reset(self, event):
+        await self.send_lobby_snapshot()
+
+
+class MatchmakingConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Queues the player for a race with players of similar speed and sends
+    the race to join once it's found.
+    """
+
+    async def connect(self):
+        self.is_queued = False
+
+        if not self.scope['user'].is_authenticated:
+            await self.close()
+            return
+
+        await self.accept()
+
+        band = await get_player_band(self.scope['user'])
+        await matchmaker.enqueue(self.scope['user'].id, self.channel_name, band)
+        self.is_queued = True
+
+        await self.send_json({'type': 'queued', 'band': band})
+
+    async def disconnect(self, close_code):
+        if self.is_queued:
+            await matchmaker.dequeue(self.scope['user'].id, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if isinstance(content, dict) and content.get('type') == 'cancel':
+            await matchmaker.dequeue(self.scope['user'].id, self.channel_name)
+            self.is_queued = False
+            await self.close()
+            return
+
+        await self.send_json({
+            'type' : 'error',
+            'text' : 'Wrong message format',
+        })
+
+    async def match_found(self, event):
+        self.is_queued = False
+        await self.send_json(event)
+        await self.close()
+
+    async def match_failed(self, event):
+        self.is_queued = False
+        await self.send_json({
+            'type' : 'error',
+            'text' : "Race couldn't be created, queue again",
+        })
+        await self.close()
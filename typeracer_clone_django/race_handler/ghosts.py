@@ -0,0 +1,105 @@
+import asyncio
+import logging
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.utils import timezone
+
+from . import models
+from .replay import aiter_replay_events, open_replay_file, InvalidReplay
+from statistics_page import leaderboards
+
+
+logger = logging.getLogger(__name__)
+
+GHOST_CHOICES = ('best', 'top')
+# Leaders of the all-time leaderboard whose races are searched for the top ghost.
+TOP_GHOST_PLAYERS = 10
+
+# Tasks of the ghosts racing in this process, kept so they aren't garbage
+# collected before they are done.
+ghost_tasks = set()
+
+
+def find_ghost_or_none(ghost, player):
+    """
+    Returns the recorded race to race against, ``best`` is the fastest
+    race of the player and ``top`` is the fastest recorded race of the
+    fastest players on the all-time leaderboard.
+    """
+    races_statistics = models.RaceStatistics.objects.filter(finished=True, race__quote__isnull=False).exclude(replay='')
+
+    if ghost == 'best':
+        races_statistics = races_statistics.filter(player=player)
+    else:
+        # Only races of a few players are sorted, the best races of the
+        # leaders may have been finished before races were recorded.
+        top_player_ids = leaderboards.get_top_player_ids(leaderboards.get_leaderboard_key('all_time'), TOP_GHOST_PLAYERS)
+        races_statistics = races_statistics.filter(player_id__in=top_player_ids)
+
+    return races_statistics.order_by('-average_speed').first()
+
+
+def serialize_ghost(race_statistics):
+    player = race_statistics.player
+
+    return {
+        'id': race_statistics.id,
+        'player': {'id': player.id, 'username': player.username} if player is not None else None,
+        'time_racing': str(race_statistics.time_racing),
+        'average_speed': race_statistics.average_speed,
+    }
+
+
+@database_sync_to_async
+def get_ghost_or_none(ghost_id):
+    try:
+        return models.RaceStatistics.objects.select_related('player').get(id=ghost_id)
+    except models.RaceStatistics.DoesNotExist:
+        return None
+
+
+async def race_ghost(race_id, ghost, start_date):
+    """
+    Sends progress of the recorded race to the race group at the same time
+    after the start as it was typed. Only a small chunk of the replay is
+    read ahead of the progress being sent.
+    """
+    channel_layer = get_channel_layer()
+    # Every ghost reads the replay through its own file, the same recorded
+    # race can be raced against in many races at once.
+    replay_file = await open_replay_file(ghost.replay)
+
+    try:
+        async for event in aiter_replay_events(replay_file):
+            if event['type'] != 'word':
+                continue
+
+            delay = (start_date - timezone.now()).total_seconds() + event['time'] / 1000
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            await channel_layer.group_send(race_id, {
+                'type': 'ghost_progress',
+                'ghost_id': ghost.id,
+                'word_index': event['word_index'],
+            })
+    finally:
+        await sync_to_async(replay_file.close, thread_sensitive=False)()
+
+    await channel_layer.group_send(race_id, {'type': 'ghost_finished', **serialize_ghost(ghost)})
+
+
+async def run_ghost(race_id, ghost, start_date):
+    try:
+        await race_ghost(race_id, ghost, start_date)
+    except (InvalidReplay, OSError):
+        logger.exception("Couldn't replay the ghost of race %s", race_id)
+
+
+def start_ghost(race_id, ghost, start_date):
+    task = asyncio.create_task(run_ghost(race_id, ghost, start_date))
+    ghost_tasks.add(task)
+    task.add_done_callback(ghost_tasks.discard)
+    return task
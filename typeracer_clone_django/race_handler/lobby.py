@@ -0,0 +1,247 @@
+import base64
+import binascii
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import Count
+
+from . import models
+from config.redis_client import get_redis
+
+
+LOBBY_RACES_KEY = 'race_handler:lobby:races'
+LOBBY_RACE_KEY = 'race_handler:lobby:race:{}'
+LOBBY_VERSION_KEY = 'race_handler:lobby:version'
+
+LOBBY_GROUP = 'lobby'
+
+LOBBY_STATUSES = ("w", "t")
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+# Races are ordered by the sort key, which starts with the creation date, so
+# a page is just a lexicographical range of the sorted set after the cursor.
+READ_LOBBY_PAGE_SCRIPT = """
+local sort_keys = redis.call('ZRANGEBYLEX', KEYS[1], ARGV[1], '+', 'LIMIT', 0, ARGV[2])
+local races = {}
+for idx, sort_key in ipairs(sort_keys) do
+    local race_id = string.match(sort_key, ':(.+)$')
+    local race = redis.call('HMGET', ARGV[3] .. race_id, 'creator_id', 'creator_username', 'status', 'amount_of_players')
+    table.insert(race, 1, race_id)
+    races[idx] = race
+end
+return {redis.call('GET', KEYS[2]), sort_keys, races}
+"""
+
+# Changes only races which are still in the lobby, so a late update can't
+# bring back a race that has been started or deleted in the meantime.
+UPDATE_LOBBY_RACE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV))
+return redis.call('INCR', KEYS[2])
+"""
+
+REMOVE_LOBBY_RACE_SCRIPT = """
+local sort_key = redis.call('HGET', KEYS[1], 'sort_key')
+if not sort_key then
+    return 0
+end
+redis.call('ZREM', KEYS[2], sort_key)
+redis.call('DEL', KEYS[1])
+return redis.call('INCR', KEYS[3])
+"""
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def get_sort_key(race):
+    return f'{int(race.created_at.timestamp() * 1_000_000):020d}:{race.id}'
+
+
+def encode_cursor(sort_key):
+    return base64.urlsafe_b64encode(sort_key.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        sort_key = base64.b64decode(cursor.encode(), altchars=b'-_', validate=True).decode()
+    except (binascii.Error, UnicodeError, ValueError):
+        raise InvalidCursor(cursor)
+
+    created_at, _, race_id = sort_key.partition(':')
+
+    if not created_at.isdigit() or not race_id:
+        raise InvalidCursor(cursor)
+
+    return sort_key
+
+
+def get_race_info(race_id, creator_id, creator_username, status, amount_of_players):
+    return {
+        'id': race_id,
+        'creator': {'id': int(creator_id), 'username': creator_username} if creator_id else None,
+        'status': status,
+        'amount_of_players': int(amount_of_players),
+    }
+
+
+def serialize_lobby_race(race, amount_of_players):
+    return {
+        'sort_key': get_sort_key(race),
+        'creator_id': race.creator_id if race.creator_id is not None else '',
+        'creator_username': race.creator.username if race.creator_id is not None else '',
+        'status': race.status,
+        'amount_of_players': amount_of_players,
+    }
+
+
+def write_lobby_race(pipeline, race, amount_of_players):
+    pipeline.zadd(LOBBY_RACES_KEY, {get_sort_key(race): 0})
+    pipeline.hset(LOBBY_RACE_KEY.format(race.id), mapping=serialize_lobby_race(race, amount_of_players))
+
+
+def send_lobby_update(message):
+    """
+    Sends the change of the lobby to the lobby group once the transaction
+    which made the change is committed. Every change carries the lobby
+    version it has produced, so listeners can drop changes that arrive late.
+    """
+    transaction.on_commit(lambda: async_to_sync(get_channel_layer().group_send)(LOBBY_GROUP, message))
+
+
+def save_lobby_race(race, amount_of_players):
+    """
+    Adds the race to the lobby or replaces the one that is already there.
+    Races which can't be joined anymore are removed from the lobby instead
+    and matchmade races are never added to it.
+    """
+    if race.is_matchmade:
+        return
+
+    if race.status not in LOBBY_STATUSES:
+        remove_lobby_race(race.id, 'race_started')
+        return
+
+    with get_redis().pipeline(transaction=True) as pipeline:
+        write_lobby_race(pipeline, race, amount_of_players)
+        pipeline.incr(LOBBY_VERSION_KEY)
+        is_added, _, version = pipeline.execute()
+
+    if is_added:
+        lobby_race = serialize_lobby_race(race, amount_of_players)
+        race_info = get_race_info(
+            race.id, lobby_race['creator_id'], lobby_race['creator_username'], race.status, amount_of_players
+        )
+        send_lobby_update({'type': 'race_added', 'race': race_info, 'version': version})
+    else:
+        send_lobby_update({
+            'type': 'race_changed',
+            'id': race.id,
+            'status': race.status,
+            'amount_of_players': amount_of_players,
+            'version': version,
+        })
+
+
+def set_lobby_race_status(race_id, status):
+    if status not in LOBBY_STATUSES:
+        remove_lobby_race(race_id, 'race_started')
+        return
+
+    version = get_redis().eval(UPDATE_LOBBY_RACE_SCRIPT, 2, LOBBY_RACE_KEY.format(race_id), LOBBY_VERSION_KEY, 'status', status)
+
+    if version:
+        send_lobby_update({'type': 'race_changed', 'id': race_id, 'status': status, 'version': version})
+
+
+def remove_lobby_race(race_id, reason='race_removed'):
+    """
+    Removes the race from the lobby. ``reason`` is the type of the message
+    sent to the lobby group, either ``race_removed`` or ``race_started``.
+    """
+    version = get_redis().eval(REMOVE_LOBBY_RACE_SCRIPT, 3, LOBBY_RACE_KEY.format(race_id), LOBBY_RACES_KEY, LOBBY_VERSION_KEY)
+
+    if version:
+        send_lobby_update({'type': reason, 'id': race_id, 'version': version})
+
+
+def clear_lobby():
+    redis_client = get_redis()
+    race_ids = [sort_key.split(':', 1)[1] for sort_key in redis_client.zrange(LOBBY_RACES_KEY, 0, -1)]
+    redis_client.delete(LOBBY_RACES_KEY, LOBBY_VERSION_KEY, *(LOBBY_RACE_KEY.format(race_id) for race_id in race_ids))
+
+
+def rebuild_lobby():
+    """
+    Fills the lobby from the database, used when Redis has lost the lobby.
+    """
+    races = models.Race.objects.filter(status__in=LOBBY_STATUSES, is_matchmade=False).select_related('creator').annotate(
+        amount_of_players=Count('participants')
+    )
+
+    clear_lobby()
+
+    with get_redis().pipeline(transaction=True) as pipeline:
+        for race in races:
+            write_lobby_race(pipeline, race, race.amount_of_players)
+        pipeline.incr(LOBBY_VERSION_KEY)
+        pipeline.execute()
+
+    send_lobby_update({'type': 'lobby_reset'})
+
+
+def get_lobby_version():
+    """
+    Returns the number which changes every time the lobby changes.
+    """
+    version = get_redis().get(LOBBY_VERSION_KEY)
+
+    if version is None:
+        rebuild_lobby()
+        version = get_redis().get(LOBBY_VERSION_KEY)
+
+    return version
+
+
+def get_lobby_page(cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Returns races which come after the cursor and the cursor of the next
+    page, which is ``None`` for the last page.
+    """
+    start = '(' + decode_cursor(cursor) if cursor is not None else '-'
+
+    version, sort_keys, lobby_races = get_redis().eval(
+        READ_LOBBY_PAGE_SCRIPT, 2, LOBBY_RACES_KEY, LOBBY_VERSION_KEY, start, page_size, LOBBY_RACE_KEY.format('')
+    )
+
+    if version is None:
+        rebuild_lobby()
+        return get_lobby_page(cursor, page_size)
+
+    races = [get_race_info(*lobby_race) for lobby_race in lobby_races if lobby_race[3] is not None]
+
+    next_cursor = encode_cursor(sort_keys[-1]) if len(sort_keys) == page_size else None
+    return races, next_cursor
+
+
+def get_lobby_snapshot():
+    """
+    Returns the lobby version and all the races in the lobby. The version
+    is read first, so it's never newer than the races.
+    """
+    version = int(get_lobby_version())
+
+    races, cursor = get_lobby_page(page_size=MAX_PAGE_SIZE)
+
+    while cursor is not None:
+        next_races, cursor = get_lobby_page(cursor, MAX_PAGE_SIZE)
+        races += next_races
+
+    return version, races
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from race_handler.reaper import reap_stale_races
+
+
+class Command(BaseCommand):
+    help = "Deletes races left behind by crashed workers and finishes the stale started ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started_at = time.perf_counter()
+
+        reaped = reap_stale_races(batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {reaped['waiting']} waiting, {reaped['on_timer']} on timer and {reaped['started']} started races, "
+            f"finished {reaped['finished']} started races in {time.perf_counter() - started_at:.1f}s"
+        ))
@@ -0,0 +1,234 @@
+import asyncio
+import datetime
+import logging
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.utils import timezone
+
+from . import models
+from .scheduler import race_start_scheduler
+from config.redis_client import get_async_redis
+from statistics_page import services as statistics_services
+
+
+logger = logging.getLogger(__name__)
+
+MATCHMAKING_QUEUE_KEY = 'race_handler:matchmaking:band:'
+MATCHMAKING_CHANNELS_KEY = 'race_handler:matchmaking:channels'
+MATCHMAKING_BANDS_KEY = 'race_handler:matchmaking:bands'
+
+# Players are matched with the players whose recent average speed is in
+# the same band, the last band has everyone faster than that.
+WPM_BAND_WIDTH = 20
+AMOUNT_OF_BANDS = 8
+# Speed of the players who haven't finished a race yet.
+DEFAULT_WPM = 30
+
+
+# Queues the player in the band, the player is taken out of the previous
+# band if the speed has changed since then. A player who is queued again
+# keeps the original place in the queue but is notified on the new channel.
+ENQUEUE_SCRIPT = """
+local previous_band = redis.call('HGET', KEYS[3], ARGV[1])
+if previous_band and previous_band ~= ARGV[3] then
+    redis.call('ZREM', KEYS[4] .. previous_band, ARGV[1])
+end
+redis.call('ZADD', KEYS[1], 'NX', ARGV[4], ARGV[1])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[3])
+"""
+
+# Takes the player out of the queue unless the player has been queued again
+# from another channel since then.
+DEQUEUE_SCRIPT = """
+if redis.call('HGET', KEYS[1], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+local band = redis.call('HGET', KEYS[2], ARGV[1])
+redis.call('ZREM', KEYS[3] .. band, ARGV[1])
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+return 1
+"""
+
+# Takes groups of players out of the queues in one step, so a player seen
+# by several workers at the same time is put into only one race. A band
+# gives away a full race as soon as it has enough players and whatever it
+# has once its oldest player has waited for too long.
+CLAIM_MATCHES_SCRIPT = """
+local amount_of_bands, race_size, min_race_size = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local deadline, max_races = tonumber(ARGV[4]), tonumber(ARGV[5])
+local matches = {}
+for band = 0, amount_of_bands - 1 do
+    local key = KEYS[3] .. band
+    while #matches < max_races do
+        local amount_of_players = redis.call('ZCARD', key)
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        local match_size = 0
+        if amount_of_players >= race_size then
+            match_size = race_size
+        elseif amount_of_players >= min_race_size and tonumber(oldest[2]) <= deadline then
+            match_size = amount_of_players
+        end
+        if match_size == 0 then
+            break
+        end
+        local players = {}
+        local popped = redis.call('ZPOPMIN', key, match_size)
+        for idx = 1, #popped, 2 do
+            table.insert(players, popped[idx])
+        end
+        local channels = redis.call('HMGET', KEYS[1], unpack(players))
+        redis.call('HDEL', KEYS[1], unpack(players))
+        redis.call('HDEL', KEYS[2], unpack(players))
+        table.insert(matches, {players, channels})
+    end
+end
+return matches
+"""
+
+
+def get_wpm_band(wpm):
+    return min(int(wpm // WPM_BAND_WIDTH), AMOUNT_OF_BANDS - 1)
+
+
+@database_sync_to_async
+def get_player_band(player):
+    summary = statistics_services.get_player_summary(player)
+    wpm = summary.recent_average_wpm if summary.amount_of_races else DEFAULT_WPM
+    return get_wpm_band(wpm)
+
+
+class Matchmaker:
+    """
+    Puts the queued players into new races. Queues live in Redis sorted sets,
+    one per speed band, polled by one asyncio task per worker, so players
+    connected to different workers are matched with each other.
+    """
+
+    def __init__(self, race_size=5, min_race_size=2, wait_timeout=10.0, start_delay=5.0, poll_interval=0.2, batch_size=200):
+        self.race_size = race_size
+        self.min_race_size = min_race_size
+        self.wait_timeout = wait_timeout
+        self.start_delay = start_delay
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.task = None
+        self.loop = None
+
+    async def enqueue(self, player_id, channel_name, band):
+        await get_async_redis().eval(
+            ENQUEUE_SCRIPT, 4,
+            MATCHMAKING_QUEUE_KEY + str(band), MATCHMAKING_CHANNELS_KEY, MATCHMAKING_BANDS_KEY, MATCHMAKING_QUEUE_KEY,
+            player_id, channel_name, band, int(timezone.now().timestamp() * 1000),
+        )
+        self.ensure_running()
+
+    async def dequeue(self, player_id, channel_name):
+        return bool(await get_async_redis().eval(
+            DEQUEUE_SCRIPT, 3, MATCHMAKING_CHANNELS_KEY, MATCHMAKING_BANDS_KEY, MATCHMAKING_QUEUE_KEY, player_id, channel_name,
+        ))
+
+    async def claim_matches(self):
+        """
+        Takes matched players out of the queues and returns them as lists
+        of (player_id, channel_name) pairs, one list per race.
+        """
+        deadline = int((timezone.now().timestamp() - self.wait_timeout) * 1000)
+
+        matches = await get_async_redis().eval(
+            CLAIM_MATCHES_SCRIPT, 3, MATCHMAKING_CHANNELS_KEY, MATCHMAKING_BANDS_KEY, MATCHMAKING_QUEUE_KEY,
+            AMOUNT_OF_BANDS, self.race_size, self.min_race_size, deadline, self.batch_size,
+        )
+
+        return [list(zip(map(int, player_ids), channel_names)) for player_ids, channel_names in matches]
+
+    @database_sync_to_async
+    def create_races(self, amount_of_races, start_date):
+        races = [models.Race(status="t", start_date=start_date, is_matchmade=True) for _ in range(amount_of_races)]
+        models.Race.objects.bulk_create(races)
+        return [race.id for race in races]
+
+    async def send_to_players(self, messages):
+        """
+        Sends every (channel_name, message) pair. A player who can't be sent
+        the message misses it, the rest of the players still get theirs.
+        """
+        channel_layer = get_channel_layer()
+        results = await asyncio.gather(*(
+            channel_layer.send(channel_name, message) for channel_name, message in messages
+        ), return_exceptions=True)
+
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("Matched player could not be sent %r", result)
+
+    async def start_matches(self):
+        matches = await self.claim_matches()
+
+        if not matches:
+            return 0
+
+        start_date = timezone.now() + datetime.timedelta(seconds=self.start_delay)
+
+        try:
+            race_ids = await self.create_races(len(matches), start_date)
+            await race_start_scheduler.schedule_many({race_id: start_date for race_id in race_ids})
+        except Exception:
+            # The players are out of the queue already, they are told to
+            # queue again instead of waiting for a race that never comes.
+            logger.exception("Races of the matched players could not be created")
+            await self.send_to_players(
+                (channel_name, {'type': 'match_failed'}) for match in matches for _, channel_name in match
+            )
+            return len(matches)
+
+        await self.send_to_players(
+            (channel_name, {'type': 'match_found', 'race_id': race_id, 'time': start_date.isoformat()})
+            for race_id, match in zip(race_ids, matches)
+            for _, channel_name in match
+        )
+
+        return len(matches)
+
+    def ensure_running(self):
+        loop = asyncio.get_running_loop()
+
+        if self.task is not None and not self.task.done() and self.loop is loop:
+            return
+
+        self.loop = loop
+        self.task = loop.create_task(self.run())
+
+    async def stop(self):
+        if self.task is None:
+            return
+
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+    async def run(self):
+        while True:
+            try:
+                amount_of_races = await self.start_matches()
+            except Exception:
+                logger.exception("Players could not be matched")
+                amount_of_races = 0
+
+            if amount_of_races < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+
+async def clear_queues():
+    await get_async_redis().delete(
+        MATCHMAKING_CHANNELS_KEY, MATCHMAKING_BANDS_KEY,
+        *(MATCHMAKING_QUEUE_KEY + str(band) for band in range(AMOUNT_OF_BANDS)),
+    )
+
+
+matchmaker = Matchmaker()
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.3 on 2026-10-18 14:27
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('race_handler', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='race',
+            index=models.Index(condition=models.Q(('status__in', ('w', 't'))), fields=['created_at'], name='race_available_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='racestatistics',
+            index=models.Index(fields=['player', '-id'], name='race_statistics_player_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='racestatistics',
+            index=models.Index(fields=['race', 'place'], name='race_statistics_place_idx'),
+        ),
+    ]
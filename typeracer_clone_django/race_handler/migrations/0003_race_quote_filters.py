@@ -0,0 +1,18 @@
+# Generated by Django 4.2.3 on 2026-10-18 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('race_handler', '0002_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='race',
+            name='quote_filters',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
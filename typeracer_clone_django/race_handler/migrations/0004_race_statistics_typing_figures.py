@@ -0,0 +1,28 @@
+# Generated by Django 4.2.3 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('race_handler', '0003_race_quote_filters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='racestatistics',
+            name='accuracy',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='racestatistics',
+            name='errors',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='racestatistics',
+            name='wpm',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.3 on 2026-10-18 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('race_handler', '0004_race_statistics_typing_figures'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='racestatistics',
+            name='replay',
+            field=models.FileField(blank=True, upload_to='replays/%Y/%m/%d/'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.3 on 2026-10-18 18:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('race_handler', '0005_race_statistics_replay'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='race',
+            name='ghost',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ghost_races', to='race_handler.racestatistics'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.3 on 2026-10-18 19:05
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('race_handler', '0006_race_ghost'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='race',
+            index=models.Index(condition=models.Q(('status__in', ('t', 's'))), fields=['start_date'], name='race_start_date_idx'),
+        ),
+    ]
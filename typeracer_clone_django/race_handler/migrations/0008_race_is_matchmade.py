@@ -0,0 +1,18 @@
+# Generated by Django 4.2.3 on 2026-10-18 21:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('race_handler', '0007_race_start_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='race',
+            name='is_matchmade',
+            field=models.BooleanField(default=False),
+        ),
+    ]
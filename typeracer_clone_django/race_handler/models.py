@@ -21,12 +21,26 @@ class Race(models.Model):
 
     status = models.CharField(choices=STATUS_CHOICE, max_length=1, default="w")
     quote = models.ForeignKey("quotes_interface.Quotes", on_delete=models.SET_NULL, related_name="races", null=True)
+    # Filters of quotes_interface.services.filter_quotes the quote of the race is picked with.
+    quote_filters = models.JSONField(default=dict, blank=True)
+    # Recorded race which is replayed in the race as a virtual participant.
+    ghost = models.ForeignKey("RaceStatistics", on_delete=models.SET_NULL, related_name="ghost_races", null=True, blank=True)
+    # Races made by race_handler.matchmaking are only for the matched players and never listed in the lobby.
+    is_matchmade = models.BooleanField(default=False)
 
     participants = models.ManyToManyField(User, related_name="races", blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
     start_date = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Only races which can still be joined are listed in the lobby.
+            models.Index(fields=['created_at'], condition=models.Q(status__in=("w", "t")), name='race_available_idx'),
+            # Races which have been given a start date are reaped once they are stale.
+            models.Index(fields=['start_date'], condition=models.Q(status__in=("t", "s")), name='race_start_date_idx'),
+        ]
+
 
 class RaceStatistics(models.Model):
     player = models.ForeignKey(User, related_name="races_statistics", blank=True, on_delete=models.SET_NULL, null=True)
@@ -37,10 +51,23 @@ class RaceStatistics(models.Model):
     time_racing = models.DurationField(blank=True, null=True)
     place = models.IntegerField()
     average_speed = models.FloatField()
+
+    # Computed from the keystrokes, stay empty for players who send whole words.
+    wpm = models.FloatField(null=True, blank=True)
+    accuracy = models.FloatField(null=True, blank=True)
+    errors = models.PositiveIntegerField(null=True, blank=True)
+
+    # Log of what the player has typed, see race_handler.replay for the format.
+    replay = models.FileField(upload_to='replays/%Y/%m/%d/', blank=True)
     # progress = models.DecimalField(max_digits=4, decimal_places=3, validators=[
     #         MaxValueValidator(1),
     #         MinValueValidator(0)
     #     ], default=0)
 
     # characters_typed = models.PositiveIntegerField()
-    
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['player', '-id'], name='race_statistics_player_idx'),
+            models.Index(fields=['race', 'place'], name='race_statistics_place_idx'),
+        ]
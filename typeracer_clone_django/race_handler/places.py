@@ -0,0 +1,23 @@
+import datetime
+
+from config.redis_client import get_redis
+
+
+RACE_PLACES_KEY = 'race_handler:race_places:{}'
+
+# Races are finished long before that, the counter only has to outlive them.
+RACE_PLACES_TIMEOUT = datetime.timedelta(days=1)
+
+
+def claim_finishing_place(race_id):
+    """
+    Returns the place of the player who has just finished the race. Places
+    are handed out by one atomic counter per race, so players finishing
+    at the same time on different workers never share a place.
+    """
+    with get_redis().pipeline(transaction=True) as pipeline:
+        pipeline.incr(RACE_PLACES_KEY.format(race_id))
+        pipeline.expire(RACE_PLACES_KEY.format(race_id), RACE_PLACES_TIMEOUT)
+        place, _ = pipeline.execute()
+
+    return place
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class RaceProgressBatcher:
+    """
+    Collects progress of the players of one race connected to this process
+    and sends it to the race group as a single ``race_progress_batch``
+    message once a tick. Only the latest word of every player is kept, so
+    the amount of group messages depends on the tick and the amount of
+    processes, not on how fast the players type.
+    """
+
+    def __init__(self, race_id, channel_layer, tick):
+        self.race_id = race_id
+        self.channel_layer = channel_layer
+        self.tick = tick
+        self.pending_progress = {}
+        self.task = None
+
+    def add(self, player_id, word_index):
+        self.pending_progress[player_id] = word_index
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        # The task stops once players stop typing and is started again by
+        # the next progress, so idle races don't wake the event loop up.
+        while self.pending_progress:
+            await asyncio.sleep(self.tick)
+
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Couldn't send progress of race %s", self.race_id)
+
+    async def flush(self, player_id=None):
+        """
+        Sends the collected progress right away, only the progress of
+        ``player_id`` if it's given.
+        """
+        if player_id is not None:
+            if player_id not in self.pending_progress:
+                return
+
+            progress = {player_id: self.pending_progress.pop(player_id)}
+        else:
+            progress, self.pending_progress = self.pending_progress, {}
+
+        if not progress:
+            return
+
+        await self.channel_layer.group_send(self.race_id, {
+            'type': 'race_progress_batch',
+            'progress': [
+                {'player_id': player_id, 'word_index': word_index}
+                for player_id, word_index in progress.items()
+            ],
+        })
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
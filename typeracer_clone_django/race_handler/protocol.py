@@ -0,0 +1,124 @@
+"""
+Compact msgpack protocol of the race socket, an opt-in alternative to JSON
+for clients which send a lot of race traffic.
+
+The messages sent most often are packed as arrays which start with the code
+of the message type instead of maps with verbose keys, every other message
+is packed as the same map it would be in JSON. Dates are sent as amounts of
+milliseconds since the Unix epoch.
+"""
+import msgpack
+
+from .race_state import parse_race_date
+
+
+MSGPACK_SUBPROTOCOL = 'typeracer.msgpack'
+
+JSON_PROTOCOL = 'json'
+MSGPACK_PROTOCOL = 'msgpack'
+
+RACE_PROGRESS = 1
+RACE_PROGRESS_BATCH = 2
+PLAYER_LIST = 3
+RACE_START = 4
+RACE_KEYSTROKES = 5
+
+
+class InvalidMessage(Exception):
+    pass
+
+
+def get_protocol(scope):
+    """
+    Returns the protocol requested by the client either with the websocket
+    subprotocol or with the ``protocol`` query parameter.
+    """
+    if MSGPACK_SUBPROTOCOL in scope.get('subprotocols', ()):
+        return MSGPACK_PROTOCOL
+
+    query_string = scope.get('query_string', b'').decode()
+    if f'protocol={MSGPACK_PROTOCOL}' in query_string.split('&'):
+        return MSGPACK_PROTOCOL
+
+    return JSON_PROTOCOL
+
+
+def date_to_timestamp(date_string):
+    if date_string is None:
+        return None
+
+    return int(parse_race_date(date_string).timestamp() * 1000)
+
+
+def pack_race_progress(message):
+    return [RACE_PROGRESS, message['player_id'], message['word_index']]
+
+
+def pack_race_progress_batch(message):
+    progress = []
+    for player_progress in message['progress']:
+        progress += (player_progress['player_id'], player_progress['word_index'])
+
+    return [RACE_PROGRESS_BATCH, progress]
+
+
+def pack_player_list(message):
+    players = []
+    for player in message['players']:
+        players += (player['id'], player['username'])
+
+    return [PLAYER_LIST, players, date_to_timestamp(message.get('time'))]
+
+
+def pack_race_start(message):
+    race_start = [
+        RACE_START,
+        message.get('quote_id'),
+        message['quote'],
+        message['author'],
+        message['categories'],
+        message['word_offsets'],
+        date_to_timestamp(message['time']),
+    ]
+
+    # The ghost of a ghost race is sent as a trailing map, the same as in JSON.
+    if 'ghost' in message:
+        race_start.append(message['ghost'])
+
+    return race_start
+
+
+PACKERS = {
+    'race_progress': pack_race_progress,
+    'race_progress_batch': pack_race_progress_batch,
+    'player_list': pack_player_list,
+    'race_start': pack_race_start,
+}
+
+
+def encode_message(message):
+    packer = PACKERS.get(message.get('type'))
+    return msgpack.packb(packer(message) if packer is not None else message)
+
+
+def decode_message(data):
+    """
+    Returns the message received from the client in the same form as its
+    JSON version. Clients send progress as ``[1, word]`` or
+    ``[5, keys, time]``, anything else as a map.
+    """
+    try:
+        message = msgpack.unpackb(data)
+    except (ValueError, msgpack.UnpackException):
+        raise InvalidMessage(data)
+
+    if isinstance(message, dict):
+        return message
+
+    if isinstance(message, list) and len(message) == 2 and message[0] == RACE_PROGRESS:
+        return {'type': 'race_progress', 'word': message[1]}
+
+    if isinstance(message, list) and len(message) == 3 and message[0] == RACE_KEYSTROKES:
+        return {'type': 'race_keystrokes', 'keys': message[1], 'time': message[2]}
+
+    raise InvalidMessage(data)
@@ -0,0 +1,103 @@
+import datetime
+
+from quotes_interface.words import tokenize_quote
+
+
+class RaceState:
+    """
+    In-memory copy of a race shared by every consumer of that race inside
+    of one process. It is kept up to date from the race group messages, so
+    race progress is validated without touching the database and the race
+    row is only written when the race changes its status.
+    """
+
+    def __init__(self, race_id, status, start_date=None, quote=None, quote_id=None):
+        self.race_id = race_id
+        self.status = status
+        self.start_date = start_date
+        self.quote_id = quote_id
+        self.quote = None
+        self.quote_words = None
+        self.participants = set()
+        self.amount_of_consumers = 0
+        self.progress_batcher = None
+
+        if quote is not None:
+            self.set_quote(quote)
+
+    def set_quote(self, quote):
+        self.quote = quote
+        self.quote_words = tokenize_quote(quote)
+
+    def set_participants(self, players):
+        self.participants = {player['id'] for player in players}
+
+    def put_on_timer(self, start_date):
+        if self.status == "w":
+            self.status = "t"
+        self.start_date = start_date
+
+    def start(self, quote, start_date, quote_id=None):
+        self.status = "s"
+        self.start_date = start_date
+        self.quote_id = quote_id
+        self.set_quote(quote)
+
+    def finish(self):
+        self.status = "f"
+
+    def is_started(self):
+        return self.status != "w"
+
+    def is_available_to_join(self):
+        return self.status == "w" or self.status == "t"
+
+    def is_finished(self):
+        return self.status == "f"
+
+    def is_word_at(self, word, word_index):
+        return self.quote_words is not None and self.quote_words.is_word_at(word, word_index)
+
+    def get_amount_of_words(self):
+        if self.quote_words is None:
+            return 0
+
+        return len(self.quote_words)
+
+
+race_states = {}
+
+
+def parse_race_date(date_string):
+    return datetime.datetime.fromisoformat(date_string)
+
+
+def acquire_race_state(race_model):
+    """
+    Returns state of the race shared with other consumers of this process,
+    creating it from the race model for the first consumer.
+    """
+    race_state = race_states.get(race_model.id)
+
+    if race_state is None:
+        quote = race_model.quote.quote if race_model.quote_id is not None else None
+        race_state = RaceState(race_model.id, race_model.status, race_model.start_date, quote, race_model.quote_id)
+        race_states[race_model.id] = race_state
+
+    race_state.amount_of_consumers += 1
+    return race_state
+
+
+def release_race_state(race_id):
+    race_state = race_states.get(race_id)
+
+    if race_state is None:
+        return
+
+    race_state.amount_of_consumers -= 1
+
+    if race_state.amount_of_consumers <= 0:
+        if race_state.progress_batcher is not None:
+            race_state.progress_batcher.close()
+
+        del race_states[race_id]
@@ -0,0 +1,145 @@
+import asyncio
+import datetime
+import logging
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import models
+from .scheduler import RACE_STARTS_KEY
+from config.redis_client import get_redis, get_async_redis
+
+
+logger = logging.getLogger(__name__)
+
+REAPER_LOCK_KEY = 'race_handler:reaper:lock'
+
+
+def get_stale_races(now=None):
+    """
+    Returns querysets of the races nobody is going to finish: races waiting
+    for players for too long, races whose start has been missed and races
+    which should have been finished long ago.
+    """
+    now = now or timezone.now()
+
+    return {
+        'waiting': models.Race.objects.filter(
+            status="w", created_at__lt=now - datetime.timedelta(seconds=settings.RACE_WAITING_TIMEOUT),
+        ),
+        'on_timer': models.Race.objects.filter(
+            status="t", start_date__lt=now - datetime.timedelta(seconds=settings.RACE_START_TIMEOUT),
+        ),
+        'started': models.Race.objects.filter(
+            status="s", start_date__lt=now - datetime.timedelta(seconds=settings.RACE_TIMEOUT),
+        ),
+    }
+
+
+def has_statistics():
+    """
+    Returns the condition of races in which somebody has finished.
+    """
+    return Exists(models.RaceStatistics.objects.filter(race=OuterRef('pk')))
+
+
+def process_in_batches(races, process, batch_size):
+    """
+    Calls ``process`` with the queryset of the next ``batch_size`` races
+    until none are left and returns the sum of what it returns. Every batch
+    is its own transaction, so rows are never locked for long.
+    """
+    amount_of_races = 0
+
+    while race_ids := list(races.values_list('id', flat=True)[:batch_size]):
+        with transaction.atomic():
+            amount_of_races += process(races.filter(id__in=race_ids), race_ids)
+
+    return amount_of_races
+
+
+def delete_races(races, race_ids):
+    _, deleted = races.delete()
+    return deleted.get(models.Race._meta.label, 0)
+
+
+def delete_races_on_timer(races, race_ids):
+    # Races which will never start are taken out of the schedule as well.
+    transaction.on_commit(lambda: get_redis().zrem(RACE_STARTS_KEY, *race_ids))
+    return delete_races(races, race_ids)
+
+
+def finish_races(races, race_ids):
+    return races.update(status="f")
+
+
+def reap_stale_races(now=None, batch_size=1000):
+    """
+    Deletes the stale races, together with their participants, and marks
+    the stale started races in which somebody has finished as finished.
+    Returns how many races of every kind have been reaped.
+    """
+    stale_races = get_stale_races(now)
+
+    reaped = {
+        'waiting': process_in_batches(stale_races['waiting'], delete_races, batch_size),
+        'on_timer': process_in_batches(stale_races['on_timer'], delete_races_on_timer, batch_size),
+        'finished': process_in_batches(stale_races['started'].filter(has_statistics()), finish_races, batch_size),
+        'started': process_in_batches(stale_races['started'].filter(~has_statistics()), delete_races, batch_size),
+    }
+
+    logger.info(
+        "Reaped stale races: waiting=%(waiting)d on_timer=%(on_timer)d started=%(started)d finished=%(finished)d",
+        reaped,
+    )
+
+    return reaped
+
+
+class RaceReaper:
+    """
+    Reaps stale races every ``settings.RACE_REAPER_INTERVAL`` seconds from
+    an asyncio task in every worker. Only the worker which takes the Redis
+    lock of the interval does the work, the others skip it.
+    """
+
+    def __init__(self, key=REAPER_LOCK_KEY, batch_size=1000):
+        self.key = key
+        self.batch_size = batch_size
+        self.task = None
+        self.loop = None
+
+    def ensure_running(self):
+        if not settings.RACE_REAPER_INTERVAL:
+            return
+
+        loop = asyncio.get_running_loop()
+
+        if self.task is not None and not self.task.done() and self.loop is loop:
+            return
+
+        self.loop = loop
+        self.task = loop.create_task(self.run())
+
+    async def reap_if_due(self):
+        is_due = await get_async_redis().set(self.key, 1, nx=True, ex=settings.RACE_REAPER_INTERVAL)
+
+        if not is_due:
+            return None
+
+        return await database_sync_to_async(reap_stale_races)(batch_size=self.batch_size)
+
+    async def run(self):
+        while True:
+            try:
+                await self.reap_if_due()
+            except Exception:
+                logger.exception("Stale races could not be reaped")
+
+            await asyncio.sleep(settings.RACE_REAPER_INTERVAL)
+
+
+race_reaper = RaceReaper()
@@ -0,0 +1,191 @@
+"""
+Replays of the races, an append-only log of what every player has typed.
+
+A replay starts with ``REPLAY_HEADER`` followed by a zlib stream of events.
+Every event starts with a varint of ``delta << 1 | kind``, where ``delta`` is
+the amount of milliseconds since the previous event. Word events (kind 0)
+mark the next word as completed and have nothing else. Keys events (kind 1)
+go on with a varint length and the typed keys encoded in UTF-8.
+"""
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.core.files.base import ContentFile
+
+
+REPLAY_HEADER = b'TRR\x01'
+
+WORD_EVENT = 0
+KEYS_EVENT = 1
+
+
+class InvalidReplay(Exception):
+    pass
+
+
+def write_varint(buffer, value):
+    while value > 0x7f:
+        buffer.append(value & 0x7f | 0x80)
+        value >>= 7
+
+    buffer.append(value)
+
+
+def read_varint(buffer, position):
+    """
+    Returns the varint at the position and the position after it, or
+    ``None`` if the buffer ends before the varint does.
+    """
+    value = 0
+    shift = 0
+
+    while position < len(buffer):
+        byte = buffer[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+
+        if not byte & 0x80:
+            return value, position
+
+        shift += 7
+
+    return None
+
+
+class ReplayRecorder:
+    """
+    Collects the events of one player in memory while the race goes on,
+    recording an event is a couple of appends to a ``bytearray``.
+    """
+    __slots__ = ('events', 'last_event_ms')
+
+    def __init__(self):
+        self.events = bytearray()
+        self.last_event_ms = 0
+
+    def write_event_start(self, elapsed_ms, kind):
+        elapsed_ms = max(int(elapsed_ms), self.last_event_ms)
+        write_varint(self.events, (elapsed_ms - self.last_event_ms) << 1 | kind)
+        self.last_event_ms = elapsed_ms
+
+    def record_word(self, elapsed_ms):
+        self.write_event_start(elapsed_ms, WORD_EVENT)
+
+    def record_keys(self, elapsed_ms, keys):
+        self.write_event_start(elapsed_ms, KEYS_EVENT)
+
+        encoded_keys = keys.encode()
+        write_varint(self.events, len(encoded_keys))
+        self.events += encoded_keys
+
+    def has_events(self):
+        return bool(self.events)
+
+    def to_file(self, name):
+        return ContentFile(REPLAY_HEADER + zlib.compress(self.events), name=name)
+
+
+class ReplayDecoder:
+    """
+    Decodes events of the replay from the chunks of its file, the chunks
+    can be split anywhere.
+    """
+
+    def __init__(self):
+        self.header = bytearray()
+        self.decompressor = zlib.decompressobj()
+        self.buffer = bytearray()
+        self.elapsed_ms = 0
+        self.word_index = 0
+
+    def is_header_read(self):
+        return len(self.header) == len(REPLAY_HEADER)
+
+    def decompress(self, chunk):
+        if not self.is_header_read():
+            header_length = len(REPLAY_HEADER) - len(self.header)
+            self.header += chunk[:header_length]
+            chunk = chunk[header_length:]
+
+            if not REPLAY_HEADER.startswith(self.header):
+                raise InvalidReplay("Unknown replay format")
+
+        try:
+            return self.decompressor.decompress(chunk)
+        except zlib.error:
+            raise InvalidReplay("Replay is corrupted")
+
+    def feed(self, chunk):
+        """
+        Returns the events which have been completed by the chunk.
+        """
+        buffer = self.buffer + self.decompress(chunk)
+        events = []
+        position = 0
+
+        while True:
+            event_start = read_varint(buffer, position)
+            if event_start is None:
+                break
+
+            value, event_position = event_start
+            elapsed_ms = self.elapsed_ms + (value >> 1)
+
+            if value & 1 == WORD_EVENT:
+                event = {'time': elapsed_ms, 'type': 'word', 'word_index': self.word_index}
+                self.word_index += 1
+            else:
+                keys_length = read_varint(buffer, event_position)
+                if keys_length is None or keys_length[1] + keys_length[0] > len(buffer):
+                    break
+
+                length, keys_position = keys_length
+                event_position = keys_position + length
+                event = {'time': elapsed_ms, 'type': 'keys', 'keys': buffer[keys_position:event_position].decode()}
+
+            self.elapsed_ms = elapsed_ms
+            position = event_position
+            events.append(event)
+
+        self.buffer = buffer[position:]
+        return events
+
+    def close(self):
+        if not self.is_header_read() or self.buffer or not self.decompressor.eof:
+            raise InvalidReplay("Replay is truncated")
+
+
+def iter_replay_events(file, chunk_size=1 << 16):
+    """
+    Yields the events of the replay file one by one, the file is read and
+    decompressed a chunk at a time.
+    """
+    decoder = ReplayDecoder()
+
+    while chunk := file.read(chunk_size):
+        yield from decoder.feed(chunk)
+
+    decoder.close()
+
+
+async def open_replay_file(replay):
+    """
+    Opens a file of its own for the replay field without blocking the event
+    loop, so the same replay can be read by many readers at once.
+    """
+    return await sync_to_async(replay.storage.open, thread_sensitive=False)(replay.name, 'rb')
+
+
+async def aiter_replay_events(file, chunk_size=1 << 12):
+    """
+    Same as ``iter_replay_events``, but reads the file without blocking
+    the event loop.
+    """
+    decoder = ReplayDecoder()
+    read = sync_to_async(file.read, thread_sensitive=False)
+
+    while chunk := await read(chunk_size):
+        for event in decoder.feed(chunk):
+            yield event
+
+    decoder.close()
@@ -4,4 +4,6 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r"ws/race/(?P<race_id>\w+)/$", consumers.RaceHandlerConsumer.as_asgi()),
+    re_path(r"ws/lobby/$", consumers.LobbyConsumer.as_asgi()),
+    re_path(r"ws/matchmaking/$", consumers.MatchmakingConsumer.as_asgi()),
 ]           
\ No newline at end of file
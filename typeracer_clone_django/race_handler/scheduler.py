@@ -0,0 +1,227 @@
+import asyncio
+import datetime
+import logging
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.utils import timezone
+
+from . import models
+from . import lobby
+from . import ghosts
+from config.redis_client import get_async_redis
+from quotes_interface import services as quote_services
+from quotes_interface.models import Quotes
+from quotes_interface.words import tokenize_quote
+
+
+logger = logging.getLogger(__name__)
+
+
+@database_sync_to_async
+def record_race_start_info_to_db(race_id):
+    """
+    Picks the quote of the race and marks the race as started. Returns the
+    quote and the ID of the ghost of the race, the quote is ``None`` if the
+    race is gone or has been started already.
+    """
+    race_info = models.Race.objects.filter(id=race_id, status="t").values_list(
+        'quote_filters', 'ghost_id', 'ghost__race__quote_id'
+    ).first()
+
+    if race_info is None:
+        return None, None
+
+    quote_filters, ghost_id, ghost_quote_id = race_info
+    # Ghost races are typed with the quote the ghost was recorded with.
+    quote = quote_services.get_quote_payload(ghost_quote_id) if ghost_quote_id is not None else None
+
+    if quote is None:
+        ghost_id = None
+
+        try:
+            quote = quote_services.get_random_quote_payload(quote_filters)
+        except Quotes.DoesNotExist:
+            # Quotes matching the filters have been removed since the race was created.
+            quote = quote_services.get_random_quote_payload()
+
+    if models.Race.objects.filter(id=race_id, status="t").update(status="s", quote_id=quote['id']) != 1:
+        return None, None
+
+    lobby.remove_lobby_race(race_id, 'race_started')
+
+    return quote, ghost_id
+
+
+@database_sync_to_async
+def get_started_race_info(race_id):
+    """
+    Returns the quote and the ID of the ghost the race has been started
+    with, the quote is ``None`` if the race is gone or isn't started.
+    """
+    race_info = models.Race.objects.filter(id=race_id, status="s", quote__isnull=False).values_list(
+        'quote_id', 'ghost_id', 'ghost__race__quote_id'
+    ).first()
+
+    if race_info is None:
+        return None, None
+
+    quote_id, ghost_id, ghost_quote_id = race_info
+    # The ghost only races if the race is typed with the quote of the ghost.
+    return quote_services.get_quote_payload(quote_id), ghost_id if ghost_quote_id == quote_id else None
+
+
+async def start_race(race_id, start_date):
+    quote, ghost_id = await record_race_start_info_to_db(race_id)
+
+    if quote is None:
+        # Races are claimed once they are started only if the attempt which
+        # started them failed before the players were sent race_start, so
+        # it's sent again with the quote the race has been started with.
+        quote, ghost_id = await get_started_race_info(race_id)
+
+    if quote is None:
+        return
+
+    ghost = await ghosts.get_ghost_or_none(ghost_id) if ghost_id is not None else None
+
+    race_start = {
+        'type' : 'race_start',
+        'quote_id' : quote['id'],
+        'quote' : quote['quote'],
+        'author' : quote['author'],
+        'categories' : quote['categories'],
+        'word_offsets' : tokenize_quote(quote['quote']).get_offset_list(),
+        'time' : start_date.isoformat(),
+    }
+
+    if ghost is not None:
+        race_start['ghost'] = ghosts.serialize_ghost(ghost)
+
+    await get_channel_layer().group_send(race_id, race_start)
+
+    if ghost is not None:
+        ghosts.start_ghost(race_id, ghost, start_date)
+
+
+# Moves due races from the schedule to the leases in one step, so a race
+# that several workers see at the same time is claimed by only one of them.
+# A race stays leased until the worker which has claimed it is done with
+# it, races whose lease has run out, because starting them has failed or
+# the worker has died, are claimed once again.
+CLAIM_DUE_RACES_SCRIPT = """
+local now, limit, lease_expiry = ARGV[1], ARGV[2], ARGV[3]
+local expired_leases = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now, 'LIMIT', 0, limit)
+for _, race_id in ipairs(expired_leases) do
+    redis.call('ZADD', KEYS[1], redis.call('HGET', KEYS[3], race_id), race_id)
+    redis.call('ZREM', KEYS[2], race_id)
+    redis.call('HDEL', KEYS[3], race_id)
+end
+local due_races = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'WITHSCORES', 'LIMIT', 0, limit)
+for idx = 1, #due_races, 2 do
+    redis.call('ZREM', KEYS[1], due_races[idx])
+    redis.call('ZADD', KEYS[2], lease_expiry, due_races[idx])
+    redis.call('HSET', KEYS[3], due_races[idx], due_races[idx + 1])
+end
+return due_races
+"""
+
+RACE_STARTS_KEY = 'race_handler:race_starts'
+
+
+class RaceStartScheduler:
+    """
+    Starts races at their start date on whichever worker claims them first.
+    Start dates live in a Redis sorted set polled by one asyncio task per
+    worker, so a race is started even if the worker that scheduled it has
+    restarted or its players are spread across workers. A claimed race is
+    leased for ``lease_duration`` seconds and tried again once the lease
+    runs out, starting a race which has been started already does nothing.
+    """
+
+    def __init__(self, key=RACE_STARTS_KEY, poll_interval=0.1, batch_size=100, lease_duration=10.0):
+        self.key = key
+        self.leases_key = f'{key}:leases'
+        self.claimed_start_dates_key = f'{key}:claimed'
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.lease_duration = lease_duration
+        self.task = None
+        self.loop = None
+
+    async def schedule(self, race_id, start_date):
+        await get_async_redis().zadd(self.key, {race_id: start_date.timestamp()})
+        self.ensure_running()
+
+    async def schedule_many(self, start_dates):
+        await get_async_redis().zadd(self.key, {race_id: start_date.timestamp() for race_id, start_date in start_dates.items()})
+        self.ensure_running()
+
+    async def claim_due_races(self):
+        """
+        Leases races which should have started by now and returns them as
+        (race_id, start_date) pairs.
+        """
+        now = timezone.now().timestamp()
+        due_races = await get_async_redis().eval(
+            CLAIM_DUE_RACES_SCRIPT, 3, self.key, self.leases_key, self.claimed_start_dates_key,
+            now, self.batch_size, now + self.lease_duration,
+        )
+
+        return [
+            (race_id, datetime.datetime.fromtimestamp(float(timestamp), tz=datetime.timezone.utc))
+            for race_id, timestamp in zip(due_races[::2], due_races[1::2])
+        ]
+
+    def ensure_running(self):
+        loop = asyncio.get_running_loop()
+
+        if self.task is not None and not self.task.done() and self.loop is loop:
+            return
+
+        self.loop = loop
+        self.task = loop.create_task(self.run())
+
+    async def release_races(self, race_ids):
+        async with get_async_redis().pipeline(transaction=True) as pipeline:
+            pipeline.zrem(self.leases_key, *race_ids)
+            pipeline.hdel(self.claimed_start_dates_key, *race_ids)
+            await pipeline.execute()
+
+    async def start_claimed_race(self, race_id, start_date):
+        await start_race(race_id, start_date)
+
+    async def start_due_races(self):
+        due_races = await self.claim_due_races()
+
+        results = await asyncio.gather(
+            *(self.start_claimed_race(race_id, start_date) for race_id, start_date in due_races),
+            return_exceptions=True,
+        )
+
+        started_race_ids = []
+
+        for (race_id, start_date), result in zip(due_races, results):
+            if isinstance(result, Exception):
+                logger.error("Race %s could not be started, it's tried again once its lease runs out", race_id, exc_info=result)
+            else:
+                started_race_ids.append(race_id)
+
+        if started_race_ids:
+            await self.release_races(started_race_ids)
+
+        return len(due_races)
+
+    async def run(self):
+        while True:
+            try:
+                amount_of_started_races = await self.start_due_races()
+            except Exception:
+                logger.exception("Race start schedule could not be read")
+                amount_of_started_races = 0
+
+            if amount_of_started_races < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+
+race_start_scheduler = RaceStartScheduler()
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Race
+from . import lobby
+
+
+@receiver(post_save, sender=Race)
+def add_created_race_to_lobby(sender, instance, created, **kwargs):
+    if created:
+        lobby.save_lobby_race(instance, 0)
+
+
+@receiver(post_delete, sender=Race)
+def remove_deleted_race_from_lobby(sender, instance, **kwargs):
+    lobby.remove_lobby_race(instance.id)
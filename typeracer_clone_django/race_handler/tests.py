@@ -1,21 +1,47 @@
+import io
 import json
+import shutil
+import tempfile
+import threading
 import asyncio
 import datetime
+import multiprocessing
+from unittest import mock
 
-from asgiref.sync import sync_to_async
+import msgpack
+
+from asgiref.sync import async_to_sync, sync_to_async
 from django.contrib.auth.models import User
+from django.db import connection, DatabaseError
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.utils import timezone
 from rest_framework.test import APITransactionTestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 from channels.testing import WebsocketCommunicator
 from channels.routing import URLRouter
 from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
 
 from . import models
+from .race_state import RaceState, acquire_race_state, release_race_state, race_states
+from .scheduler import race_start_scheduler, RaceStartScheduler, record_race_start_info_to_db
+from . import lobby
+from .places import claim_finishing_place, RACE_PLACES_KEY
+from . import protocol
+from .typist import TypistState, MAX_CLIENT_CLOCK_AHEAD_MS, MAX_CLIENT_LAG_MS
+from .replay import ReplayRecorder, InvalidReplay, iter_replay_events
+from . import ghosts
+from . import matchmaking
+from . import reaper
 from quotes_interface.models import Quotes, Categories
+from statistics_page.models import PlayerStatisticsSummary
+from statistics_page import leaderboards
 from .routing import websocket_urlpatterns
 from config.channels_middleware import JwtAuthMiddlewareStack
+from config.redis_client import get_redis, get_async_redis
 from time import perf_counter
+import time
 
 ADDITIONAL_USERS = [
     {
@@ -58,6 +84,14 @@ async def get_message_by_type(communicator, message_type):
 
     raise ValueError(f'There is no such message type: {message_type}')
 
+async def wait_for_message_by_type(communicator, message_type, timeout=7):
+    message = await communicator.receive_json_from(timeout=timeout)
+
+    while message['type'] != message_type:
+        message = await communicator.receive_json_from(timeout=timeout)
+
+    return message
+
 class RaceHandlerTestCase(APITransactionTestCase):
     def setUp(self):
         self.user = User.objects.create(
@@ -87,6 +121,169 @@ class RaceHandlerTestCase(APITransactionTestCase):
         self.assertEqual(response.status_code, 201)
 
 
+    def test_create_race_with_quote_filters(self):
+        tagged_quote = Quotes.objects.create(quote="Tagged quote.", author="Tester", tags=["fun"])
+
+        response = self.client.post('/api/races/race/create/', {'tags': ["Fun"], 'max_length': 20}, format='json', headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+
+        race = models.Race.objects.get(id=response.json()['id'])
+        self.assertEqual(race.quote_filters, {'tags': ["fun"], 'max_length': 20})
+
+        models.Race.objects.filter(id=race.id).update(status="t")
+        quote, _ = async_to_sync(record_race_start_info_to_db)(race.id)
+        self.assertEqual(quote['id'], tagged_quote.id)
+
+        response = self.client.post('/api/races/race/create/', {'tags': ["sad"]}, format='json', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post('/api/races/race/create/', {'min_length': 0}, format='json', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_create_race_with_difficulty(self):
+        hard_quote = Quotes.objects.create(
+            quote="Incomprehensibility—“nevertheless”—characterizes (42%) of #metaphysical; deliberations!", author="Tester",
+        )
+
+        response = self.client.post('/api/races/race/create/', {'difficulty': "hard"}, format='json', headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+
+        race_id = response.json()['id']
+        models.Race.objects.filter(id=race_id).update(status="t")
+        quote, _ = async_to_sync(record_race_start_info_to_db)(race_id)
+        self.assertEqual(quote['id'], hard_quote.id)
+
+        response = self.client.post('/api/races/race/create/', {'difficulty': "impossible"}, format='json', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+
+    async def test_msgpack_protocol(self):
+        race = await database_sync_to_async(models.Race.objects.create)(creator=self.user)
+
+        communicator = WebsocketCommunicator(
+            self.url_patterns, f"/ws/race/{race.id}/?token={self.access_token}", subprotocols=[protocol.MSGPACK_SUBPROTOCOL]
+        )
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual(subprotocol, protocol.MSGPACK_SUBPROTOCOL)
+
+        player_list = msgpack.unpackb(await communicator.receive_from())
+        self.assertEqual(player_list, [protocol.PLAYER_LIST, [self.user.id, self.user.username], None])
+
+        await database_sync_to_async(models.Race.objects.filter(id=race.id).update)(status="t")
+        await race_start_scheduler.start_claimed_race(race.id, timezone.now())
+
+        race_start = msgpack.unpackb(await communicator.receive_from())
+        self.assertEqual(race_start[:4], [protocol.RACE_START, self.testing_quote.id, "Testing quote!", "Tester"])
+
+        await communicator.send_to(bytes_data=msgpack.packb([protocol.RACE_PROGRESS, "Testing"]))
+        self.assertEqual(msgpack.unpackb(await communicator.receive_from()), [protocol.RACE_PROGRESS, self.user.id, 0])
+
+        await communicator.send_to(bytes_data=msgpack.packb([protocol.RACE_PROGRESS, "quote!"]))
+        self.assertEqual(msgpack.unpackb(await communicator.receive_from()), [protocol.RACE_PROGRESS, self.user.id, 1])
+
+        race_player_finished = msgpack.unpackb(await communicator.receive_from())
+        self.assertEqual(race_player_finished['type'], 'race_player_finished')
+        self.assertEqual(race_player_finished['place'], 1)
+
+        await communicator.send_to(bytes_data=b'\xc1')
+        self.assertEqual(msgpack.unpackb(await communicator.receive_from()), {'type': 'error', 'text': 'Wrong message format'})
+
+        await communicator.disconnect()
+
+    async def test_msgpack_protocol_query_parameter(self):
+        race = await database_sync_to_async(models.Race.objects.create)(creator=self.user)
+
+        communicator = WebsocketCommunicator(self.url_patterns, f"/ws/race/{race.id}/?token={self.access_token}&protocol=msgpack")
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertIsNone(subprotocol)
+
+        self.assertEqual(msgpack.unpackb(await communicator.receive_from())[0], protocol.PLAYER_LIST)
+
+        await communicator.disconnect()
+
+    async def test_race_keystrokes(self):
+        race = await database_sync_to_async(models.Race.objects.create)(creator=self.user)
+
+        communicator = WebsocketCommunicator(self.url_patterns, f"/ws/race/{race.id}/?token={self.access_token}")
+        await communicator.connect()
+        await wait_for_message_by_type(communicator, 'player_list')
+
+        await database_sync_to_async(models.Race.objects.filter(id=race.id).update)(status="t")
+        await race_start_scheduler.start_claimed_race(race.id, timezone.now())
+        await wait_for_message_by_type(communicator, 'race_start')
+
+        await communicator.send_json_to({'type': 'race_keystrokes', 'keys': "Testing q", 'time': 1500})
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'race_progress', 'player_id': self.user.id, 'word_index': 0})
+
+        # Only the completed word is committed, the key typed after it can be erased.
+        await communicator.send_json_to({'type': 'race_keystrokes', 'keys': "\bq", 'time': 1600})
+        self.assertTrue(await communicator.receive_nothing())
+
+        await communicator.send_json_to({'type': 'race_keystrokes', 'keys': "x\bu", 'time': 1800})
+        self.assertTrue(await communicator.receive_nothing())
+
+        await communicator.send_json_to({'type': 'race_keystrokes', 'keys': 1, 'time': 2000})
+        self.assertEqual((await communicator.receive_json_from())['type'], 'error')
+
+        await communicator.send_json_to({'type': 'race_keystrokes', 'keys': "ote!", 'time': 2100})
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'race_progress', 'player_id': self.user.id, 'word_index': 1})
+
+        race_player_finished = await communicator.receive_json_from()
+        self.assertEqual(race_player_finished['type'], 'race_player_finished')
+        self.assertEqual(race_player_finished['errors'], 1)
+        self.assertAlmostEqual(race_player_finished['accuracy'], 15 / 16)
+
+        statistics = await database_sync_to_async(models.RaceStatistics.objects.get)(race_id=race.id)
+        self.assertEqual(statistics.errors, 1)
+        # The client clock can't run ahead of the server by more than a second.
+        self.assertGreaterEqual(statistics.wpm, 14 / 5 / ((1000 + MAX_CLIENT_CLOCK_AHEAD_MS) / 60000))
+
+        await communicator.disconnect()
+
+    async def test_race_replay(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+
+        race = await database_sync_to_async(models.Race.objects.create)(creator=self.user)
+
+        communicator = WebsocketCommunicator(self.url_patterns, f"/ws/race/{race.id}/?token={self.access_token}")
+        await communicator.connect()
+        await wait_for_message_by_type(communicator, 'player_list')
+
+        await database_sync_to_async(models.Race.objects.filter(id=race.id).update)(status="t")
+        await race_start_scheduler.start_claimed_race(race.id, timezone.now())
+        await wait_for_message_by_type(communicator, 'race_start')
+
+        with self.settings(MEDIA_ROOT=media_root):
+            await communicator.send_json_to({'type': 'race_keystrokes', 'keys': "Testing x\bq", 'time': 900})
+            await communicator.send_json_to({'type': 'race_keystrokes', 'keys': "uote!", 'time': 1400})
+            await wait_for_message_by_type(communicator, 'race_player_finished')
+            await communicator.disconnect()
+
+            response = await self.async_client.get(f'/api/races/{race.id}/replays/{self.user.id}/', headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            # Served chunk by chunk by ASGI servers, not collected into a list first.
+            self.assertTrue(response.is_async)
+
+            events = [json.loads(line) async for chunk in response.streaming_content for line in chunk.splitlines()]
+
+        self.assertEqual(events[:2], [
+            {'time': 900, 'type': 'keys', 'keys': "Testing x\bq"},
+            {'time': 900, 'type': 'word', 'word_index': 0},
+        ])
+        self.assertEqual([{**event, 'time': None} for event in events[2:]], [
+            {'time': None, 'type': 'keys', 'keys': "uote!"},
+            {'time': None, 'type': 'word', 'word_index': 1},
+        ])
+        # The second chunk is timed by the server clock, which is ahead by less than a second.
+        self.assertTrue(900 < events[2]['time'] == events[3]['time'] < 1400)
+
+        response = await sync_to_async(self.client.get)(f'/api/races/{race.id}/replays/{self.user.id + 1}/', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
     def test_create_race_unauthorized(self):
         response = self.client.post('/api/races/race/create/', {})
         self.assertEqual(response.status_code, 401)
@@ -273,8 +470,8 @@ class RaceHandlerTestCase(APITransactionTestCase):
         for word in quote.split():
             await asyncio.sleep(0.5)
             await user_list[1]['communicator'].send_json_to({'type' : 'race_progress', 'word' : word})
-            word_sent_response1 = await get_last_message(user_list[1]['communicator'])
             await user_list[2]['communicator'].send_json_to({'type' : 'race_progress', 'word' : word})
+            word_sent_response1 = await get_last_message(user_list[1]['communicator'])
             word_sent_response2 = await get_last_message(user_list[2]['communicator'])
             print(word_sent_response1)
             print(word_sent_response2)
@@ -302,4 +499,1075 @@ class RaceHandlerTestCase(APITransactionTestCase):
         await user_list[2]['communicator'].disconnect()
 
 
-        
+class RaceStateTestCase(SimpleTestCase):
+    def test_race_state_transitions(self):
+        race_state = RaceState('race', 'w')
+        self.assertFalse(race_state.is_started())
+        self.assertTrue(race_state.is_available_to_join())
+
+        start_date = timezone.now()
+        race_state.put_on_timer(start_date)
+        self.assertEqual(race_state.status, 't')
+        self.assertTrue(race_state.is_available_to_join())
+
+        race_state.start("Testing quote!", start_date)
+        self.assertFalse(race_state.is_available_to_join())
+        self.assertTrue(race_state.is_word_at("Testing", 0))
+        self.assertFalse(race_state.is_word_at("quote!", 0))
+        self.assertFalse(race_state.is_word_at("quote!", 2))
+        self.assertEqual(race_state.get_amount_of_words(), 2)
+
+        race_state.finish()
+        self.assertTrue(race_state.is_finished())
+
+    def test_race_state_is_shared_between_consumers(self):
+        race = models.Race(id='sharedrace', status='w')
+
+        first_state = acquire_race_state(race)
+        second_state = acquire_race_state(race)
+        self.assertIs(first_state, second_state)
+
+        release_race_state(race.id)
+        self.assertIn(race.id, race_states)
+
+        release_race_state(race.id)
+        self.assertNotIn(race.id, race_states)
+
+
+class RaceProtocolTestCase(SimpleTestCase):
+    def test_messages_are_packed_as_arrays(self):
+        race_start = {
+            'type': 'race_start',
+            'quote_id': 1,
+            'quote': "Testing quote!",
+            'author': "Tester",
+            'categories': ["Fun"],
+            'word_offsets': [0, 8],
+            'time': '2023-08-01T12:00:00.250000+00:00',
+        }
+        self.assertEqual(
+            msgpack.unpackb(protocol.encode_message(race_start)),
+            [protocol.RACE_START, 1, "Testing quote!", "Tester", ["Fun"], [0, 8], 1690891200250],
+        )
+
+        ghost = {'id': 7, 'player': {'id': 2, 'username': "Ghost"}, 'time_racing': '0:00:05', 'average_speed': 3.0}
+        self.assertEqual(
+            msgpack.unpackb(protocol.encode_message({**race_start, 'ghost': ghost})),
+            [protocol.RACE_START, 1, "Testing quote!", "Tester", ["Fun"], [0, 8], 1690891200250, ghost],
+        )
+
+        race_progress_batch = {'type': 'race_progress_batch', 'progress': [{'player_id': 1, 'word_index': 3}, {'player_id': 2, 'word_index': 1}]}
+        self.assertEqual(msgpack.unpackb(protocol.encode_message(race_progress_batch)), [protocol.RACE_PROGRESS_BATCH, [1, 3, 2, 1]])
+
+        race_progress = {'type': 'race_progress', 'player_id': 1, 'word_index': 3}
+        self.assertLess(len(protocol.encode_message(race_progress)), len(json.dumps(race_progress)) / 4)
+
+    def test_other_messages_are_packed_as_maps(self):
+        error = {'type': 'error', 'text': 'Wrong message format'}
+        self.assertEqual(msgpack.unpackb(protocol.encode_message(error)), error)
+
+    def test_decode_message(self):
+        self.assertEqual(protocol.decode_message(msgpack.packb([1, "Testing"])), {'type': 'race_progress', 'word': "Testing"})
+        self.assertEqual(
+            protocol.decode_message(msgpack.packb([5, "Tes", 800])), {'type': 'race_keystrokes', 'keys': "Tes", 'time': 800}
+        )
+
+        race_action = {'type': 'race_action', 'action': 'start_race'}
+        self.assertEqual(protocol.decode_message(msgpack.packb(race_action)), race_action)
+
+        for data in [b'\xc1', b'', msgpack.packb([1, "Testing"]) + b'\x01', msgpack.packb([2, "Testing"]), msgpack.packb("Testing")]:
+            with self.assertRaises(protocol.InvalidMessage):
+                protocol.decode_message(data)
+
+    def test_get_protocol(self):
+        self.assertEqual(protocol.get_protocol({'subprotocols': [protocol.MSGPACK_SUBPROTOCOL]}), protocol.MSGPACK_PROTOCOL)
+        self.assertEqual(protocol.get_protocol({'query_string': b'token=abc&protocol=msgpack'}), protocol.MSGPACK_PROTOCOL)
+        self.assertEqual(protocol.get_protocol({'query_string': b'token=abc', 'subprotocols': []}), protocol.JSON_PROTOCOL)
+
+
+class TypistStateTestCase(SimpleTestCase):
+    quote = "Testing quote!"
+
+    def test_typing_without_errors(self):
+        typist_state = TypistState()
+        typist_state.type_keys("Testing", self.quote, 12000, 12000)
+
+        self.assertEqual(typist_state.position, 7)
+        self.assertEqual(typist_state.accuracy, 1)
+        self.assertAlmostEqual(typist_state.wpm, 7)
+
+    def test_errors_have_to_be_erased(self):
+        typist_state = TypistState()
+        typist_state.type_keys("Tesx", self.quote, 1000, 1000)
+        typist_state.type_keys("ting", self.quote, 2000, 2000)
+
+        self.assertEqual(typist_state.position, 3)
+        self.assertEqual(typist_state.errors, 5)
+
+        typist_state.type_keys("\b" * 5 + "ting", self.quote, 3000, 3000)
+
+        self.assertEqual(typist_state.position, 7)
+        self.assertEqual(typist_state.keystrokes, 12)
+        self.assertEqual(typist_state.accuracy, 7 / 12)
+
+    def test_completed_words_can_not_be_erased(self):
+        typist_state = TypistState()
+        typist_state.type_keys("Testing q", self.quote, 1000, 1000)
+        typist_state.commit(len("Testing"))
+        typist_state.type_keys("\b" * 3, self.quote, 1000, 1000)
+
+        # Keys typed after the completed word can still be erased.
+        self.assertEqual(typist_state.position, 7)
+
+        typist_state.type_keys(" quote!x", self.quote, 2000, 2000)
+        self.assertEqual(typist_state.position, len(self.quote))
+        self.assertEqual(typist_state.errors, 1)
+
+    def test_client_clock(self):
+        typist_state = TypistState()
+        typist_state.type_keys("Test", self.quote, 5000, 2000)
+        self.assertEqual(typist_state.elapsed_ms, 2000 + MAX_CLIENT_CLOCK_AHEAD_MS)
+
+        typist_state.type_keys("ing", self.quote, 1000, 2500)
+        self.assertEqual(typist_state.elapsed_ms, 2000 + MAX_CLIENT_CLOCK_AHEAD_MS)
+
+    def test_client_clock_behind_server(self):
+        typist_state = TypistState()
+        typist_state.type_keys(self.quote, self.quote, 1, 60000)
+
+        self.assertEqual(typist_state.elapsed_ms, 60000 - MAX_CLIENT_LAG_MS)
+        self.assertAlmostEqual(typist_state.wpm, len(self.quote) / 5 / ((60000 - MAX_CLIENT_LAG_MS) / 60000))
+
+    def test_state_has_no_dict(self):
+        self.assertFalse(hasattr(TypistState(), '__dict__'))
+
+
+class ReplayTestCase(SimpleTestCase):
+    def record_replay(self):
+        replay_recorder = ReplayRecorder()
+        replay_recorder.record_keys(120, "Zoë ")
+        replay_recorder.record_word(120)
+        replay_recorder.record_word(1_000_000)
+        replay_recorder.record_keys(999_000, "x\b")
+        return replay_recorder
+
+    def test_events_are_read_back(self):
+        replay_file = self.record_replay().to_file('replay')
+
+        self.assertEqual(list(iter_replay_events(replay_file, chunk_size=3)), [
+            {'time': 120, 'type': 'keys', 'keys': "Zoë "},
+            {'time': 120, 'type': 'word', 'word_index': 0},
+            {'time': 1_000_000, 'type': 'word', 'word_index': 1},
+            # Events are never recorded earlier than the previous ones.
+            {'time': 1_000_000, 'type': 'keys', 'keys': "x\b"},
+        ])
+
+    def test_events_are_compact(self):
+        replay_recorder = ReplayRecorder()
+        for idx in range(100):
+            replay_recorder.record_keys(idx * 150, "a")
+
+        self.assertLessEqual(len(replay_recorder.events), 100 * 5)
+
+    def test_invalid_replay(self):
+        replay = self.record_replay().to_file('replay').read()
+
+        for data in [b'', b'TRR\x02' + replay[4:], replay[:-3]]:
+            with self.assertRaises(InvalidReplay):
+                list(iter_replay_events(io.BytesIO(data)))
+
+
+class RaceStartSchedulerTestCase(APITransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='TestUser1', password='TestPass.123')
+        self.access_token = RefreshToken.for_user(self.user).access_token
+        self.url_patterns = JwtAuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+
+        Quotes.objects.create(quote = "Testing quote!", author = "Tester")
+
+    async def test_many_races_share_one_timer(self):
+        start_date = timezone.now() + datetime.timedelta(seconds=0.5)
+        races = []
+
+        for idx in range(50):
+            race = await database_sync_to_async(models.Race.objects.create)(status="t", start_date=start_date)
+            await race_start_scheduler.schedule(race.id, start_date)
+            races.append(race)
+
+        scheduler_task = race_start_scheduler.task
+        await asyncio.sleep(1.5)
+
+        self.assertIs(race_start_scheduler.task, scheduler_task)
+        self.assertEqual(await get_async_redis().zcard(race_start_scheduler.key), 0)
+
+        started_races = await database_sync_to_async(models.Race.objects.filter(status="s", quote__isnull=False).count)()
+        self.assertEqual(started_races, len(races))
+
+    async def test_race_starts_after_creator_leaves(self):
+        other_user = await database_sync_to_async(User.objects.create)(username='TestUser2', password='TestPass.123')
+        other_access_token = await sync_to_async(lambda: RefreshToken.for_user(other_user).access_token)()
+
+        race = await database_sync_to_async(models.Race.objects.create)(creator=self.user)
+
+        creator_communicator = WebsocketCommunicator(self.url_patterns, f"/ws/race/{race.id}/?token={self.access_token}")
+        await creator_communicator.connect()
+
+        communicator = WebsocketCommunicator(self.url_patterns, f"/ws/race/{race.id}/?token={other_access_token}")
+        await communicator.connect()
+
+        await creator_communicator.send_json_to({'type': 'race_action', 'action' : 'start_race'})
+        await wait_for_message_by_type(creator_communicator, 'player_list')
+        await creator_communicator.disconnect()
+
+        race_start_response = await wait_for_message_by_type(communicator, 'race_start')
+
+        self.assertEqual(race_start_response['quote'], "Testing quote!")
+
+        await communicator.disconnect()
+
+
+class RecordingRaceStartScheduler(RaceStartScheduler):
+    """
+    Scheduler which records started races instead of starting them.
+    """
+
+    def __init__(self, key, started_races_key, **kwargs):
+        super().__init__(key, **kwargs)
+        self.started_races_key = started_races_key
+
+    async def start_claimed_race(self, race_id, start_date):
+        await get_async_redis().rpush(self.started_races_key, race_id)
+
+
+def run_race_start_worker(key, started_races_key):
+    async def start_races_until_schedule_is_empty():
+        scheduler = RecordingRaceStartScheduler(key, started_races_key, batch_size=10)
+
+        while await get_async_redis().zcard(key):
+            await scheduler.start_due_races()
+            await asyncio.sleep(0.01)
+
+    asyncio.run(start_races_until_schedule_is_empty())
+
+
+class DistributedRaceStartSchedulerTestCase(SimpleTestCase):
+    key = 'test:race_handler:race_starts'
+    started_races_key = 'test:race_handler:started_races'
+    amount_of_workers = 4
+
+    def setUp(self):
+        get_redis().delete(self.key, f'{self.key}:leases', f'{self.key}:claimed', self.started_races_key)
+
+    def tearDown(self):
+        get_redis().delete(self.key, f'{self.key}:leases', f'{self.key}:claimed', self.started_races_key)
+
+    def test_every_race_is_started_once_across_workers(self):
+        now = timezone.now().timestamp()
+        due_races = {f'due{idx}': now for idx in range(1000)}
+        future_races = {f'future{idx}': now + 1 for idx in range(200)}
+        get_redis().zadd(self.key, {**due_races, **future_races})
+
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=run_race_start_worker, args=(self.key, self.started_races_key))
+            for idx in range(self.amount_of_workers)
+        ]
+
+        for worker in workers:
+            worker.start()
+
+        time.sleep(0.5)
+        started_races_before_due = get_redis().lrange(self.started_races_key, 0, -1)
+
+        for worker in workers:
+            worker.join(timeout=30)
+            self.assertEqual(worker.exitcode, 0)
+
+        started_races = get_redis().lrange(self.started_races_key, 0, -1)
+
+        self.assertTrue(set(started_races_before_due).isdisjoint(future_races))
+        self.assertEqual(len(started_races), len(due_races) + len(future_races))
+        self.assertEqual(set(started_races), set(due_races) | set(future_races))
+
+
+class RaceJoinStressTestCase(APITransactionTestCase):
+    amount_of_players = 200
+
+    def setUp(self):
+        User.objects.bulk_create([User(username=f'StressTestUser{idx}') for idx in range(self.amount_of_players)])
+        self.access_tokens = [str(RefreshToken.for_user(user).access_token) for user in User.objects.all()]
+        self.url_patterns = JwtAuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+
+    async def test_simultaneous_joins(self):
+        race = await database_sync_to_async(models.Race.objects.create)()
+
+        communicators = [
+            WebsocketCommunicator(self.url_patterns, f"/ws/race/{race.id}/?token={access_token}")
+            for access_token in self.access_tokens
+        ]
+
+        with mock.patch.object(race_start_scheduler, 'schedule', wraps=race_start_scheduler.schedule) as schedule:
+            results = await asyncio.gather(*(communicator.connect(timeout=60) for communicator in communicators))
+
+        self.assertTrue(all(connected for connected, _ in results))
+        self.assertEqual(schedule.call_count, 1)
+
+        await database_sync_to_async(race.refresh_from_db)()
+        participants_count = await database_sync_to_async(race.participants.count)()
+
+        self.assertEqual(participants_count, self.amount_of_players)
+        self.assertEqual(race.status, "t")
+        self.assertEqual(schedule.call_args.args, (race.id, race.start_date))
+
+        lobby_races, _ = await database_sync_to_async(lobby.get_lobby_page)(page_size=lobby.MAX_PAGE_SIZE)
+        lobby_race = next(lobby_race for lobby_race in lobby_races if lobby_race['id'] == race.id)
+        self.assertEqual(lobby_race['amount_of_players'], self.amount_of_players)
+        self.assertEqual(lobby_race['status'], "t")
+
+        await get_async_redis().zrem(race_start_scheduler.key, race.id)
+        await asyncio.gather(*(communicator.disconnect(timeout=60) for communicator in communicators))
+
+        race_exists = await database_sync_to_async(models.Race.objects.filter(id=race.id).exists)()
+        self.assertFalse(race_exists)
+
+
+
+class RaceLobbyTestCase(APITransactionTestCase):
+    def setUp(self):
+        lobby.clear_lobby()
+
+        Quotes.objects.create(quote="Testing quote!", author="Tester")
+        self.user = User.objects.create(username='TestUser1', password='TestPass.123')
+        self.access_token = RefreshToken.for_user(self.user).access_token
+        self.headers = {'Authorization': f"Bearer {str(self.access_token)}"}
+        self.url_patterns = JwtAuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+
+    def tearDown(self):
+        lobby.clear_lobby()
+
+    def create_races(self, amount_of_races):
+        return [
+            self.client.post('/api/races/race/create/', {}, headers=self.headers).json()['id']
+            for _ in range(amount_of_races)
+        ]
+
+    def test_race_list_is_served_from_lobby(self):
+        race_ids = self.create_races(3)
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/races/available/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([race['id'] for race in response.json()], race_ids)
+        self.assertEqual(response.json()[0], {
+            'id': race_ids[0],
+            'creator': {'id': self.user.id, 'username': self.user.username},
+            'status': "w",
+            'amount_of_players': 0,
+        })
+
+    def test_race_list_not_modified(self):
+        self.create_races(1)
+
+        response = self.client.get('/api/races/available/')
+        etag = response['ETag']
+
+        not_modified_response = self.client.get('/api/races/available/', headers={'If-None-Match': etag})
+        self.assertEqual(not_modified_response.status_code, 304)
+
+        self.create_races(1)
+
+        modified_response = self.client.get('/api/races/available/', headers={'If-None-Match': etag})
+        self.assertEqual(modified_response.status_code, 200)
+        self.assertNotEqual(modified_response['ETag'], etag)
+        self.assertEqual(len(modified_response.json()), 2)
+
+    def test_race_list_pagination(self):
+        race_ids = self.create_races(5)
+
+        listed_race_ids = []
+        url = '/api/races/available/?page_size=2'
+
+        while url is not None:
+            response = self.client.get(url)
+            listed_race_ids += [race['id'] for race in response.json()]
+            url = response.headers.get('Link', '').partition('<')[2].partition('>')[0] or None
+
+        self.assertEqual(listed_race_ids, race_ids)
+
+        self.assertEqual(self.client.get('/api/races/available/?cursor=%%%').status_code, 400)
+        self.assertEqual(self.client.get('/api/races/available/?page_size=0').status_code, 400)
+
+    def test_lobby_is_rebuilt_from_db(self):
+        waiting_race = models.Race.objects.create(creator=self.user)
+        waiting_race.participants.add(self.user)
+        models.Race.objects.create(creator=self.user, status="s")
+
+        lobby.clear_lobby()
+        response = self.client.get('/api/races/available/')
+
+        self.assertEqual(response.json(), [{
+            'id': waiting_race.id,
+            'creator': {'id': self.user.id, 'username': self.user.username},
+            'status': "w",
+            'amount_of_players': 1,
+        }])
+
+    async def test_lobby_follows_players(self):
+        race = await database_sync_to_async(models.Race.objects.create)(creator=self.user)
+
+        communicator = WebsocketCommunicator(self.url_patterns, f"/ws/race/{race.id}/?token={self.access_token}")
+        await communicator.connect()
+
+        response = await sync_to_async(self.client.get)('/api/races/available/')
+        self.assertEqual(response.json()[0]['amount_of_players'], 1)
+
+        await wait_for_message_by_type(communicator, 'player_list')
+        await communicator.send_json_to({'type': 'race_action', 'action': 'start_race'})
+        await wait_for_message_by_type(communicator, 'player_list')
+
+        response = await sync_to_async(self.client.get)('/api/races/available/')
+        self.assertEqual(response.json()[0]['status'], "t")
+
+        await get_async_redis().zrem(race_start_scheduler.key, race.id)
+        await communicator.disconnect()
+
+        response = await sync_to_async(self.client.get)('/api/races/available/')
+        self.assertEqual(response.json(), [])
+
+    async def test_lobby_updates_are_pushed(self):
+        existing_race_id = (await sync_to_async(self.create_races)(1))[0]
+
+        lobby_communicator = WebsocketCommunicator(self.url_patterns, "/ws/lobby/")
+        connected, _ = await lobby_communicator.connect()
+        self.assertTrue(connected)
+
+        snapshot = await lobby_communicator.receive_json_from()
+        self.assertEqual(snapshot['type'], 'lobby')
+        self.assertEqual([race['id'] for race in snapshot['races']], [existing_race_id])
+
+        race_id = (await sync_to_async(self.create_races)(1))[0]
+        race_added = await lobby_communicator.receive_json_from()
+        self.assertEqual(race_added['type'], 'race_added')
+        self.assertEqual(race_added['race']['id'], race_id)
+        self.assertEqual(race_added['race']['amount_of_players'], 0)
+
+        communicator = WebsocketCommunicator(self.url_patterns, f"/ws/race/{race_id}/?token={self.access_token}")
+        await communicator.connect()
+
+        player_joined = await lobby_communicator.receive_json_from()
+        self.assertEqual(player_joined, {
+            'type': 'race_changed', 'id': race_id, 'status': "w", 'amount_of_players': 1,
+            'version': race_added['version'] + 1,
+        })
+
+        await wait_for_message_by_type(communicator, 'player_list')
+        await communicator.send_json_to({'type': 'race_action', 'action': 'start_race'})
+
+        timer_started = await lobby_communicator.receive_json_from()
+        self.assertEqual(timer_started['type'], 'race_changed')
+        self.assertEqual(timer_started['status'], "t")
+
+        await wait_for_message_by_type(communicator, 'player_list')
+        race_start_date = await get_async_redis().zscore(race_start_scheduler.key, race_id)
+        await get_async_redis().zrem(race_start_scheduler.key, race_id)
+        await race_start_scheduler.start_claimed_race(race_id, datetime.datetime.fromtimestamp(race_start_date, tz=datetime.timezone.utc))
+
+        race_started = await lobby_communicator.receive_json_from()
+        self.assertEqual(race_started['type'], 'race_started')
+        self.assertEqual(race_started['id'], race_id)
+
+        await communicator.disconnect()
+
+        await database_sync_to_async(models.Race.objects.filter(id=existing_race_id).delete)()
+        race_removed = await lobby_communicator.receive_json_from()
+        self.assertEqual(race_removed['type'], 'race_removed')
+        self.assertEqual(race_removed['id'], existing_race_id)
+
+        self.assertTrue(await lobby_communicator.receive_nothing())
+        await lobby_communicator.disconnect()
+
+    async def test_matched_race_is_not_listed(self):
+        await database_sync_to_async(lobby.rebuild_lobby)()
+
+        lobby_communicator = WebsocketCommunicator(self.url_patterns, "/ws/lobby/")
+        await lobby_communicator.connect()
+        self.assertEqual((await lobby_communicator.receive_json_from())['races'], [])
+
+        race_id, = await matchmaking.matchmaker.create_races(1, timezone.now() + datetime.timedelta(minutes=1))
+
+        communicator = WebsocketCommunicator(self.url_patterns, f"/ws/race/{race_id}/?token={self.access_token}")
+        await communicator.connect()
+        await wait_for_message_by_type(communicator, 'player_list')
+
+        self.assertTrue(await lobby_communicator.receive_nothing())
+        self.assertEqual((await sync_to_async(self.client.get)('/api/races/available/')).json(), [])
+
+        await database_sync_to_async(lobby.rebuild_lobby)()
+        self.assertEqual((await lobby_communicator.receive_json_from())['races'], [])
+
+        await communicator.disconnect()
+        await lobby_communicator.disconnect()
+
+
+class QueryPlanTestCase(TestCase):
+    """
+    Hot queries have to be served by an index. Tables are tiny in tests,
+    so sequential scans are turned off to see which index the planner
+    would pick once the tables grow.
+    """
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index_description):
+        query_plan = queryset.explain()
+        self.assertIn(index_description, query_plan)
+        self.assertNotIn('Seq Scan', query_plan)
+
+    def test_lobby_query_plan(self):
+        races = models.Race.objects.filter(status__in=lobby.LOBBY_STATUSES).order_by('created_at')
+        self.assertUsesIndex(races, 'race_available_idx')
+
+    def test_joinable_race_query_plan(self):
+        races = models.Race.objects.filter(Q(id='hHwHtvf5kF'), Q(status="w") | Q(status="t"))
+        self.assertUsesIndex(races, 'Index Cond: ((id)::text')
+
+    def test_race_statistics_query_plans(self):
+        finished_races = reaper.get_stale_races()['started'].filter(reaper.has_statistics())
+        self.assertUsesIndex(finished_races, 'race_statistics_place_idx')
+
+        replay = models.RaceStatistics.objects.filter(race_id='hHwHtvf5kF', player_id=1, finished=True)
+        self.assertUsesIndex(replay, 'race_statistics_place_idx')
+
+    def test_player_races_query_plan(self):
+        races_statistics = models.RaceStatistics.objects.filter(player_id=1).order_by('-id')[:20]
+        self.assertUsesIndex(races_statistics, 'race_statistics_player_idx')
+
+    def test_stale_race_query_plans(self):
+        stale_races = reaper.get_stale_races()
+        self.assertUsesIndex(stale_races['waiting'], 'race_available_idx')
+        self.assertUsesIndex(stale_races['on_timer'], 'race_start_date_idx')
+        self.assertUsesIndex(stale_races['started'], 'race_start_date_idx')
+
+
+class SimultaneousFinishTestCase(APITransactionTestCase):
+    amount_of_players = 40
+
+    def setUp(self):
+        Quotes.objects.create(quote="Testing quote!", author="Tester")
+        User.objects.bulk_create([User(username=f'FinishTestUser{idx}') for idx in range(self.amount_of_players)])
+        self.access_tokens = [str(RefreshToken.for_user(user).access_token) for user in User.objects.all()]
+        self.url_patterns = JwtAuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+
+    async def finish_race(self, communicator, words):
+        for word in words:
+            await communicator.send_json_to({'type': 'race_progress', 'word': word})
+
+    async def test_simultaneous_finishes(self):
+        race = await database_sync_to_async(models.Race.objects.create)()
+
+        communicators = [
+            WebsocketCommunicator(self.url_patterns, f"/ws/race/{race.id}/?token={access_token}")
+            for access_token in self.access_tokens
+        ]
+        await asyncio.gather(*(communicator.connect(timeout=60) for communicator in communicators))
+
+        await get_async_redis().zrem(race_start_scheduler.key, race.id)
+        await race_start_scheduler.start_claimed_race(race.id, timezone.now())
+
+        race_start = await wait_for_message_by_type(communicators[0], 'race_start')
+        await asyncio.gather(*(wait_for_message_by_type(communicator, 'race_start') for communicator in communicators[1:]))
+
+        words = race_start['quote'].split()
+        await asyncio.gather(*(self.finish_race(communicator, words) for communicator in communicators))
+
+        finished_players = {}
+        while len(finished_players) < self.amount_of_players:
+            message = await wait_for_message_by_type(communicators[0], 'race_player_finished')
+            finished_players[message['player_id']] = message['place']
+
+        self.assertEqual(sorted(finished_players.values()), list(range(1, self.amount_of_players + 1)))
+
+        recorded_places = await database_sync_to_async(list)(
+            models.RaceStatistics.objects.filter(race_id=race.id).order_by('place').values_list('place', flat=True)
+        )
+        self.assertEqual(recorded_places, list(range(1, self.amount_of_players + 1)))
+
+        await asyncio.gather(*(communicator.disconnect(timeout=60) for communicator in communicators))
+
+
+def run_finishing_place_worker(race_id, claimed_places_key, barrier, amount_of_finishes):
+    barrier.wait()
+
+    for _ in range(amount_of_finishes):
+        get_redis().rpush(claimed_places_key, claim_finishing_place(race_id))
+
+
+@override_settings(RACE_PROGRESS_TICK_MS=50)
+class RaceProgressBatchTestCase(APITransactionTestCase):
+    amount_of_players = 3
+
+    def setUp(self):
+        self.quote = Quotes.objects.create(quote="The quick brown fox jumps over the lazy dog", author="Tester")
+        User.objects.bulk_create([User(username=f'ProgressTestUser{idx}') for idx in range(self.amount_of_players)])
+        self.users = list(User.objects.order_by('id'))
+        self.access_tokens = [str(RefreshToken.for_user(user).access_token) for user in self.users]
+        self.url_patterns = JwtAuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+
+    async def type_words(self, communicator, words):
+        for word in words:
+            await communicator.send_json_to({'type': 'race_progress', 'word': word})
+
+    async def test_progress_is_sent_in_batches(self):
+        race = await database_sync_to_async(models.Race.objects.create)()
+
+        communicators = [
+            WebsocketCommunicator(self.url_patterns, f"/ws/race/{race.id}/?token={access_token}")
+            for access_token in self.access_tokens
+        ]
+        for communicator in communicators:
+            await communicator.connect()
+            await wait_for_message_by_type(communicator, 'player_list')
+
+        await get_async_redis().zrem(race_start_scheduler.key, race.id)
+        await race_start_scheduler.start_claimed_race(race.id, timezone.now())
+
+        for communicator in communicators:
+            await wait_for_message_by_type(communicator, 'race_start')
+
+        words = self.quote.quote.split()
+        await asyncio.gather(
+            *(self.type_words(communicator, words[:-1]) for communicator in communicators[:-1]),
+            self.type_words(communicators[-1], words),
+        )
+
+        latest_word_indexes = {}
+        amount_of_batches = 0
+        finished_player = None
+
+        while finished_player is None or len(latest_word_indexes) < self.amount_of_players:
+            message = await communicators[0].receive_json_from(timeout=5)
+            self.assertNotEqual(message['type'], 'race_progress')
+
+            if message['type'] == 'race_progress_batch':
+                amount_of_batches += 1
+                latest_word_indexes.update((progress['player_id'], progress['word_index']) for progress in message['progress'])
+            elif message['type'] == 'race_player_finished':
+                # Progress of the player is sent before the player finishes.
+                self.assertEqual(latest_word_indexes.get(message['player_id']), len(words) - 1)
+                finished_player = message['player_id']
+
+        self.assertEqual(finished_player, self.users[-1].id)
+        self.assertEqual(latest_word_indexes, {
+            **{user.id: len(words) - 2 for user in self.users[:-1]},
+            self.users[-1].id: len(words) - 1,
+        })
+        self.assertLess(amount_of_batches, len(words))
+
+        for communicator in communicators:
+            await communicator.disconnect()
+
+
+class GhostRaceTestCase(APITransactionTestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = self.settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create(username='TestUser1', password='TestPass.123')
+        self.access_token = RefreshToken.for_user(self.user).access_token
+        self.headers = {'Authorization': f"Bearer {str(self.access_token)}"}
+        self.url_patterns = JwtAuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+
+        self.quote = Quotes.objects.create(quote="Testing quote!", author="Tester")
+        Quotes.objects.create(quote="Another quote", author="Tester")
+
+        get_redis().delete(leaderboards.get_leaderboard_key('all_time'))
+        self.addCleanup(get_redis().delete, leaderboards.get_leaderboard_key('all_time'))
+
+    def record_race(self, player, average_speed, word_times=(100, 300), is_recorded=True):
+        replay_recorder = ReplayRecorder()
+        for word_time in word_times:
+            replay_recorder.record_word(word_time)
+
+        leaderboards.record_race(player.id, self.quote.id, average_speed)
+
+        return models.RaceStatistics.objects.create(
+            player=player,
+            race=models.Race.objects.create(quote=self.quote, status="f"),
+            finished=True,
+            time_racing=datetime.timedelta(milliseconds=word_times[-1]),
+            place=1,
+            average_speed=average_speed,
+            replay=replay_recorder.to_file('replay') if is_recorded else '',
+        )
+
+    def test_create_ghost_race(self):
+        response = self.client.post('/api/races/race/create/', {'ghost': "best"}, format='json', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+        other_user = User.objects.create(username='TestUser2', password='TestPass.123')
+        best_race = self.record_race(self.user, 40)
+        top_race = self.record_race(other_user, 50)
+        self.record_race(self.user, 30)
+
+        response = self.client.post('/api/races/race/create/', {'ghost': "best"}, format='json', headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(models.Race.objects.get(id=response.json()['id']).ghost, best_race)
+
+        response = self.client.post('/api/races/race/create/', {'ghost': "top"}, format='json', headers=self.headers)
+        self.assertEqual(models.Race.objects.get(id=response.json()['id']).ghost, top_race)
+
+        # The leader's fastest race hasn't been recorded, so their fastest recorded race is raced against.
+        self.record_race(other_user, 60, is_recorded=False)
+        response = self.client.post('/api/races/race/create/', {'ghost': "top"}, format='json', headers=self.headers)
+        self.assertEqual(models.Race.objects.get(id=response.json()['id']).ghost, top_race)
+
+        response = self.client.post('/api/races/race/create/', {'ghost': "worst"}, format='json', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_ghost_races_with_the_player(self):
+        ghost = await database_sync_to_async(self.record_race)(self.user, 40)
+        race = await database_sync_to_async(models.Race.objects.create)(creator=self.user, ghost=ghost)
+
+        communicator = WebsocketCommunicator(self.url_patterns, f"/ws/race/{race.id}/?token={self.access_token}")
+        await communicator.connect()
+        await wait_for_message_by_type(communicator, 'player_list')
+
+        await database_sync_to_async(models.Race.objects.filter(id=race.id).update)(status="t")
+        start_date = timezone.now()
+        await race_start_scheduler.start_claimed_race(race.id, start_date)
+
+        race_start = await wait_for_message_by_type(communicator, 'race_start')
+        self.assertEqual(race_start['quote_id'], self.quote.id)
+        self.assertEqual(race_start['ghost']['id'], ghost.id)
+        self.assertEqual(race_start['ghost']['player'], {'id': self.user.id, 'username': self.user.username})
+
+        for word_index, word_time in enumerate([100, 300]):
+            ghost_progress = await wait_for_message_by_type(communicator, 'ghost_progress')
+            self.assertEqual(ghost_progress, {'type': 'ghost_progress', 'ghost_id': ghost.id, 'word_index': word_index})
+            self.assertGreaterEqual(timezone.now() - start_date, datetime.timedelta(milliseconds=word_time))
+
+        ghost_finished = await wait_for_message_by_type(communicator, 'ghost_finished')
+        self.assertEqual(ghost_finished['average_speed'], 40)
+
+        await communicator.disconnect()
+
+    async def test_many_ghosts(self):
+        ghost = await database_sync_to_async(self.record_race)(self.user, 40, word_times=range(100, 600, 50))
+        amount_of_ghosts = 300
+        amount_of_threads = threading.active_count()
+
+        started_at = perf_counter()
+        tasks = [ghosts.start_ghost(f'ghost_race_{idx}', ghost, timezone.now()) for idx in range(amount_of_ghosts)]
+
+        await asyncio.sleep(0.2)
+        # Ghosts are tasks of the event loop, they don't take a thread each.
+        self.assertLess(threading.active_count() - amount_of_threads, 40)
+
+        await asyncio.gather(*tasks)
+        self.assertLess(perf_counter() - started_at, 3)
+        self.assertEqual(ghosts.ghost_tasks, set())
+
+
+def cleans_up_matchmaking(test):
+    """
+    Consumers of the queued players and the matchmaker keep waiting on the
+    loop of the test, they are stopped before the loop is closed.
+    """
+    async def wrapper(self):
+        try:
+            await test(self)
+        finally:
+            # A consumer stopped while the layer is still cleaning up after
+            # the previous message leaves the channel locked for good.
+            await asyncio.gather(*get_channel_layer().receive_cleaners)
+            for communicator in self.communicators:
+                await communicator.disconnect()
+            await matchmaking.matchmaker.stop()
+
+    return wrapper
+
+
+class MatchmakingTestCase(APITransactionTestCase):
+    def setUp(self):
+        User.objects.bulk_create([User(username=f'MatchmakingTestUser{idx}') for idx in range(4)])
+        self.users = list(User.objects.order_by('id'))
+        self.access_tokens = [str(RefreshToken.for_user(user).access_token) for user in self.users]
+        self.url_patterns = JwtAuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+        self.communicators = []
+
+        async_to_sync(matchmaking.clear_queues)()
+        self.addCleanup(async_to_sync(matchmaking.clear_queues))
+
+        for attribute, value in [('race_size', 3), ('wait_timeout', 0.5), ('poll_interval', 0.05)]:
+            patcher = mock.patch.object(matchmaking.matchmaker, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def queue(self, access_token):
+        communicator = WebsocketCommunicator(self.url_patterns, f"/ws/matchmaking/?token={access_token}")
+        self.communicators.append(communicator)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator, await communicator.receive_json_from()
+
+    @cleans_up_matchmaking
+    async def test_full_race_is_matched(self):
+        queued = [await self.queue(access_token) for access_token in self.access_tokens]
+        self.assertEqual(queued[0][1], {'type': 'queued', 'band': matchmaking.get_wpm_band(matchmaking.DEFAULT_WPM)})
+
+        matches = [await communicator.receive_json_from(timeout=2) for communicator, _ in queued[:3]]
+        race_ids = {match['race_id'] for match in matches}
+        self.assertEqual(len(race_ids), 1)
+
+        race = await database_sync_to_async(models.Race.objects.get)(id=race_ids.pop())
+        self.assertEqual(race.status, "t")
+        self.assertEqual(race.start_date.isoformat(), matches[0]['time'])
+        self.assertIsNotNone(await get_async_redis().zscore(race_start_scheduler.key, race.id))
+
+        # The last player waits for more players and is removed once gone.
+        self.assertTrue(await queued[3][0].receive_nothing(timeout=0.2))
+        await queued[3][0].disconnect()
+        self.assertFalse(await matchmaking.matchmaker.dequeue(self.users[3].id, 'any'))
+        self.assertEqual(await get_async_redis().hlen(matchmaking.MATCHMAKING_CHANNELS_KEY), 0)
+
+    @cleans_up_matchmaking
+    async def test_smaller_race_is_matched_after_timeout(self):
+        queued = [await self.queue(access_token) for access_token in self.access_tokens[:2]]
+
+        self.assertTrue(await queued[0][0].receive_nothing(timeout=0.3))
+
+        matches = [await communicator.receive_json_from(timeout=2) for communicator, _ in queued]
+        self.assertEqual(matches[0]['race_id'], matches[1]['race_id'])
+
+    @cleans_up_matchmaking
+    async def test_players_are_matched_by_speed(self):
+        await database_sync_to_async(PlayerStatisticsSummary.objects.create)(
+            player=self.users[0], amount_of_races=1, recent_wpms=[120],
+        )
+
+        communicator, queued = await self.queue(self.access_tokens[0])
+        self.assertEqual(queued['band'], 6)
+
+        other_players = [await self.queue(access_token) for access_token in self.access_tokens[1:3]]
+
+        self.assertEqual((await other_players[0][0].receive_json_from(timeout=2))['type'], 'match_found')
+        self.assertTrue(await communicator.receive_nothing(timeout=0.7))
+
+        await communicator.send_json_to({'type': 'cancel'})
+        self.assertEqual((await communicator.receive_output())['type'], 'websocket.close')
+        self.assertEqual(await get_async_redis().zcard(matchmaking.MATCHMAKING_QUEUE_KEY + '6'), 0)
+
+    @cleans_up_matchmaking
+    async def test_players_are_told_when_race_can_not_be_created(self):
+        create_races = mock.AsyncMock(side_effect=DatabaseError("Database is gone"))
+
+        with mock.patch.object(matchmaking.matchmaker, 'create_races', create_races), self.assertLogs('race_handler.matchmaking', 'ERROR'):
+            queued = [await self.queue(access_token) for access_token in self.access_tokens[:3]]
+
+            for communicator, _ in queued:
+                self.assertEqual((await communicator.receive_json_from(timeout=2))['type'], 'error')
+                self.assertEqual((await communicator.receive_output())['type'], 'websocket.close')
+
+        self.assertEqual(await get_async_redis().hlen(matchmaking.MATCHMAKING_CHANNELS_KEY), 0)
+
+    async def test_unauthenticated_user(self):
+        communicator = WebsocketCommunicator(self.url_patterns, "/ws/matchmaking/")
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
+
+
+class FailingRaceStartScheduler(RaceStartScheduler):
+    """
+    Scheduler which fails to start every race the first time.
+    """
+
+    def __init__(self, key, **kwargs):
+        super().__init__(key, **kwargs)
+        self.attempts = []
+
+    async def start_claimed_race(self, race_id, start_date):
+        self.attempts.append((race_id, start_date))
+
+        if len(self.attempts) == 1:
+            raise DatabaseError("Database is gone")
+
+
+class RaceStartLeaseTestCase(APITransactionTestCase):
+    key = 'test:race_handler:race_start_leases'
+
+    def setUp(self):
+        get_redis().delete(self.key, f'{self.key}:leases', f'{self.key}:claimed')
+
+    def tearDown(self):
+        get_redis().delete(self.key, f'{self.key}:leases', f'{self.key}:claimed')
+
+    async def test_failed_start_is_tried_again(self):
+        scheduler = FailingRaceStartScheduler(self.key, lease_duration=0.2)
+        start_date = timezone.now().replace(microsecond=0)
+        await get_async_redis().zadd(self.key, {'race': start_date.timestamp()})
+
+        with self.assertLogs('race_handler.scheduler', 'ERROR'):
+            await scheduler.start_due_races()
+
+        # The race is leased, so it isn't claimed again before the lease runs out.
+        await scheduler.start_due_races()
+        self.assertEqual(len(scheduler.attempts), 1)
+
+        await asyncio.sleep(0.3)
+        await scheduler.start_due_races()
+
+        self.assertEqual(scheduler.attempts, [('race', start_date), ('race', start_date)])
+        self.assertEqual(await get_async_redis().zcard(f'{self.key}:leases'), 0)
+        self.assertEqual(await get_async_redis().hlen(f'{self.key}:claimed'), 0)
+
+    async def test_race_of_dead_worker_is_claimed_again(self):
+        scheduler = RaceStartScheduler(self.key, lease_duration=0.2)
+        await get_async_redis().zadd(self.key, {'race': timezone.now().timestamp()})
+
+        # The worker dies after it has claimed the race.
+        self.assertEqual(len(await scheduler.claim_due_races()), 1)
+        self.assertEqual(await scheduler.claim_due_races(), [])
+
+        await asyncio.sleep(0.3)
+        self.assertEqual([race_id for race_id, _ in await scheduler.claim_due_races()], ['race'])
+
+    async def test_race_start_is_sent_again_when_sending_fails(self):
+        quote = await database_sync_to_async(Quotes.objects.create)(quote="Testing quote!", author="Tester")
+        race = await database_sync_to_async(models.Race.objects.create)(status="t")
+        start_date = timezone.now().replace(microsecond=0)
+        await get_async_redis().zadd(self.key, {race.id: start_date.timestamp()})
+
+        channel_layer = get_channel_layer()
+        channel_name = await channel_layer.new_channel()
+        await channel_layer.group_add(race.id, channel_name)
+
+        scheduler = RaceStartScheduler(self.key, lease_duration=0.2)
+        group_send = mock.AsyncMock(side_effect=ConnectionError("Redis is gone"))
+
+        # The race is marked as started, but its players are never told.
+        with mock.patch.object(channel_layer, 'group_send', group_send), self.assertLogs('race_handler.scheduler', 'ERROR'):
+            await scheduler.start_due_races()
+
+        self.assertEqual((await database_sync_to_async(models.Race.objects.get)(id=race.id)).status, "s")
+
+        await asyncio.sleep(0.3)
+        await scheduler.start_due_races()
+
+        race_start = await asyncio.wait_for(channel_layer.receive(channel_name), timeout=1)
+        self.assertEqual(race_start['type'], 'race_start')
+        self.assertEqual(race_start['quote_id'], quote.id)
+        self.assertEqual(race_start['time'], start_date.isoformat())
+        self.assertEqual(await get_async_redis().zcard(f'{self.key}:leases'), 0)
+
+        await channel_layer.group_discard(race.id, channel_name)
+
+
+class DistributedFinishingPlaceTestCase(SimpleTestCase):
+    race_id = 'test_race_places'
+    claimed_places_key = 'test:race_handler:claimed_places'
+    amount_of_workers = 8
+    amount_of_finishes = 10
+
+    def setUp(self):
+        get_redis().delete(RACE_PLACES_KEY.format(self.race_id), self.claimed_places_key)
+
+    def tearDown(self):
+        get_redis().delete(RACE_PLACES_KEY.format(self.race_id), self.claimed_places_key)
+
+    def test_places_are_unique_across_workers(self):
+        context = multiprocessing.get_context('fork')
+        barrier = context.Barrier(self.amount_of_workers)
+        workers = [
+            context.Process(
+                target=run_finishing_place_worker,
+                args=(self.race_id, self.claimed_places_key, barrier, self.amount_of_finishes),
+            )
+            for idx in range(self.amount_of_workers)
+        ]
+
+        for worker in workers:
+            worker.start()
+
+        for worker in workers:
+            worker.join(timeout=30)
+            self.assertEqual(worker.exitcode, 0)
+
+        claimed_places = sorted(int(place) for place in get_redis().lrange(self.claimed_places_key, 0, -1))
+        self.assertEqual(claimed_places, list(range(1, self.amount_of_workers * self.amount_of_finishes + 1)))
+
+
+class RaceReaperTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='ReaperTestUser')
+        lobby.clear_lobby()
+        self.addCleanup(lobby.clear_lobby)
+
+    def create_race(self, status, age, **kwargs):
+        race = models.Race.objects.create(status=status, start_date=timezone.now() - age, **kwargs)
+        race.participants.add(self.user)
+        models.Race.objects.filter(id=race.id).update(created_at=timezone.now() - age)
+        return race
+
+    def test_stale_races_are_reaped(self):
+        stale_waiting_race = self.create_race("w", datetime.timedelta(hours=2))
+        waiting_race = self.create_race("w", datetime.timedelta(minutes=5))
+        stale_race_on_timer = self.create_race("t", datetime.timedelta(minutes=10))
+        race_on_timer = self.create_race("t", datetime.timedelta(seconds=-5))
+        stale_started_race = self.create_race("s", datetime.timedelta(hours=2))
+        started_race = self.create_race("s", datetime.timedelta(minutes=1))
+        stale_race_with_results = self.create_race("s", datetime.timedelta(hours=2))
+        models.RaceStatistics.objects.create(
+            player=self.user, race=stale_race_with_results, finished=True, place=1, average_speed=5,
+        )
+        get_redis().zadd(race_start_scheduler.key, {stale_race_on_timer.id: stale_race_on_timer.start_date.timestamp()})
+        self.addCleanup(get_redis().zrem, race_start_scheduler.key, stale_race_on_timer.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reaped = reaper.reap_stale_races(batch_size=1)
+
+        self.assertEqual(reaped, {'waiting': 1, 'on_timer': 1, 'started': 1, 'finished': 1})
+        self.assertCountEqual(
+            models.Race.objects.values_list('id', 'status'),
+            [(waiting_race.id, "w"), (race_on_timer.id, "t"), (started_race.id, "s"), (stale_race_with_results.id, "f")],
+        )
+        self.assertEqual(
+            models.Race.participants.through.objects.filter(
+                race_id__in=[stale_waiting_race.id, stale_race_on_timer.id, stale_started_race.id]
+            ).count(),
+            0,
+        )
+        self.assertIsNone(get_redis().zscore(race_start_scheduler.key, stale_race_on_timer.id))
+
+        races, _ = lobby.get_lobby_page()
+        self.assertEqual({race['id'] for race in races}, {waiting_race.id, race_on_timer.id})
+
+    def test_nothing_to_reap(self):
+        self.create_race("w", datetime.timedelta(minutes=5))
+        self.assertEqual(reaper.reap_stale_races(), {'waiting': 0, 'on_timer': 0, 'started': 0, 'finished': 0})
+
+
+@override_settings(RACE_REAPER_INTERVAL=60)
+class RaceReaperTaskTestCase(SimpleTestCase):
+    key = 'test:race_handler:reaper:lock'
+
+    def setUp(self):
+        get_redis().delete(self.key)
+
+    def tearDown(self):
+        get_redis().delete(self.key)
+
+    @mock.patch.object(reaper, 'reap_stale_races', return_value={'waiting': 1, 'on_timer': 0, 'started': 0, 'finished': 0})
+    async def test_stale_races_are_reaped_once_per_interval(self, reap_stale_races):
+        race_reapers = [reaper.RaceReaper(key=self.key) for _ in range(4)]
+
+        results = await asyncio.gather(*(race_reaper.reap_if_due() for race_reaper in race_reapers))
+
+        self.assertEqual(sum(result is not None for result in results), 1)
+        self.assertEqual(reap_stale_races.call_count, 1)
+        self.assertLessEqual(await get_async_redis().ttl(self.key), 60)
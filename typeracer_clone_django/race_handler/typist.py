@@ -0,0 +1,83 @@
+BACKSPACE = '\b'
+
+# Keystrokes are timed by the client, but the time can't be earlier than
+# the server has seen the keys by more than MAX_CLIENT_LAG_MS, so a client
+# can't slow its clock down to look faster, nor later by more than
+# MAX_CLIENT_CLOCK_AHEAD_MS.
+MAX_CLIENT_LAG_MS = 1000
+MAX_CLIENT_CLOCK_AHEAD_MS = 1000
+
+
+class TypistState:
+    """
+    Keystroke progress of one player in the race. Every keystroke is handled
+    in constant time and only a few numbers are kept per player, so a worker
+    can hold tens of thousands of them.
+
+    A wrong character has to be erased before the quote can be typed on,
+    like in the game itself. Correct characters can be erased back to the
+    end of the last word the player has completed.
+    """
+    __slots__ = ('position', 'committed_position', 'pending_errors', 'keystrokes', 'errors', 'elapsed_ms')
+
+    def __init__(self):
+        self.position = 0
+        self.committed_position = 0
+        self.pending_errors = 0
+        self.keystrokes = 0
+        self.errors = 0
+        self.elapsed_ms = 0
+
+    def type_key(self, key, quote):
+        if key == BACKSPACE:
+            if self.pending_errors:
+                self.pending_errors -= 1
+            elif self.position > self.committed_position:
+                self.position -= 1
+            return
+
+        self.keystrokes += 1
+
+        if not self.pending_errors and self.position < len(quote) and quote[self.position] == key:
+            self.position += 1
+        else:
+            self.errors += 1
+            self.pending_errors += 1
+
+    def type_keys(self, keys, quote, client_elapsed_ms, server_elapsed_ms):
+        """
+        Types the chunk of keys, ``client_elapsed_ms`` is the time since the
+        race start at which the client has typed the last of them.
+        """
+        for key in keys:
+            self.type_key(key, quote)
+
+        client_elapsed_ms = min(
+            max(client_elapsed_ms, server_elapsed_ms - MAX_CLIENT_LAG_MS),
+            server_elapsed_ms + MAX_CLIENT_CLOCK_AHEAD_MS,
+        )
+        self.elapsed_ms = max(self.elapsed_ms, client_elapsed_ms)
+
+    def commit(self, position):
+        """
+        Marks the quote up to the position, the end of the word the player
+        has completed, as typed for good.
+        """
+        self.committed_position = max(self.committed_position, position)
+
+    def has_typed(self):
+        return self.keystrokes > 0
+
+    @property
+    def wpm(self):
+        if self.elapsed_ms <= 0:
+            return 0
+
+        return self.position / 5 / (self.elapsed_ms / 60000)
+
+    @property
+    def accuracy(self):
+        if not self.keystrokes:
+            return 1
+
+        return (self.keystrokes - self.errors) / self.keystrokes
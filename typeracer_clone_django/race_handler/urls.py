@@ -4,5 +4,6 @@ from . import views
 
 urlpatterns = [
     path('races/available/', views.race_list, name="race_list"),
-    path('races/race/create/', views.create_race, name="race_create")
+    path('races/race/create/', views.create_race, name="race_create"),
+    path('races/<str:race_id>/replays/<int:player_id>/', views.race_replay, name="race_replay"),
 ]
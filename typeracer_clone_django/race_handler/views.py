@@ -1,25 +1,70 @@
 
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import Count, Q 
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.utils.urls import replace_query_param
 
 from . import models
 from . import serializers
+from . import lobby
+from . import replay
+from . import ghosts
+from quotes_interface import services as quote_services
+from quotes_interface.serializers import QuoteFiltersSerializer
+
+
+def get_lobby_etag(request):
+    return f'"lobby-{lobby.get_lobby_version()}"'
+
+
+def get_page_size_or_none(request):
+    try:
+        page_size = int(request.GET.get('page_size', lobby.DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return None
+
+    if page_size < 1:
+        return None
+
+    return min(page_size, lobby.MAX_PAGE_SIZE)
 
 
 @api_view(['GET'])
+@cache_control(no_cache=True)
+@condition(etag_func=get_lobby_etag)
 def race_list(request):
     """
-    List all available races
+    List all available races, a page at a time. The link to the next page
+    is sent in the Link header.
     """
     if request.method == 'GET':
-        races = models.Race.objects.filter(Q(status='w') | Q(status='t')).annotate(amount_of_players=Count('participants'))
+        page_size = get_page_size_or_none(request)
+
+        if page_size is None:
+            return Response({"error" : "page_size should be a positive number"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            races, next_cursor = lobby.get_lobby_page(request.GET.get('cursor'), page_size)
+        except lobby.InvalidCursor:
+            return Response({"error" : "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+
         serializer = serializers.RaceSerializer(races, many=True)
-        return Response(serializer.data)
+        response = Response(serializer.data)
+
+        if next_cursor is not None:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+            response['Link'] = f'<{next_url}>; rel="next"'
+
+        return response
 
 
 @api_view(['POST'])
@@ -28,7 +73,27 @@ def create_race(request):
     if request.method == 'POST':
         current_user = request.user
 
-        race = models.Race.objects.create(creator=current_user)
+        filters_serializer = QuoteFiltersSerializer(data=request.data)
+
+        if not filters_serializer.is_valid():
+            return Response(filters_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        quote_filters = filters_serializer.validated_data
+        ghost = None
+
+        if 'ghost' in request.data:
+            if request.data['ghost'] not in ghosts.GHOST_CHOICES:
+                return Response({"error" : f"ghost should be one of: {', '.join(ghosts.GHOST_CHOICES)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+            ghost = ghosts.find_ghost_or_none(request.data['ghost'], current_user)
+
+            if ghost is None:
+                return Response({"error" : "There are no recorded races to race against"}, status=status.HTTP_400_BAD_REQUEST)
+
+        elif quote_filters and not quote_services.get_matching_quote_ids(quote_filters):
+            return Response({"error" : "There are no quotes matching the filters"}, status=status.HTTP_400_BAD_REQUEST)
+
+        race = models.Race.objects.create(creator=current_user, quote_filters=quote_filters, ghost=ghost)
 
         
         race_dict = {
@@ -45,6 +110,36 @@ def create_race(request):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+async def stream_replay_events(replay_field):
+    """
+    Yields the events of the replay as lines of JSON. The generator is
+    asynchronous, so ASGI servers send every chunk as soon as it's decoded
+    instead of collecting the whole response first.
+    """
+    replay_file = await replay.open_replay_file(replay_field)
+
+    try:
+        async for event in replay.aiter_replay_events(replay_file):
+            yield json.dumps(event) + '\n'
+    finally:
+        await sync_to_async(replay_file.close, thread_sensitive=False)()
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def race_replay(request, race_id, player_id):
+    """
+    Streams the replay of the player in the race, one JSON event per line.
+    """
+    if request.method == 'GET':
+        race_statistics = get_object_or_404(models.RaceStatistics, race_id=race_id, player_id=player_id, finished=True)
+
+        if not race_statistics.replay:
+            return Response({"error" : "The race of the player hasn't been recorded"}, status=status.HTTP_404_NOT_FOUND)
+
+        return StreamingHttpResponse(stream_replay_events(race_statistics.replay), content_type='application/x-ndjson')
+
+
 # @api_view(['GET'])
 # @permission_classes([IsAuthenticated])
 # def force_start_race_timer(request, race_id):
@@ -0,0 +1,115 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .models import speed_to_wpm
+from config.redis_client import get_redis
+
+
+LEADERBOARD_KEY = 'statistics_page:leaderboard:{}'
+
+PERIODS = ('all_time', 'daily', 'weekly')
+
+# Leaderboards of the past days and weeks are kept for a while after the
+# period is over and are removed by Redis afterwards.
+PERIOD_TIMEOUTS = {
+    'daily': datetime.timedelta(days=2),
+    'weekly': datetime.timedelta(weeks=2),
+}
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+def get_period_name(period, date):
+    if period == 'daily':
+        return f'daily:{date:%Y-%m-%d}'
+
+    if period == 'weekly':
+        year, week, _ = date.isocalendar()
+        return f'weekly:{year}-W{week:02d}'
+
+    return period
+
+
+def get_leaderboard_key(period, date=None):
+    return LEADERBOARD_KEY.format(get_period_name(period, date or timezone.now()))
+
+
+def get_quote_leaderboard_key(quote_id):
+    return LEADERBOARD_KEY.format(f'quote:{quote_id}')
+
+
+def add_leaderboard_score(pipeline, key, player_id, average_speed, timeout=None):
+    # GT keeps the best score of the player instead of the latest one.
+    pipeline.zadd(key, {player_id: average_speed}, gt=True)
+
+    if timeout is not None:
+        pipeline.expire(key, timeout)
+
+
+def record_race(player_id, quote_id, average_speed, date=None):
+    """
+    Puts the speed of the finished race on every leaderboard it belongs to,
+    if it's the best speed of the player there.
+    """
+    date = date or timezone.now()
+
+    with get_redis().pipeline(transaction=False) as pipeline:
+        add_leaderboard_score(pipeline, get_leaderboard_key('all_time'), player_id, average_speed)
+
+        for period, timeout in PERIOD_TIMEOUTS.items():
+            add_leaderboard_score(pipeline, get_leaderboard_key(period, date), player_id, average_speed, timeout)
+
+        if quote_id is not None:
+            add_leaderboard_score(pipeline, get_quote_leaderboard_key(quote_id), player_id, average_speed)
+
+        pipeline.execute()
+
+
+def serialize_leaderboard_entries(entries, first_rank):
+    usernames = dict(User.objects.filter(id__in=[player_id for player_id, _ in entries]).values_list('id', 'username'))
+
+    return [
+        {
+            'rank': first_rank + idx,
+            'player': {'id': int(player_id), 'username': usernames.get(int(player_id))},
+            'average_speed': average_speed,
+            'wpm': speed_to_wpm(average_speed),
+        }
+        for idx, (player_id, average_speed) in enumerate(entries)
+    ]
+
+
+def get_leaderboard_page(key, offset=0, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Returns the amount of players on the leaderboard and the players from
+    ``offset`` rank on, the fastest player has rank 1.
+    """
+    with get_redis().pipeline(transaction=False) as pipeline:
+        pipeline.zcard(key)
+        pipeline.zrevrange(key, offset, offset + page_size - 1, withscores=True)
+        amount_of_players, entries = pipeline.execute()
+
+    return amount_of_players, serialize_leaderboard_entries(entries, offset + 1)
+
+
+def get_top_player_ids(key, amount_of_players):
+    return [int(player_id) for player_id in get_redis().zrevrange(key, 0, amount_of_players - 1)]
+
+
+def get_player_position(key, player_id):
+    """
+    Returns rank and speed of the player or ``None`` if the player isn't
+    on the leaderboard.
+    """
+    with get_redis().pipeline(transaction=False) as pipeline:
+        pipeline.zrevrank(key, player_id)
+        pipeline.zscore(key, player_id)
+        rank, average_speed = pipeline.execute()
+
+    if rank is None:
+        return None
+
+    return {'rank': rank + 1, 'average_speed': average_speed, 'wpm': speed_to_wpm(average_speed)}
@@ -0,0 +1,90 @@
+import datetime
+import time
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+
+from statistics_page import leaderboards
+from race_handler.models import RaceStatistics
+from config.redis_client import get_redis
+
+
+class Command(BaseCommand):
+    help = "Rebuilds leaderboards in Redis from the races recorded in the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        started_at = time.perf_counter()
+
+        now = timezone.now()
+        start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        start_of_week = start_of_day - datetime.timedelta(days=start_of_day.weekday())
+
+        finished_races = RaceStatistics.objects.filter(finished=True, player__isnull=False)
+
+        self.rebuild_leaderboard(leaderboards.get_leaderboard_key('all_time', now), finished_races)
+        self.rebuild_leaderboard(
+            leaderboards.get_leaderboard_key('daily', now),
+            finished_races.filter(race__start_date__gte=start_of_day),
+            leaderboards.PERIOD_TIMEOUTS['daily'],
+        )
+        self.rebuild_leaderboard(
+            leaderboards.get_leaderboard_key('weekly', now),
+            finished_races.filter(race__start_date__gte=start_of_week),
+            leaderboards.PERIOD_TIMEOUTS['weekly'],
+        )
+
+        amount_of_quotes = self.rebuild_quote_leaderboards(finished_races.filter(race__quote__isnull=False))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt period leaderboards and {amount_of_quotes} quote leaderboards "
+            f"in {time.perf_counter() - started_at:.1f}s"
+        ))
+
+    def replace_leaderboard(self, key, scores, timeout=None):
+        """
+        Writes the scores next to the leaderboard and swaps them in at once,
+        so the leaderboard is never seen half-built.
+        """
+        redis_client = get_redis()
+        temporary_key = f'{key}:rebuild'
+
+        redis_client.delete(temporary_key)
+
+        for idx in range(0, len(scores), self.batch_size):
+            redis_client.zadd(temporary_key, dict(scores[idx:idx + self.batch_size]))
+
+        with redis_client.pipeline(transaction=True) as pipeline:
+            if scores:
+                pipeline.rename(temporary_key, key)
+
+                if timeout is not None:
+                    pipeline.expire(key, timeout)
+            else:
+                pipeline.delete(key)
+
+            pipeline.execute()
+
+    def rebuild_leaderboard(self, key, races_statistics, timeout=None):
+        best_speeds = races_statistics.values_list('player_id').annotate(best_speed=Max('average_speed'))
+        self.replace_leaderboard(key, list(best_speeds.iterator(chunk_size=self.batch_size)), timeout)
+
+    def rebuild_quote_leaderboards(self, races_statistics):
+        best_speeds = (
+            races_statistics.values_list('race__quote_id', 'player_id')
+            .annotate(best_speed=Max('average_speed'))
+            .order_by('race__quote_id')
+        )
+
+        amount_of_quotes = 0
+        for quote_id, rows in groupby(best_speeds.iterator(chunk_size=self.batch_size), key=lambda row: row[0]):
+            scores = [(player_id, best_speed) for _, player_id, best_speed in rows]
+            self.replace_leaderboard(leaderboards.get_quote_leaderboard_key(quote_id), scores)
+            amount_of_quotes += 1
+
+        return amount_of_quotes
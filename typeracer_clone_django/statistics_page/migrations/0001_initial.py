@@ -0,0 +1,30 @@
+# Generated by Django 4.2.3 on 2026-10-18 14:23
+
+from django.conf import settings
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerStatisticsSummary',
+            fields=[
+                ('player', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='statistics_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('amount_of_races', models.PositiveIntegerField(default=0)),
+                ('amount_of_wins', models.PositiveIntegerField(default=0)),
+                ('best_wpm', models.FloatField(default=0)),
+                ('total_wpm', models.FloatField(default=0)),
+                ('wpm_histogram', django.contrib.postgres.fields.ArrayField(base_field=models.PositiveIntegerField(), blank=True, default=list, size=None)),
+                ('recent_wpms', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), blank=True, default=list, size=None)),
+            ],
+        ),
+    ]
@@ -1,3 +1,94 @@
 from django.db import models
+from django.contrib.auth.models import User
+from django.contrib.postgres.fields import ArrayField
 
-# Create your models here.
+
+# Speed of the race is stored in characters per second, a word is
+# considered to be 5 characters long when it's converted to WPM.
+CHARACTERS_PER_WORD = 5
+
+MAX_WPM_BUCKET = 300
+AMOUNT_OF_RECENT_RACES = 10
+
+
+def speed_to_wpm(average_speed):
+    return average_speed * 60 / CHARACTERS_PER_WORD
+
+
+class PlayerStatisticsSummary(models.Model):
+    """
+    Statistics of all the races of the player, updated every time the
+    player finishes a race so they don't have to be computed from every
+    ``RaceStatistics`` row of the player.
+    """
+    player = models.OneToOneField(User, related_name="statistics_summary", on_delete=models.CASCADE, primary_key=True)
+
+    amount_of_races = models.PositiveIntegerField(default=0)
+    amount_of_wins = models.PositiveIntegerField(default=0)
+
+    best_wpm = models.FloatField(default=0)
+    total_wpm = models.FloatField(default=0)
+
+    # Amount of races finished with every WPM, the last bucket counts every
+    # race at MAX_WPM_BUCKET or faster.
+    wpm_histogram = ArrayField(models.PositiveIntegerField(), default=list, blank=True)
+    recent_wpms = ArrayField(models.FloatField(), default=list, blank=True)
+
+    def add_race(self, average_speed, place):
+        wpm = speed_to_wpm(average_speed)
+        bucket = min(max(int(wpm), 0), MAX_WPM_BUCKET)
+
+        self.amount_of_races += 1
+        self.amount_of_wins += 1 if place == 1 else 0
+        self.best_wpm = max(self.best_wpm, wpm)
+        self.total_wpm += wpm
+
+        if len(self.wpm_histogram) <= bucket:
+            self.wpm_histogram += [0] * (bucket + 1 - len(self.wpm_histogram))
+        self.wpm_histogram[bucket] += 1
+
+        self.recent_wpms = (self.recent_wpms + [wpm])[-AMOUNT_OF_RECENT_RACES:]
+
+    @property
+    def average_wpm(self):
+        if self.amount_of_races == 0:
+            return 0
+
+        return self.total_wpm / self.amount_of_races
+
+    @property
+    def recent_average_wpm(self):
+        if not self.recent_wpms:
+            return 0
+
+        return sum(self.recent_wpms) / len(self.recent_wpms)
+
+    @property
+    def wpm_trend(self):
+        """
+        How much faster the recent races are than the races on average.
+        """
+        return self.recent_average_wpm - self.average_wpm
+
+    @property
+    def win_rate(self):
+        if self.amount_of_races == 0:
+            return 0
+
+        return self.amount_of_wins / self.amount_of_races
+
+    def get_wpm_percentile(self, percentile):
+        """
+        Returns WPM which ``percentile`` percents of the races were slower
+        than or as fast as, rounded down to a whole WPM.
+        """
+        races_needed = self.amount_of_races * percentile / 100
+        amount_of_races = 0
+
+        for wpm, amount_of_races_in_bucket in enumerate(self.wpm_histogram):
+            amount_of_races += amount_of_races_in_bucket
+
+            if amount_of_races and amount_of_races >= races_needed:
+                return wpm
+
+        return 0
@@ -3,6 +3,7 @@ from django.contrib.auth.models import User
 
 from race_handler.models import Race, RaceStatistics
 from quotes_interface.models import Quotes
+from .models import PlayerStatisticsSummary
 
 class QuoteField(serializers.RelatedField):
     def to_representation(self, value):
@@ -20,7 +21,7 @@ class RaceSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Race
-        fields = ['quote']
+        fields = ['id', 'quote']
 
 class StatisticsSerializer(serializers.ModelSerializer):
     # amount_of_players = serializers.IntegerField()
@@ -28,16 +29,44 @@ class StatisticsSerializer(serializers.ModelSerializer):
     race = RaceSerializer(read_only=True)
     class Meta:
         model = RaceStatistics
-        fields = ('time_racing', 'place', 'average_speed', 'race')
+        fields = ('time_racing', 'place', 'average_speed', 'wpm', 'accuracy', 'errors', 'race')
+
+class PlayerStatisticsSummarySerializer(serializers.ModelSerializer):
+    average_wpm = serializers.FloatField()
+    median_wpm = serializers.SerializerMethodField()
+    percentile_90_wpm = serializers.SerializerMethodField()
+    recent_average_wpm = serializers.FloatField()
+    wpm_trend = serializers.FloatField()
+    win_rate = serializers.FloatField()
+
+    class Meta:
+        model = PlayerStatisticsSummary
+        fields = (
+            'amount_of_races', 'amount_of_wins', 'win_rate', 'best_wpm', 'average_wpm',
+            'median_wpm', 'percentile_90_wpm', 'recent_average_wpm', 'wpm_trend',
+        )
+
+    def get_median_wpm(self, summary):
+        return summary.get_wpm_percentile(50)
+
+    def get_percentile_90_wpm(self, summary):
+        return summary.get_wpm_percentile(90)
+
 
 class UserAndStatsSerializer(serializers.ModelSerializer):
-    races_statistics = StatisticsSerializer(many=True)
-    # races_statistics = serializers.SerializerMethodField()
+    """
+    Expects the summary and the latest races of the user in the context.
+    """
+    races_statistics = serializers.SerializerMethodField()
+    summary = serializers.SerializerMethodField()
 
 
     class Meta:
         model = User
-        fields = ['username', 'races_statistics']
+        fields = ['username', 'summary', 'races_statistics']
+
+    def get_races_statistics(self, user):
+        return StatisticsSerializer(self.context['races_statistics'], many=True).data
 
-    # def get_races_statistics():
-    #     pass
+    def get_summary(self, user):
+        return PlayerStatisticsSummarySerializer(self.context['summary']).data
@@ -0,0 +1,64 @@
+from django.db import IntegrityError, transaction
+
+from .models import PlayerStatisticsSummary
+from race_handler.models import RaceStatistics
+
+
+def build_player_summary(player):
+    """
+    Computes the summary from every finished race of the player, it's used
+    for players who finished their races before the summaries existed.
+    """
+    summary = PlayerStatisticsSummary(player=player)
+
+    races_statistics = RaceStatistics.objects.filter(player=player, finished=True).order_by('id')
+    for average_speed, place in races_statistics.values_list('average_speed', 'place').iterator():
+        summary.add_race(average_speed, place)
+
+    return summary
+
+
+def save_built_player_summary(summary):
+    """
+    Saves the built summary unless someone else has saved it in the
+    meantime. Returns whether the summary was saved.
+    """
+    try:
+        with transaction.atomic():
+            summary.save(force_insert=True)
+    except IntegrityError:
+        return False
+
+    return True
+
+
+def get_player_summary(player):
+    try:
+        return PlayerStatisticsSummary.objects.get(player=player)
+    except PlayerStatisticsSummary.DoesNotExist:
+        summary = build_player_summary(player)
+
+    if not save_built_player_summary(summary):
+        return PlayerStatisticsSummary.objects.get(player=player)
+
+    return summary
+
+
+@transaction.atomic
+def record_race_in_player_summary(race_statistics):
+    """
+    Adds the race which has just been recorded to the summary of its player.
+    """
+    summary = PlayerStatisticsSummary.objects.select_for_update().filter(player_id=race_statistics.player_id).first()
+
+    if summary is None:
+        summary = build_player_summary(race_statistics.player)
+
+        if save_built_player_summary(summary):
+            return summary
+
+        summary = PlayerStatisticsSummary.objects.select_for_update().get(player_id=race_statistics.player_id)
+
+    summary.add_race(race_statistics.average_speed, race_statistics.place)
+    summary.save()
+    return summary
@@ -1,3 +1,217 @@
-from django.test import TestCase
+import datetime
+import io
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import PlayerStatisticsSummary, speed_to_wpm
+from . import services
+from . import leaderboards
+from race_handler.models import Race, RaceStatistics
+from quotes_interface.models import Quotes
+from config.redis_client import get_redis
+
+
+class PlayerStatisticsSummaryTestCase(SimpleTestCase):
+    def test_add_race(self):
+        summary = PlayerStatisticsSummary()
+
+        for wpm, place in [(60, 1), (80, 2), (100, 1), (40, 3)]:
+            summary.add_race(wpm * 5 / 60, place)
+
+        self.assertEqual(summary.amount_of_races, 4)
+        self.assertEqual(summary.amount_of_wins, 2)
+        self.assertEqual(summary.win_rate, 0.5)
+        self.assertAlmostEqual(summary.best_wpm, 100)
+        self.assertAlmostEqual(summary.average_wpm, 70)
+        self.assertEqual(summary.get_wpm_percentile(50), 60)
+        self.assertEqual(summary.get_wpm_percentile(90), 100)
+
+    def test_recent_trend(self):
+        summary = PlayerStatisticsSummary()
+
+        for wpm in range(20, 120, 5):
+            summary.add_race(wpm * 5 / 60, 2)
+
+        self.assertEqual(len(summary.recent_wpms), 10)
+        self.assertAlmostEqual(summary.recent_average_wpm, 92.5)
+        self.assertAlmostEqual(summary.wpm_trend, 92.5 - 67.5)
+
+    def test_empty_summary(self):
+        summary = PlayerStatisticsSummary()
+
+        self.assertEqual(summary.average_wpm, 0)
+        self.assertEqual(summary.win_rate, 0)
+        self.assertEqual(summary.get_wpm_percentile(50), 0)
+
+
+class StatisticsPageTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='TestUser1', password='TestPass.123')
+        self.headers = {'Authorization': f"Bearer {str(RefreshToken.for_user(self.user).access_token)}"}
+        self.quote = Quotes.objects.create(quote="Testing quote!", author="Tester")
+
+    def create_races_statistics(self, amount_of_races):
+        for idx in range(amount_of_races):
+            race = Race.objects.create(creator=self.user, status="f", quote=self.quote)
+            RaceStatistics.objects.create(
+                player=self.user,
+                race=race,
+                finished=True,
+                time_racing=datetime.timedelta(seconds=10),
+                place=idx % 2 + 1,
+                average_speed=idx + 1,
+            )
+
+    def test_summary_is_built_from_existing_races(self):
+        self.create_races_statistics(4)
+
+        response = self.client.get('/api/stats/', headers=self.headers)
+        summary = response.json()['summary']
+
+        self.assertEqual(summary['amount_of_races'], 4)
+        self.assertEqual(summary['amount_of_wins'], 2)
+        self.assertAlmostEqual(summary['best_wpm'], speed_to_wpm(4))
+        self.assertTrue(PlayerStatisticsSummary.objects.filter(player=self.user).exists())
+
+    def test_summary_is_updated_incrementally(self):
+        self.create_races_statistics(2)
+        services.get_player_summary(self.user)
+
+        race = Race.objects.create(creator=self.user, status="f", quote=self.quote)
+        race_statistics = RaceStatistics.objects.create(
+            player=self.user, race=race, finished=True, time_racing=datetime.timedelta(seconds=10),
+            place=1, average_speed=10,
+        )
+
+        with self.assertNumQueries(4):
+            services.record_race_in_player_summary(race_statistics)
+
+        summary = PlayerStatisticsSummary.objects.get(player=self.user)
+        self.assertEqual(summary.amount_of_races, 3)
+        self.assertEqual(summary.amount_of_wins, 2)
+        self.assertAlmostEqual(summary.best_wpm, speed_to_wpm(10))
+
+    def test_stats_queries_dont_grow_with_races(self):
+        self.create_races_statistics(3)
+        self.client.get('/api/stats/', headers=self.headers)
+
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/stats/', headers=self.headers)
+
+        self.create_races_statistics(30)
+
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/stats/', headers=self.headers)
+
+        races_statistics = response.json()['races_statistics']
+        self.assertEqual(len(races_statistics), 20)
+        self.assertEqual(races_statistics[0]['race']['quote']['quote'], self.quote.quote)
+
+    def test_races_statistics_pagination(self):
+        self.create_races_statistics(25)
+
+        average_speeds = []
+        url = '/api/stats/races/?page_size=10'
+
+        while url is not None:
+            with self.assertNumQueries(2):
+                response = self.client.get(url, headers=self.headers)
+
+            average_speeds += [race_statistics['average_speed'] for race_statistics in response.json()['results']]
+            url = response.json()['next']
+
+        self.assertEqual(average_speeds, [float(speed) for speed in range(25, 0, -1)])
+
+    def test_stats_unauthorized(self):
+        self.assertEqual(self.client.get('/api/stats/').status_code, 401)
+        self.assertEqual(self.client.get('/api/stats/races/').status_code, 401)
+
+
+class LeaderboardTestCase(APITestCase):
+    def setUp(self):
+        self.clear_leaderboards()
+
+        self.users = [User.objects.create(username=f'TestUser{idx}', password='TestPass.123') for idx in range(3)]
+        self.headers = {'Authorization': f"Bearer {str(RefreshToken.for_user(self.users[0]).access_token)}"}
+        self.quotes = [Quotes.objects.create(quote=f"Testing quote {idx}!", author="Tester") for idx in range(2)]
+
+    def tearDown(self):
+        self.clear_leaderboards()
+
+    def clear_leaderboards(self):
+        keys = list(get_redis().scan_iter(leaderboards.LEADERBOARD_KEY.format('*')))
+
+        if keys:
+            get_redis().delete(*keys)
+
+    def finish_race(self, user, quote, average_speed):
+        race = Race.objects.create(creator=user, status="f", quote=quote, start_date=timezone.now())
+        RaceStatistics.objects.create(
+            player=user, race=race, finished=True, time_racing=datetime.timedelta(seconds=10),
+            place=1, average_speed=average_speed,
+        )
+        leaderboards.record_race(user.id, quote.id, average_speed, race.start_date)
+
+    def finish_races(self):
+        self.finish_race(self.users[0], self.quotes[0], 5)
+        self.finish_race(self.users[0], self.quotes[1], 3)
+        self.finish_race(self.users[1], self.quotes[0], 7)
+        self.finish_race(self.users[1], self.quotes[0], 4)
+        self.finish_race(self.users[2], self.quotes[1], 6)
+
+    def get_leaderboards(self):
+        urls = [f'/api/leaderboards/{period}/' for period in leaderboards.PERIODS]
+        urls += [f'/api/leaderboards/quotes/{quote.id}/' for quote in self.quotes]
+
+        return {url: self.client.get(url).json() for url in urls}
+
+    def test_leaderboards_keep_best_speed(self):
+        self.finish_races()
+
+        response = self.client.get('/api/leaderboards/all_time/')
+        results = response.json()['results']
+
+        self.assertEqual(response.json()['count'], 3)
+        self.assertEqual([result['player']['id'] for result in results], [self.users[1].id, self.users[2].id, self.users[0].id])
+        self.assertEqual([result['rank'] for result in results], [1, 2, 3])
+        self.assertEqual(results[0]['average_speed'], 7)
+        self.assertEqual(results[0]['player']['username'], self.users[1].username)
+
+        quote_results = self.client.get(f'/api/leaderboards/quotes/{self.quotes[1].id}/').json()['results']
+        self.assertEqual([result['player']['id'] for result in quote_results], [self.users[2].id, self.users[0].id])
+
+        page = self.client.get('/api/leaderboards/daily/?offset=1&page_size=1').json()['results']
+        self.assertEqual([(result['rank'], result['player']['id']) for result in page], [(2, self.users[2].id)])
+
+    def test_player_position(self):
+        response = self.client.get('/api/leaderboards/weekly/me/', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+        self.finish_races()
+
+        response = self.client.get('/api/leaderboards/weekly/me/', headers=self.headers)
+        self.assertEqual(response.json()['rank'], 3)
+        self.assertEqual(response.json()['average_speed'], 5)
+
+        response = self.client.get(f'/api/leaderboards/quotes/{self.quotes[0].id}/me/', headers=self.headers)
+        self.assertEqual(response.json()['rank'], 2)
+
+        self.assertEqual(self.client.get('/api/leaderboards/weekly/me/').status_code, 401)
+
+    def test_wrong_leaderboard(self):
+        self.assertEqual(self.client.get('/api/leaderboards/monthly/').status_code, 404)
+        self.assertEqual(self.client.get('/api/leaderboards/all_time/?offset=-1').status_code, 400)
+
+    def test_rebuild_leaderboards(self):
+        self.finish_races()
+        recorded_leaderboards = self.get_leaderboards()
+
+        self.clear_leaderboards()
+        call_command('rebuild_leaderboards', batch_size=2, stdout=io.StringIO())
+
+        self.assertEqual(self.get_leaderboards(), recorded_leaderboards)
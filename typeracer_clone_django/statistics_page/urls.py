@@ -4,4 +4,9 @@ from . import views
 
 urlpatterns = [
     path('stats/', views.currentUserStatsView, name="race_list"),
-]
\ No newline at end of file
+    path('stats/races/', views.currentUserRacesStatsView, name="races_statistics_list"),
+    path('leaderboards/quotes/<int:quote_id>/', views.quoteLeaderboardView, name="quote_leaderboard"),
+    path('leaderboards/quotes/<int:quote_id>/me/', views.quoteLeaderboardPositionView, name="quote_leaderboard_position"),
+    path('leaderboards/<str:period>/', views.leaderboardView, name="leaderboard"),
+    path('leaderboards/<str:period>/me/', views.leaderboardPositionView, name="leaderboard_position"),
+]
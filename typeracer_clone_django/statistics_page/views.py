@@ -5,16 +5,108 @@ from rest_framework.permissions import IsAuthenticated
 
 from . import models
 from . import serializers
+from . import services
+from . import leaderboards
+from .pagination import RaceStatisticsPagination
+from race_handler.models import RaceStatistics
 
 
+def get_races_statistics(user):
+    return RaceStatistics.objects.filter(player=user).select_related('race__quote')
+
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def currentUserStatsView(request):
+    """
+    Summary of the user's statistics and the latest races of the user,
+    older races are listed by ``currentUserRacesStatsView``.
+    """
     if request.method == 'GET':
         current_user = request.user
-        
-        serializer = serializers.UserAndStatsSerializer(current_user)
+
+        latest_races_statistics = get_races_statistics(current_user).order_by('-id')[:RaceStatisticsPagination.page_size]
+
+        serializer = serializers.UserAndStatsSerializer(current_user, context={
+            'summary': services.get_player_summary(current_user),
+            'races_statistics': latest_races_statistics,
+        })
         return Response(serializer.data)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def currentUserRacesStatsView(request):
+    if request.method == 'GET':
+        paginator = RaceStatisticsPagination()
+        races_statistics = paginator.paginate_queryset(get_races_statistics(request.user), request)
+
+        serializer = serializers.StatisticsSerializer(races_statistics, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+def get_leaderboard_page_params_or_none(request):
+    try:
+        offset = int(request.GET.get('offset', 0))
+        page_size = int(request.GET.get('page_size', leaderboards.DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return None
+
+    if offset < 0 or page_size < 1:
+        return None
+
+    return offset, min(page_size, leaderboards.MAX_PAGE_SIZE)
+
+
+def leaderboard_response(request, leaderboard_key):
+    page_params = get_leaderboard_page_params_or_none(request)
+
+    if page_params is None:
+        return Response({"error" : "offset and page_size should be positive numbers"}, status=status.HTTP_400_BAD_REQUEST)
+
+    amount_of_players, results = leaderboards.get_leaderboard_page(leaderboard_key, *page_params)
+    return Response({'count': amount_of_players, 'results': results})
+
+
+def player_position_response(request, leaderboard_key):
+    position = leaderboards.get_player_position(leaderboard_key, request.user.id)
+
+    if position is None:
+        return Response({"error" : "You aren't on this leaderboard yet"}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response(position)
+
+
+@api_view(['GET'])
+def leaderboardView(request, period):
+    """
+    Players ordered by their best speed of all time, of today or of this week.
+    """
+    if request.method == 'GET':
+        if period not in leaderboards.PERIODS:
+            return Response({"error" : "There is no such leaderboard"}, status=status.HTTP_404_NOT_FOUND)
+
+        return leaderboard_response(request, leaderboards.get_leaderboard_key(period))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def leaderboardPositionView(request, period):
+    if request.method == 'GET':
+        if period not in leaderboards.PERIODS:
+            return Response({"error" : "There is no such leaderboard"}, status=status.HTTP_404_NOT_FOUND)
+
+        return player_position_response(request, leaderboards.get_leaderboard_key(period))
+
+
+@api_view(['GET'])
+def quoteLeaderboardView(request, quote_id):
+    if request.method == 'GET':
+        return leaderboard_response(request, leaderboards.get_quote_leaderboard_key(quote_id))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def quoteLeaderboardPositionView(request, quote_id):
+    if request.method == 'GET':
+        return player_position_response(request, leaderboards.get_quote_leaderboard_key(quote_id))